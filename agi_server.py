@@ -2,10 +2,14 @@
 AGI (Asterisk Gateway Interface) Server
 Handles incoming calls from Asterisk and routes them through the IVR system
 """
-import socket
-import threading
+import argparse
+import asyncio
+import gc
 import logging
-from typing import Optional, Dict
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Optional, Dict, List, Set
 import sys
 import os
 
@@ -14,6 +18,15 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from config import settings
 from services.ivr import IVRHandler
+from services.admission import AdmissionController
+from services.ami_client import AMIClient, AMIError
+from services.agi_protocol import (
+    AGIProtocol, AGIConnectionClosed, command_verb, indicates_hangup, parse_result
+)
+from services.capture import SessionCapture, should_capture
+from services.cancellation import CallCancelled
+from services.cat_personalities import monologue_pool
+from services import metrics, prompts, quality, tracing, worker_pool
 
 # Configure logging
 logging.basicConfig(
@@ -26,169 +39,661 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+AGI_COMMAND_SECONDS = metrics.histogram(
+    "meow_agi_command_seconds",
+    "Time from sending an AGI command (or the previous pipelined reply) to its reply",
+    ("verb",))
+AGI_ROUND_TRIPS_PER_CALL = metrics.histogram(
+    "meow_agi_round_trips_per_call", "Network round trips to Asterisk per call",
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 30, 50))
+AGI_COMMANDS_PER_CALL = metrics.histogram(
+    "meow_agi_commands_per_call", "AGI commands sent per call",
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 30, 50))
+AGI_CALL_SECONDS = metrics.histogram(
+    "meow_agi_call_seconds", "Wall-clock duration of AGI sessions")
+AGI_BYTES_SENT = metrics.counter(
+    "meow_agi_bytes_sent_total", "Bytes written to Asterisk")
+AGI_BYTES_RECEIVED = metrics.counter(
+    "meow_agi_bytes_received_total", "Bytes read from Asterisk")
+HOLD_SECONDS = metrics.histogram(
+    "meow_hold_seconds",
+    "Time callers spent on the hold sound after the filler prompts, waiting for work",
+    ("stage",), buckets=(0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30))
+
+# Trace span names for AGI commands; anything else is just "agi"
+TRACE_STAGES = {
+    "GET DATA": "menu",
+    "RECORD FILE": "recording",
+    "STREAM FILE": "playback",
+    "WAIT FOR DIGIT": None,  # short polls, covered by the span of whoever polls
+}
+
+
+AUDIO_EXTENSIONS = ('.wav', '.sln', '.ulaw', '.alaw', '.gsm')
+
+# Work that finishes this soon after the filler prompts needs no hold sound
+HOLD_DELAY = 0.3
+
+
+def strip_audio_extension(filename: str) -> str:
+    """Asterisk picks the format itself, so sound names go without extension"""
+    root, ext = os.path.splitext(filename)
+    return root if ext in AUDIO_EXTENSIONS else filename
+
+
+class AGIBatch:
+    """
+    AGI commands written to Asterisk in a single send
+
+    Asterisk executes AGI commands one after another and answers each in
+    order, so commands whose responses don't decide the next step can be
+    pipelined: one write, one wait, N responses. Builder methods return the
+    batch so calls can be chained.
+
+        responses = await session.batch().answer().stream_file("welcome").send()
+    """
+
+    def __init__(self, session: 'AGISession'):
+        self.session = session
+        self.commands: List[str] = []
+        self.timeout = settings.AGI_COMMAND_TIMEOUT
+
+    def __len__(self) -> int:
+        return len(self.commands)
+
+    def add(self, command: str) -> 'AGIBatch':
+        """Queue a raw AGI command"""
+        self.commands.append(command)
+        return self
+
+    def answer(self) -> 'AGIBatch':
+        return self.add("ANSWER")
+
+    def verbose(self, message: str, level: int = 1) -> 'AGIBatch':
+        return self.add(f'VERBOSE "{message}" {level}')
+
+    def stream_file(self, filename: str, escape_digits: str = "") -> 'AGIBatch':
+        return self.add(f'STREAM FILE "{strip_audio_extension(filename)}" "{escape_digits}"')
+
+    def get_data(self, filename: str, timeout: int = 5000, max_digits: int = 1) -> 'AGIBatch':
+        return self.add(f'GET DATA "{strip_audio_extension(filename)}" {timeout} {max_digits}')
 
-class AGISession:
-    """Handles a single AGI session with Asterisk"""
+    def record_file(self, filename: str, format: str = "wav", escape_digits: str = "#",
+                    timeout: int = -1, offset: int = 0, beep: bool = True,
+                    silence: int = 3) -> 'AGIBatch':
+        beep_flag = "beep" if beep else ""
+        # The recording itself may legitimately run for `timeout` ms
+        self.timeout = max(self.timeout, settings.AGI_COMMAND_TIMEOUT + max(timeout, 0) / 1000)
+        return self.add(f'RECORD FILE "{filename}" {format} "{escape_digits}" '
+                        f'{timeout} {offset} {beep_flag} s={silence}')
 
-    def __init__(self, socket_conn: socket.socket):
-        self.socket = socket_conn
-        self.env: Dict[str, str] = {}
-        self.logger = logging.getLogger(f"{__name__}.AGISession")
+    def wait_for_digit(self, timeout: int = -1) -> 'AGIBatch':
+        self.timeout = max(self.timeout, settings.AGI_COMMAND_TIMEOUT + max(timeout, 0) / 1000)
+        return self.add(f'WAIT FOR DIGIT {timeout}')
 
-    def read_env(self):
-        """Read AGI environment variables from Asterisk"""
-        while True:
-            line = self.socket.recv(1024).decode('utf-8').strip()
-            if not line:
-                break
-            if ':' in line:
-                key, value = line.split(':', 1)
-                self.env[key.strip()] = value.strip()
-            self.logger.debug(f"ENV: {line}")
+    def say_number(self, number: int, escape_digits: str = "") -> 'AGIBatch':
+        return self.add(f'SAY NUMBER {number} "{escape_digits}"')
 
-        self.logger.info(f"Call from: {self.env.get('agi_callerid', 'Unknown')}")
+    def set_variable(self, name: str, value: str) -> 'AGIBatch':
+        return self.add(f'SET VARIABLE {name} "{value}"')
 
-    def send_command(self, command: str) -> str:
+    def get_variable(self, name: str) -> 'AGIBatch':
+        return self.add(f'GET VARIABLE {name}')
+
+    def hangup(self) -> 'AGIBatch':
+        return self.add("HANGUP")
+
+    async def send(self) -> List[str]:
+        """Send all queued commands and return their responses in order"""
+        commands, self.commands = self.commands, []
+        return await self.session.send_batch(commands, timeout=self.timeout)
+
+
+class AGISession:
+    """
+    Handles a single AGI session with Asterisk
+
+    `cancellation` is tripped as soon as the caller is known to be gone (the
+    connection closing, an unsolicited HANGUP, or a command answered with
+    result=-1 or 511), so long-running work for the call can stop early.
+
+    `trace` is the call's span timeline; every AGI command adds a span.
+    With AGI_CAPTURE_ENABLED, `capture` logs the session for replay.
+    `ami` is the server's AMI client (None without AMI_ENABLED), for the
+    few things AGI can't do from inside the call.
+    """
+
+    def __init__(self, connection: AGIProtocol, ami: Optional[AMIClient] = None):
+        self.connection = connection
+        self.ami = ami
+        self.env: Dict[str, str] = connection.env
+        # The caller's live audio on EAGI calls, None otherwise
+        self.audio = None
+        self.cancellation = connection.cancellation
+        self.trace = tracing.CallTrace()
+        self.capture: Optional[SessionCapture] = None
+        if should_capture():
+            self.capture = SessionCapture()
+            self.cancellation.add_callback(
+                lambda: self.capture.caller_hung_up(self.cancellation.reason))
+            connection.audio_listener = self.capture.heard
+        self.logger = logging.getLogger(f"{__name__}.AGISession")
+        self.started_at = time.monotonic()
+        self.round_trips = 0
+        self.commands_sent = 0
+
+    async def read_env(self):
+        """Read AGI environment variables from Asterisk"""
+        await self.connection.read_env()
+        self.audio = self.connection.audio
+        for key, value in self.env.items():
+            self.logger.debug(f"ENV: {key}: {value}")
+
+        self.trace.attrs.update(
+            caller=self.env.get('agi_callerid', 'Unknown'),
+            uniqueid=self.env.get('agi_uniqueid', ''),
+            extension=self.env.get('agi_extension', ''),
+        )
+        self.logger.info(f"Call {self.trace.call_id} from: {self.env.get('agi_callerid', 'Unknown')}")
+
+    def batch(self) -> AGIBatch:
+        """Start a pipelined batch of commands"""
+        return AGIBatch(self)
+
+    async def send_batch(self, commands: List[str], timeout: Optional[float] = None) -> List[str]:
+        """
+        Write several AGI commands in one send and collect their responses
+
+        Args:
+            commands: AGI command lines (without trailing newlines)
+            timeout: Seconds to wait for each response (default AGI_COMMAND_TIMEOUT)
+        """
+        if not commands:
+            return []
+        if self.connection.hangup_received:
+            raise AGIConnectionClosed("Caller hung up")
+
+        for command in commands:
+            self.logger.debug(f"Sending: {command}")
+        self.connection.write(''.join(f"{command}\n" for command in commands).encode('utf-8'))
+        self.round_trips += 1
+        self.commands_sent += len(commands)
+        if self.capture is not None:
+            captured = self.capture.sent(commands)
+
+        responses = []
+        previous = time.perf_counter()
+        for index, command in enumerate(commands):
+            response = await self.connection.read_response(timeout or settings.AGI_COMMAND_TIMEOUT)
+            # Asterisk runs pipelined commands back to back, so each one's
+            # cost is the gap since the previous reply
+            now = time.perf_counter()
+            verb = command_verb(command)
+            AGI_COMMAND_SECONDS.observe(now - previous, verb=verb)
+            stage = TRACE_STAGES.get(verb, "agi")
+            if stage is not None:
+                self.trace.add_span(stage, previous, now, command=command[:120], response=response)
+            previous = now
+            self.logger.debug(f"Response: {response}")
+            if self.capture is not None:
+                self.capture.replied(captured + index, response)
+                if verb == 'RECORD FILE':
+                    await self.capture.keep_recording(captured + index, command)
+            if indicates_hangup(command, response):
+                self.cancellation.cancel(f"{command_verb(command)} returned {response}")
+                # Asterisk still answers the rest of the batch
+                self.connection.discard_responses(len(commands) - index - 1)
+                raise AGIConnectionClosed("Caller hung up")
+            responses.append(response)
+        return responses
+
+    async def send_command(self, command: str, timeout: Optional[float] = None) -> str:
         """Send AGI command to Asterisk and get response"""
-        self.logger.debug(f"Sending: {command}")
-        self.socket.send(f"{command}\n".encode('utf-8'))
+        return (await self.send_batch([command], timeout))[0]
+
+    def finish(self):
+        """Record per-call protocol metrics once the session is over"""
+        AGI_ROUND_TRIPS_PER_CALL.observe(self.round_trips)
+        AGI_COMMANDS_PER_CALL.observe(self.commands_sent)
+        AGI_CALL_SECONDS.observe(time.monotonic() - self.started_at)
+        AGI_BYTES_SENT.inc(self.connection.bytes_sent)
+        AGI_BYTES_RECEIVED.inc(self.connection.bytes_received)
+        self.trace.attrs.update(round_trips=self.round_trips, commands=self.commands_sent)
+
+    async def save_capture(self):
+        """Write the session capture, if this call was captured"""
+        if self.capture is None:
+            return
+        try:
+            path = await asyncio.to_thread(
+                self.capture.save, settings.AGI_CAPTURE_DIR, self.env,
+                self.trace.call_id, self.trace.outcome, self.trace.duration)
+            self.logger.debug(f"Captured session to {path}")
+        except OSError as e:
+            self.logger.warning(f"Could not save session capture: {e}")
+            self.capture.discard()
+
+    async def play_while(self, work: Awaitable, lead_in: Optional[AGIBatch] = None,
+                         stage: str = "work", hold: Optional[str] = settings.HOLD_PROMPT) -> Any:
+        """
+        Play `lead_in` (filler prompts) while `work` runs, then loop the
+        `hold` prompt until it is done; returns its result
+
+        The caller waits max(prompts, work) instead of prompts + work. Start
+        the work before building anything slow into `lead_in`. With AMI, a
+        hold loop still playing when the work finishes is cut short.
+        """
+        work = asyncio.ensure_future(work)
+        try:
+            if lead_in is not None and len(lead_in):
+                await lead_in.send()
+            await asyncio.wait({work}, timeout=HOLD_DELAY)
+            if not work.done() and hold is not None:
+                start = time.perf_counter()
+                with self.trace.span("hold", stage=stage) as span:
+                    span['loops'] = await self._hold(work, hold)
+                HOLD_SECONDS.observe(time.perf_counter() - start, stage=stage)
+            return await work
+        except BaseException:
+            if not work.done():
+                work.cancel()
+            elif not work.cancelled():
+                work.exception()  # retrieved: we are raising something else
+            raise
+
+    async def _hold(self, work: asyncio.Future, hold: str) -> int:
+        """Loop the hold prompt until `work` is done; returns how many times it played"""
+        prompt = prompts.PROMPTS.find(hold)
+        if prompt is None:
+            await asyncio.wait({work})  # nothing to play: silence
+            return 0
+
+        playing = False
+        sending = []  # keeps the AMI task referenced until it is done
+
+        def cut_short(_):
+            # STREAM FILE can't be stopped over AGI; a # received on the
+            # channel ends it, as its escape digit
+            if playing and self.ami is not None and self.ami.connected:
+                sending.append(asyncio.ensure_future(self._send_digit("#")))
+
+        work.add_done_callback(cut_short)
+        loops = 0
+        try:
+            while not work.done():
+                playing = True
+                await self.stream_file(str(prompt.with_suffix('')), escape_digits="#")
+                playing = False
+                loops += 1
+        finally:
+            work.remove_done_callback(cut_short)
+        return loops
 
-        response = self.socket.recv(1024).decode('utf-8').strip()
-        self.logger.debug(f"Response: {response}")
-        return response
+    async def _send_digit(self, digit: str):
+        try:
+            await self.ami.action("PlayDTMF", Channel=self.env.get('agi_channel', ''),
+                                  Digit=digit, Receive="true")
+        except (AMIError, asyncio.TimeoutError, OSError) as e:
+            self.logger.debug(f"Could not cut the hold prompt short: {e}")
+
+    async def _send_one(self, batch: AGIBatch) -> str:
+        return (await batch.send())[0]
 
-    def answer(self):
+    async def answer(self):
         """Answer the call"""
-        return self.send_command("ANSWER")
+        return await self._send_one(self.batch().answer())
 
-    def stream_file(self, filename: str, escape_digits: str = "") -> str:
+    async def stream_file(self, filename: str, escape_digits: str = "") -> str:
         """Play an audio file"""
-        # Remove file extension if present
-        filename = filename.replace('.wav', '').replace('.gsm', '')
-        return self.send_command(f'STREAM FILE "{filename}" "{escape_digits}"')
+        return await self._send_one(self.batch().stream_file(filename, escape_digits))
 
-    def get_data(self, filename: str, timeout: int = 5000, max_digits: int = 1) -> str:
+    async def get_data(self, filename: str, timeout: int = 5000, max_digits: int = 1) -> str:
         """Play a file and get DTMF input"""
-        filename = filename.replace('.wav', '').replace('.gsm', '')
-        response = self.send_command(f'GET DATA "{filename}" {timeout} {max_digits}')
-
-        # Parse response: "200 result=<digits>"
-        if 'result=' in response:
-            digits = response.split('result=')[1].split()[0]
-            return digits
-        return ""
+        return parse_result(await self._send_one(self.batch().get_data(filename, timeout, max_digits)))
 
-    def record_file(self, filename: str, format: str = "wav", escape_digits: str = "#",
-                   timeout: int = -1, offset: int = 0, beep: bool = True,
-                   silence: int = 3) -> str:
+    async def record_file(self, filename: str, format: str = "wav", escape_digits: str = "#",
+                          timeout: int = -1, offset: int = 0, beep: bool = True,
+                          silence: int = 3) -> str:
         """Record audio from caller"""
-        beep_flag = "beep" if beep else ""
-        cmd = f'RECORD FILE "{filename}" {format} "{escape_digits}" {timeout} {offset} {beep_flag} s={silence}'
-        return self.send_command(cmd)
+        return await self._send_one(self.batch().record_file(
+            filename, format, escape_digits, timeout, offset, beep, silence))
+
+    async def wait_for_digit(self, timeout: int = -1) -> str:
+        """Wait up to `timeout` ms for a DTMF digit; returns it, or "" on timeout"""
+        code = parse_result(await self._send_one(self.batch().wait_for_digit(timeout)))
+        return chr(int(code)) if code.isdigit() and code != "0" else ""
 
-    def say_number(self, number: int, escape_digits: str = "") -> str:
+    async def say_number(self, number: int, escape_digits: str = "") -> str:
         """Speak a number"""
-        return self.send_command(f'SAY NUMBER {number} "{escape_digits}"')
+        return await self._send_one(self.batch().say_number(number, escape_digits))
 
-    def hangup(self):
+    async def hangup(self):
         """Hang up the call"""
-        return self.send_command("HANGUP")
+        return await self._send_one(self.batch().hangup())
 
-    def set_variable(self, name: str, value: str):
+    async def set_variable(self, name: str, value: str):
         """Set a channel variable"""
-        return self.send_command(f'SET VARIABLE {name} "{value}"')
+        return await self._send_one(self.batch().set_variable(name, value))
 
-    def get_variable(self, name: str) -> str:
+    async def get_variable(self, name: str) -> str:
         """Get a channel variable"""
-        response = self.send_command(f'GET VARIABLE {name}')
+        response = await self._send_one(self.batch().get_variable(name))
         if 'result=' in response:
             return response.split('result=')[1].strip('()')
         return ""
 
-    def verbose(self, message: str, level: int = 1):
+    async def verbose(self, message: str, level: int = 1):
         """Log a verbose message in Asterisk"""
-        return self.send_command(f'VERBOSE "{message}" {level}')
+        return await self._send_one(self.batch().verbose(message, level))
 
 
 class AGIServer:
-    """AGI server that listens for connections from Asterisk"""
-
-    def __init__(self, host: str = settings.AGI_HOST, port: int = settings.AGI_PORT):
+    """
+    AGI server that listens for connections from Asterisk
+
+    Calls are served as coroutines on a single asyncio event loop, so a call
+    that is waiting on Asterisk (prompt playback, recording) costs no thread.
+    CPU-bound steps inside the handlers are pushed to a bounded pool of
+    executor threads, and voice analysis / meow synthesis to a pool of
+    ANALYSIS_PROCESSES worker processes. At most MAX_CONCURRENT_CALLS calls
+    run the IVR at once; the rest wait briefly for a slot or hear the busy
+    prompt, and with QUALITY_ADAPTIVE the load decides how elaborate each
+    call's meows and monologue are (services/quality.py). With
+    AMI_ENABLED the server also keeps an AMI connection for Asterisk's own
+    view of the load; as one of `workers` pre-forked processes it takes its
+    share of that host-wide view.
+
+    On SIGTERM (or stop()) the server stops accepting and gives in-flight
+    calls up to AGI_DRAIN_TIMEOUT seconds to finish.
+    """
+
+    def __init__(self, host: str = settings.AGI_HOST, port: int = settings.AGI_PORT,
+                 reuse_port: bool = False, share_metrics: bool = False, workers: int = 1):
         self.host = host
         self.port = port
-        self.server_socket: Optional[socket.socket] = None
+        self.reuse_port = reuse_port
+        self.share_metrics = share_metrics
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._shutdown: Optional[asyncio.Event] = None
+        self.calls: Set[asyncio.Task] = set()
+        self.ami = AMIClient() if settings.AMI_ENABLED else None
+        self.admission = AdmissionController(ami=self.ami, workers=workers)
         self.logger = logging.getLogger(__name__)
         self.running = False
 
-    def handle_call(self, client_socket: socket.socket, address: tuple):
+    def _on_connection(self, connection: AGIProtocol):
+        """Start a call task for a newly accepted connection"""
+        task = self.loop.create_task(self.handle_call(connection))
+        self.calls.add(task)
+        task.add_done_callback(self.calls.discard)
+
+    async def handle_call(self, connection: AGIProtocol):
         """Handle an incoming call"""
+        address = connection.peername
         self.logger.info(f"New connection from {address}")
+        session = AGISession(connection, ami=self.ami)
+        trace = session.trace
+        outcome = "completed"
 
         try:
-            session = AGISession(client_socket)
-            session.read_env()
+            with trace.span("env"):
+                await session.read_env()
 
-            # Create IVR handler and process the call
-            ivr = IVRHandler(session)
-            ivr.run()
+            with trace.span("admission"):
+                admitted = await self.admission.acquire()
+            if not admitted:
+                outcome = "busy"
+                await self.play_busy(session)
+                return
 
+            try:
+                # Create IVR handler and process the call
+                ivr = IVRHandler(session)
+                await ivr.run()
+            finally:
+                self.admission.release()
+
+        except (AGIConnectionClosed, CallCancelled):
+            outcome = "hangup"
+            self.logger.info(f"Caller hung up: {address}")
         except Exception as e:
+            outcome = "error"
             self.logger.error(f"Error handling call: {e}", exc_info=True)
         finally:
+            connection.close()
+            session.finish()
+            if outcome == "completed" and session.cancellation.cancelled:
+                # The IVR handles most hangups itself
+                outcome = "hangup"
+            trace.finish(outcome)
+            tracing.RECORDER.record(trace)
+            self.logger.info(f"Connection closed from {address} "
+                             f"(call {trace.call_id}, {trace.duration:.2f}s, {outcome})")
+            await session.save_capture()
+
+    async def play_busy(self, session: AGISession):
+        """Tell an overflow caller the cats are busy and hang up"""
+        prompt = prompts.PROMPTS.find(settings.BUSY_PROMPT)
+        if prompt is not None:
+            sound = str(prompt.with_suffix(''))
+        else:
+            sound = settings.BUSY_FALLBACK_SOUND
+
+        await session.batch().stream_file(sound).hangup().send()
+
+    async def serve(self):
+        """Accept calls until the server is stopped, then drain in-flight calls"""
+        self.loop = asyncio.get_running_loop()
+        self._shutdown = asyncio.Event()
+        self.loop.set_default_executor(ThreadPoolExecutor(
+            max_workers=settings.WORKER_THREADS,
+            thread_name_prefix="meow-worker"
+        ))
+        self.server = await self.loop.create_server(
+            lambda: AGIProtocol(self._on_connection),
+            self.host,
+            self.port,
+            backlog=settings.AGI_LISTEN_BACKLOG,
+            reuse_address=True,
+            reuse_port=self.reuse_port or None
+        )
+        await worker_pool.start_pool()
+        self.running = True
+        self._install_signal_handlers()
+        exporter = self.loop.create_task(self._export_metrics()) if self.share_metrics else None
+        prompt_watcher = self.loop.create_task(prompts.watch())
+        quality_watcher = (self.loop.create_task(quality.watch(self.admission))
+                           if settings.QUALITY_ADAPTIVE else None)
+        if self.ami is not None:
+            self.ami.start()
+
+        self.logger.info(f"AGI Server listening on {self.host}:{self.port} (pid {os.getpid()})")
+
+        try:
+            await self._shutdown.wait()
+        finally:
+            self.running = False
+            self.server.close()
+            await self.drain()
+            prompt_watcher.cancel()
+            if quality_watcher is not None:
+                quality_watcher.cancel()
+            await monologue_pool().close()
+            await worker_pool.shutdown_pool()
+            if self.ami is not None:
+                await self.ami.stop()
+            if exporter is not None:
+                exporter.cancel()
+                metrics.snapshot_path(settings.METRICS_DIR).unlink(missing_ok=True)
+                tracing.snapshot_path(settings.METRICS_DIR).unlink(missing_ok=True)
+
+    async def _export_metrics(self):
+        """Periodically publish this worker's metrics and call traces for the web process"""
+        while True:
             try:
-                client_socket.close()
-            except:
-                pass
-            self.logger.info(f"Connection closed from {address}")
+                metrics.write_snapshot(settings.METRICS_DIR)
+                tracing.write_snapshot(settings.METRICS_DIR)
+            except OSError as e:
+                self.logger.warning(f"Could not write metrics snapshot: {e}")
+            await asyncio.sleep(settings.METRICS_EXPORT_INTERVAL)
+
+    async def drain(self, timeout: float = settings.AGI_DRAIN_TIMEOUT):
+        """Let in-flight calls finish, cancelling any still running after `timeout`"""
+        if not self.calls:
+            return
+
+        self.logger.info(f"Draining {len(self.calls)} in-flight call(s)")
+        done, pending = await asyncio.wait(set(self.calls), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self.logger.warning(f"Cancelled {len(pending)} call(s) still running after {timeout}s")
+            await asyncio.wait(pending)
+
+    def _install_signal_handlers(self):
+        # Only possible when the loop runs in the main thread
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            try:
+                self.loop.add_signal_handler(signum, self.request_shutdown)
+            except (NotImplementedError, RuntimeError, ValueError):
+                return
 
-    def start(self):
-        """Start the AGI server"""
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    def request_shutdown(self):
+        """Stop accepting calls and drain (call from the event loop thread)"""
+        if self._shutdown is not None and not self._shutdown.is_set():
+            self.logger.info("Shutdown requested, no longer accepting calls")
+            self._shutdown.set()
 
+    def start(self):
+        """Start the AGI server (blocks until stopped)"""
         try:
-            self.server_socket.bind((self.host, self.port))
-            self.server_socket.listen(5)
-            self.running = True
-
-            self.logger.info(f"AGI Server listening on {self.host}:{self.port}")
-
-            while self.running:
-                try:
-                    client_socket, address = self.server_socket.accept()
-
-                    # Handle each call in a separate thread
-                    thread = threading.Thread(
-                        target=self.handle_call,
-                        args=(client_socket, address)
-                    )
-                    thread.daemon = True
-                    thread.start()
-
-                except socket.timeout:
-                    continue
-                except Exception as e:
-                    if self.running:
-                        self.logger.error(f"Error accepting connection: {e}")
-
+            asyncio.run(self.serve())
         except KeyboardInterrupt:
             self.logger.info("Shutting down AGI server...")
         finally:
             self.stop()
 
     def stop(self):
-        """Stop the AGI server"""
+        """Stop the AGI server (safe to call from any thread)"""
         self.running = False
-        if self.server_socket:
+        if self.loop and not self.loop.is_closed():
             try:
-                self.server_socket.close()
-            except:
+                self.loop.call_soon_threadsafe(self.request_shutdown)
+            except RuntimeError:
                 pass
         self.logger.info("AGI Server stopped")
 
 
+def preload_heavy_modules():
+    """
+    Import the analysis/synthesis stack before forking so every worker
+    shares the already-loaded modules copy-on-write
+    """
+    worker_pool.import_heavy_modules()
+    # Keep the garbage collector from touching (and so copying) the shared heap
+    gc.collect()
+    gc.freeze()
+
+
+class PreforkServer:
+    """
+    Pre-fork supervisor: N worker processes, each running its own AGIServer
+    on the same port via SO_REUSEPORT so the kernel spreads calls across them
+    and CPU-bound work scales past the GIL.
+
+    Workers that die are restarted. SIGTERM/SIGINT is forwarded to the
+    workers, which stop accepting and drain their calls before exiting.
+    """
+
+    def __init__(self, workers: int = settings.AGI_WORKERS,
+                 host: str = settings.AGI_HOST, port: int = settings.AGI_PORT):
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.children: Dict[int, int] = {}  # pid -> worker slot
+        self.stopping = False
+        self.logger = logging.getLogger(f"{__name__}.PreforkServer")
+
+    def start(self):
+        """Fork the workers and supervise them until told to stop"""
+        preload_heavy_modules()
+        for pattern in ("agi-*.json", "traces-*.json"):
+            for stale in settings.METRICS_DIR.glob(pattern):
+                stale.unlink(missing_ok=True)
+
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+        self.logger.info(f"Supervising {self.workers} AGI workers on {self.host}:{self.port}")
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+
+            slot = self.children.pop(pid, None)
+            if slot is None:
+                continue
+            metrics.snapshot_path(settings.METRICS_DIR, pid).unlink(missing_ok=True)
+            tracing.snapshot_path(settings.METRICS_DIR, pid).unlink(missing_ok=True)
+            if self.stopping:
+                self.logger.info(f"Worker {slot} (pid {pid}) exited")
+                continue
+
+            self.logger.warning(f"Worker {slot} (pid {pid}) died with status {status}, restarting")
+            time.sleep(settings.AGI_WORKER_RESTART_DELAY)
+            if not self.stopping:
+                self._spawn(slot)
+
+        self.logger.info("All AGI workers stopped")
+
+    def _spawn(self, slot: int):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                AGIServer(self.host, self.port, reuse_port=True, share_metrics=True,
+                          workers=self.workers).start()
+            except Exception:
+                self.logger.exception(f"Worker {slot} crashed")
+                exit_code = 1
+            finally:
+                logging.shutdown()
+                os._exit(exit_code)
+
+        self.children[pid] = slot
+        self.logger.info(f"Started worker {slot} (pid {pid})")
+
+    def _handle_signal(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        self.logger.info(f"Received signal {signum}, draining workers")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def stop(self):
+        """Ask all workers to drain and exit"""
+        self._handle_signal(signal.SIGTERM, None)
+
+
 if __name__ == "__main__":
-    server = AGIServer()
+    parser = argparse.ArgumentParser(description="Meow-Now AGI server")
+    parser.add_argument("--workers", type=int, default=settings.AGI_WORKERS,
+                        help="worker processes sharing the port (default: AGI_WORKERS)")
+    args = parser.parse_args()
+
+    server = PreforkServer(args.workers) if args.workers > 1 else AGIServer()
     try:
         server.start()
     except KeyboardInterrupt:
@@ -2,13 +2,17 @@
 Main Flask Application for Meow-Now
 Provides web interface and health check endpoints
 """
-from flask import Flask, jsonify, render_template_string
+from flask import Flask, Response, abort, jsonify, render_template_string, request
 import logging
+import multiprocessing
+import signal
 import threading
+import time
 import sys
 
 from config import settings
-from agi_server import AGIServer
+from agi_server import AGIServer, PreforkServer
+from services import metrics, quality, tracing
 
 # Configure logging
 logging.basicConfig(
@@ -24,8 +28,9 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.config['SECRET_KEY'] = settings.SECRET_KEY
 
-# AGI Server instance
+# AGI Server instance (single-process mode) or supervisor process (AGI_WORKERS > 1)
 agi_server = None
+agi_process = None
 
 
 @app.route('/')
@@ -76,6 +81,10 @@ def index():
             <li><code>GET /</code> - This status page</li>
             <li><code>GET /health</code> - Health check endpoint</li>
             <li><code>GET /config</code> - Configuration details (JSON)</li>
+            <li><code>GET /metrics</code> - Prometheus metrics</li>
+            <li><code>GET /calls</code> - Recent and slowest call traces (JSON)</li>
+            <li><code>GET /calls/&lt;call_id&gt;</code> - One call's trace (JSON)</li>
+            <li><code>GET /calls/waterfall</code> - Call traces as a waterfall</li>
         </ul>
     </body>
     </html>
@@ -103,7 +112,11 @@ def health():
         'agi_server': {
             'host': settings.AGI_HOST,
             'port': settings.AGI_PORT,
-            'running': agi_server is not None and agi_server.running
+            'running': (agi_server is not None and agi_server.running) or
+                       (agi_process is not None and agi_process.is_alive()),
+            'workers': settings.AGI_WORKERS,
+            'calls': agi_server.admission.stats() if agi_server is not None else None,
+            'quality': quality.GOVERNOR.stats() if agi_server is not None else None
         },
         'configuration': {
             'tts_engine': settings.TTS_ENGINE,
@@ -114,6 +127,129 @@ def health():
     return jsonify(status)
 
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text-format metrics"""
+    if settings.AGI_WORKERS > 1:
+        # Calls are handled in worker processes; merge what they published
+        # (this process's own gauges, like its idle quality tier, never move)
+        snapshots = metrics.read_snapshots(settings.METRICS_DIR)
+    else:
+        snapshots = [metrics.REGISTRY.snapshot()]
+    return Response(metrics.render(snapshots), mimetype='text/plain; version=0.0.4')
+
+
+def recorded_calls() -> dict:
+    """Flight recorder contents of this process and any pre-fork workers"""
+    snapshots = [tracing.RECORDER.snapshot()]
+    if settings.AGI_WORKERS > 1:
+        snapshots.extend(tracing.read_snapshots(settings.METRICS_DIR))
+    return tracing.merge(snapshots)
+
+
+@app.route('/calls')
+def calls():
+    """Recent calls and the slowest calls per hour, with their span timelines"""
+    return jsonify(recorded_calls())
+
+
+@app.route('/calls/<call_id>')
+def call_trace(call_id):
+    """One call's span timeline"""
+    trace = tracing.find(recorded_calls(), call_id)
+    if trace is None:
+        abort(404)
+    return jsonify(trace)
+
+
+@app.route('/calls/waterfall')
+def calls_waterfall():
+    """Span timelines as a waterfall: ?call=<id> for one call, ?limit=N recent calls"""
+    html = """
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>Meow-Now Call Traces</title>
+        <style>
+            body { font-family: Arial, sans-serif; max-width: 1100px; margin: 30px auto; padding: 20px; }
+            h1 { color: #ff6b6b; }
+            details { margin: 6px 0; border: 1px solid #dee2e6; border-radius: 5px; padding: 6px 10px; }
+            summary { cursor: pointer; font-family: monospace; }
+            table { width: 100%; border-collapse: collapse; margin-top: 8px; font-size: 13px; }
+            td { padding: 2px 4px; white-space: nowrap; }
+            td.track { width: 65%; position: relative; }
+            .bar { position: relative; height: 12px; background-color: #339af0; border-radius: 2px; min-width: 1px; }
+            .error { background-color: #fa5252; }
+            .hangup { color: #e67700; }
+            .busy, .error-outcome { color: #fa5252; }
+            .detail { color: #868e96; }
+        </style>
+    </head>
+    <body>
+        <h1>🐱 Call Traces</h1>
+        {% macro waterfall(trace) %}
+        <details {% if open %}open{% endif %}>
+            <summary>
+                {{ trace.call_id }} &middot; {{ trace.attrs.caller }} &middot;
+                {{ '%.2f' % trace.duration }}s &middot;
+                <span class="{{ trace.outcome }}{% if trace.outcome == 'error' %}-outcome{% endif %}">{{ trace.outcome }}</span>
+                &middot; {{ trace.started_at | timestamp }}
+            </summary>
+            <table>
+            {% for span in trace.spans %}
+                <tr>
+                    <td style="padding-left: {{ 4 + 16 * span.depth }}px">{{ span.name }}</td>
+                    <td class="track">
+                        <div class="bar {% if span.attrs and span.attrs.error %}error{% endif %}"
+                             style="left: {{ '%.2f' % (100 * span.start / total(trace)) }}%; width: {{ '%.2f' % (100 * span.duration / total(trace)) }}%"></div>
+                    </td>
+                    <td>{{ '%.0f' % (1000 * span.duration) }} ms</td>
+                    <td class="detail">{{ span.attrs.command or span.attrs.error or '' if span.attrs else '' }}</td>
+                </tr>
+            {% endfor %}
+            </table>
+        </details>
+        {% endmacro %}
+
+        {% if single %}
+            {{ waterfall(single) }}
+        {% else %}
+            <h2>Slowest Calls</h2>
+            {% for hour in slowest %}
+                <h3>{{ hour.hour }}</h3>
+                {% for trace in hour.calls %}{{ waterfall(trace) }}{% endfor %}
+            {% else %}
+                <p>No calls recorded yet.</p>
+            {% endfor %}
+
+            <h2>Recent Calls</h2>
+            {% for trace in recent %}{{ waterfall(trace) }}{% endfor %}
+        {% endif %}
+    </body>
+    </html>
+    """
+    recorded = recorded_calls()
+    single = None
+    if request.args.get('call'):
+        single = tracing.find(recorded, request.args['call'])
+        if single is None:
+            abort(404)
+
+    return render_template_string(
+        html,
+        single=single,
+        open=single is not None,
+        recent=recorded['recent'][:request.args.get('limit', 20, type=int)],
+        slowest=recorded['slowest'],
+        total=lambda trace: max(trace['duration'] or 0.0, 0.001),
+    )
+
+
+@app.template_filter('timestamp')
+def format_timestamp(value):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(value))
+
+
 @app.route('/config')
 def config():
     """Configuration endpoint"""
@@ -146,12 +282,35 @@ def start_agi_server():
     agi_server.start()
 
 
+def run_agi_workers():
+    """Run the pre-fork AGI supervisor (target of the AGI process)"""
+    PreforkServer().start()
+
+
+def stop_agi_workers(signum, frame):
+    """Forward shutdown to the AGI supervisor and wait for calls to drain"""
+    logger.info("Stopping AGI workers...")
+    agi_process.terminate()
+    agi_process.join(settings.AGI_DRAIN_TIMEOUT + 5)
+    sys.exit(0)
+
+
 if __name__ == '__main__':
     import os
 
-    # Start AGI server in background thread
-    agi_thread = threading.Thread(target=start_agi_server, daemon=True)
-    agi_thread.start()
+    if settings.AGI_WORKERS > 1:
+        # Workers are forked from a dedicated supervisor process, away from
+        # the Flask threads
+        logger.info(f"Starting {settings.AGI_WORKERS} AGI worker processes...")
+        agi_process = multiprocessing.get_context("fork").Process(
+            target=run_agi_workers, name="agi-supervisor"
+        )
+        agi_process.start()
+        signal.signal(signal.SIGTERM, stop_agi_workers)
+    else:
+        # Start AGI server in background thread
+        agi_thread = threading.Thread(target=start_agi_server, daemon=True)
+        agi_thread.start()
 
     logger.info("Starting Flask web server...")
 
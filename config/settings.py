@@ -23,27 +23,106 @@ SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-me")
 # AGI Server Configuration
 AGI_HOST = os.getenv("AGI_HOST", "0.0.0.0")
 AGI_PORT = int(os.getenv("AGI_PORT", 4573))
+AGI_LISTEN_BACKLOG = int(os.getenv("AGI_LISTEN_BACKLOG", 128))
+AGI_ENV_TIMEOUT = float(os.getenv("AGI_ENV_TIMEOUT", 10))  # seconds to receive the agi_* block
+AGI_COMMAND_TIMEOUT = float(os.getenv("AGI_COMMAND_TIMEOUT", 120))  # seconds to wait for a response
+AGI_READ_BUFFER_SIZE = int(os.getenv("AGI_READ_BUFFER_SIZE", 4096))
+AGI_WORKERS = int(os.getenv("AGI_WORKERS", 1))  # >1 pre-forks processes sharing AGI_PORT
+AGI_WORKER_RESTART_DELAY = float(os.getenv("AGI_WORKER_RESTART_DELAY", 1))  # seconds
+AGI_DRAIN_TIMEOUT = float(os.getenv("AGI_DRAIN_TIMEOUT", 90))  # seconds to finish calls on shutdown
+# Session capture for replay load tests (scripts/replay_agi.py); captures hold caller audio
+AGI_CAPTURE_ENABLED = os.getenv("AGI_CAPTURE_ENABLED", "False").lower() == "true"
+AGI_CAPTURE_DIR = Path(os.getenv("AGI_CAPTURE_DIR", str(BASE_DIR / "captures")))
+AGI_CAPTURE_SAMPLE = float(os.getenv("AGI_CAPTURE_SAMPLE", 1.0))  # fraction of calls captured
+AGI_CAPTURE_MAX_FILES = int(os.getenv("AGI_CAPTURE_MAX_FILES", 1000))  # oldest deleted beyond this
+
+# Call Capacity (admission control)
+MAX_CONCURRENT_CALLS = int(os.getenv("MAX_CONCURRENT_CALLS", 10))
+CALL_QUEUE_SIZE = int(os.getenv("CALL_QUEUE_SIZE", 10))
+CALL_QUEUE_MAX_WAIT = float(os.getenv("CALL_QUEUE_MAX_WAIT", 5))  # seconds
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", 4))  # threads for CPU-bound call steps
+# Processes for voice analysis / meow synthesis, per AGI worker (0 = run on WORKER_THREADS)
+ANALYSIS_PROCESSES = int(os.getenv("ANALYSIS_PROCESSES", max(1, (os.cpu_count() or 1) // AGI_WORKERS)))
+ANALYSIS_TASK_TIMEOUT = float(os.getenv("ANALYSIS_TASK_TIMEOUT", 30))  # seconds per analysis task
+
+# Latency budgets: how long a caller waits on a stage before it settles for a fallback
+MOCKERY_BUDGET = float(os.getenv("MOCKERY_BUDGET", 3))  # seconds from end of recording to meows
+MONOLOGUE_BUDGET = float(os.getenv("MONOLOGUE_BUDGET", 8))  # seconds from pressing 2 to a monologue
+MONOLOGUE_TTS_RESERVE = float(os.getenv("MONOLOGUE_TTS_RESERVE", 3))  # of that, kept back for TTS
+
+# Quality tiers: under load, calls get cheaper pitch detection, synthesized
+# meows and then scripted monologues (see services/quality.py). Load is the
+# share of call slots in use or the load average per CPU, whichever is higher
+QUALITY_ADAPTIVE = os.getenv("QUALITY_ADAPTIVE", "true").lower() == "true"
+QUALITY_REDUCED_AT = float(os.getenv("QUALITY_REDUCED_AT", 0.6))  # load that drops to "reduced"
+QUALITY_MINIMAL_AT = float(os.getenv("QUALITY_MINIMAL_AT", 0.9))  # load that drops to "minimal"
+QUALITY_HYSTERESIS = float(os.getenv("QUALITY_HYSTERESIS", 0.15))  # load must fall this far below to recover
+QUALITY_RECOVERY = float(os.getenv("QUALITY_RECOVERY", 30))  # seconds it must stay there per step up
+QUALITY_CHECK_INTERVAL = float(os.getenv("QUALITY_CHECK_INTERVAL", 2))  # seconds between load readings
+
+# Analysis/synthesis and TTS jobs queue shortest-expected-first; each second
+# a job waits counts as this many seconds off its expected cost
+SCHEDULER_AGING = float(os.getenv("SCHEDULER_AGING", 1.0))
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", max(1, (os.cpu_count() or 1) // AGI_WORKERS)))  # per AGI worker
 
 # Asterisk Configuration
 ASTERISK_HOST = os.getenv("ASTERISK_HOST", "localhost")
 ASTERISK_AMI_PORT = int(os.getenv("ASTERISK_AMI_PORT", 5038))
 ASTERISK_AMI_USERNAME = os.getenv("ASTERISK_AMI_USERNAME", "admin")
 ASTERISK_AMI_SECRET = os.getenv("ASTERISK_AMI_SECRET", "")
+AMI_ENABLED = os.getenv("AMI_ENABLED", "False").lower() == "true"  # live channel view over AMI
+AMI_RECONNECT_DELAY = float(os.getenv("AMI_RECONNECT_DELAY", 1))  # seconds, doubles per failure
+AMI_RECONNECT_MAX_DELAY = float(os.getenv("AMI_RECONNECT_MAX_DELAY", 30))
+AMI_PING_INTERVAL = float(os.getenv("AMI_PING_INTERVAL", 20))  # seconds between keepalives
+AMI_ACTION_TIMEOUT = float(os.getenv("AMI_ACTION_TIMEOUT", 5))  # seconds to wait for a response
 
 # Audio Configuration
 SAMPLE_RATE = int(os.getenv("SAMPLE_RATE", 8000))
 AUDIO_FORMAT = os.getenv("AUDIO_FORMAT", "wav")
 MAX_RECORDING_DURATION = int(os.getenv("MAX_RECORDING_DURATION", 60))
 CAT_MONOLOGUE_DURATION = int(os.getenv("CAT_MONOLOGUE_DURATION", 15))
+RECORD_SILENCE = int(os.getenv("RECORD_SILENCE", 3))  # seconds of silence after which Asterisk ends RECORD FILE
+
+# Voice endpointing: end the caller's turn as soon as they stop talking
+ENDPOINT_ENABLED = os.getenv("ENDPOINT_ENABLED", "true").lower() == "true"
+ENDPOINT_HANGOVER = float(os.getenv("ENDPOINT_HANGOVER", 0.8))  # seconds without speech that end the turn
+ENDPOINT_MIN_SPEECH = float(os.getenv("ENDPOINT_MIN_SPEECH", 0.2))  # seconds of speech before a turn counts
+ENDPOINT_THRESHOLD_DB = float(os.getenv("ENDPOINT_THRESHOLD_DB", -35))  # frame energy (dBFS) floor for speech
+ENDPOINT_SNR_DB = float(os.getenv("ENDPOINT_SNR_DB", 10))  # speech must be this far above the line noise
+ENDPOINT_MAX_ZCR = float(os.getenv("ENDPOINT_MAX_ZCR", 0.35))  # zero crossings per sample above which it's hiss
+ENDPOINT_POLL_INTERVAL = float(os.getenv("ENDPOINT_POLL_INTERVAL", 0.1))  # seconds between reads of a recording
+
+# EAGI live audio (calls arriving through scripts/eagi_bridge.py)
+EAGI_BUFFER_SECONDS = float(os.getenv("EAGI_BUFFER_SECONDS", 10))  # caller audio kept in memory
+EAGI_POLL_INTERVAL = float(os.getenv("EAGI_POLL_INTERVAL", 0.2))  # seconds per WAIT FOR DIGIT while listening
+EAGI_NO_SPEECH_TIMEOUT = float(os.getenv("EAGI_NO_SPEECH_TIMEOUT", 8))  # give up if nothing is said
+EAGI_SILENCE_THRESHOLD = float(os.getenv("EAGI_SILENCE_THRESHOLD", 0.02))  # frame RMS below this is silence
 
 # Audio paths
 PROMPTS_DIR = AUDIO_DIR / "prompts"
 CATS_DIR = AUDIO_DIR / "cats"
 RECORDINGS_DIR = AUDIO_DIR / "recordings"
 GENERATED_DIR = AUDIO_DIR / "generated"
+MEOW_SAMPLES_DIR = AUDIO_DIR / "meow_samples"
+# 8 kHz Asterisk-native copies of the above, made by scripts/compile_prompts.py
+COMPILED_AUDIO_DIR = AUDIO_DIR / "compiled"
+PROMPT_LOUDNESS_DBFS = float(os.getenv("PROMPT_LOUDNESS_DBFS", -20))  # compiled prompts' speech level
+
+# Played to callers turned away by admission control; falls back to the
+# Asterisk core sound when the pre-rendered prompt is missing
+BUSY_PROMPT = os.getenv("BUSY_PROMPT", "busy")
+BUSY_FALLBACK_SOUND = os.getenv("BUSY_FALLBACK_SOUND", "all-circuits-busy-now")
+
+# Looped to a caller whose monologue or meows aren't ready when the filler
+# prompts end (nothing plays if the prompt is missing)
+HOLD_PROMPT = os.getenv("HOLD_PROMPT", "hold")
+
+# Prompts are looked up in an in-memory index of PROMPTS_DIR, rescanned when
+# the directory's mtime changes (checked this often, in seconds)
+PROMPT_SCAN_INTERVAL = float(os.getenv("PROMPT_SCAN_INTERVAL", 30))
 
 # Ensure directories exist
-for directory in [PROMPTS_DIR, CATS_DIR, RECORDINGS_DIR, GENERATED_DIR, LOGS_DIR]:
+for directory in [PROMPTS_DIR, CATS_DIR, RECORDINGS_DIR, GENERATED_DIR, COMPILED_AUDIO_DIR, LOGS_DIR]:
     directory.mkdir(parents=True, exist_ok=True)
 
 # TTS Engine Configuration
@@ -52,9 +131,11 @@ PIPER_MODEL_PATH = Path(os.getenv("PIPER_MODEL_PATH", str(MODELS_DIR / "piper/en
 COQUI_MODEL_PATH = Path(os.getenv("COQUI_MODEL_PATH", str(MODELS_DIR / "coqui/")))
 
 # Voice Analysis Settings
-PITCH_DETECTION_METHOD = os.getenv("PITCH_DETECTION_METHOD", "praat")
+PITCH_DETECTION_METHOD = os.getenv("PITCH_DETECTION_METHOD", "praat")  # praat, aubio, yin or autocorrelation
 MIN_PITCH = int(os.getenv("MIN_PITCH", 75))
 MAX_PITCH = int(os.getenv("MAX_PITCH", 600))
+# yin searches the audio decimated 2x, then refines the period at the full rate
+PITCH_COARSE_TO_FINE = os.getenv("PITCH_COARSE_TO_FINE", "true").lower() == "true"
 
 # Meow Generation Settings
 MEOW_BASE_PITCH = int(os.getenv("MEOW_BASE_PITCH", 300))
@@ -70,6 +151,20 @@ CAT_PERSONALITIES = {
     "diva": os.getenv("ENABLE_DIVA_CAT", "True").lower() == "true",
 }
 
+# Speculative monologues: start one while the caller is still at the menu
+MONOLOGUE_PREWARM = os.getenv("MONOLOGUE_PREWARM", "true").lower() == "true"
+MONOLOGUE_POOL_SIZE = int(os.getenv("MONOLOGUE_POOL_SIZE", 2))  # per worker, ready plus in progress
+MONOLOGUE_POOL_TTL = float(os.getenv("MONOLOGUE_POOL_TTL", 3600))  # seconds an unplayed monologue is kept
+
+# Metrics (pre-fork workers publish snapshots here for the web process)
+METRICS_DIR = Path(os.getenv("METRICS_DIR", "/tmp/meow-now-metrics"))
+METRICS_EXPORT_INTERVAL = float(os.getenv("METRICS_EXPORT_INTERVAL", 5))  # seconds
+
+# Call tracing (flight recorder served at /calls)
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", 200))  # most recent calls kept
+TRACE_SLOWEST_PER_HOUR = int(os.getenv("TRACE_SLOWEST_PER_HOUR", 10))  # slowest calls kept per hour
+TRACE_SLOWEST_HOURS = int(os.getenv("TRACE_SLOWEST_HOURS", 24))  # hours of slowest calls kept
+
 # Logging Configuration
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FILE = LOGS_DIR / os.getenv("LOG_FILE", "meow-now.log").split("/")[-1]
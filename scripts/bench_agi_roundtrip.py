@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: round-trip cost per AGI command
+Drives AGISession against a minimal fake Asterisk over loopback and reports
+the time per command, alongside the old blocking recv(1024) session and
+pipelined AGIBatch sends for comparison
+"""
+import argparse
+import asyncio
+import socket
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agi_server import AGISession
+from services.agi_protocol import AGIProtocol
+
+ENV_BLOCK = (
+    b"agi_network: yes\n"
+    b"agi_request: agi://127.0.0.1/\n"
+    b"agi_channel: SIP/bench-00000001\n"
+    b"agi_language: en\n"
+    b"agi_type: SIP\n"
+    b"agi_uniqueid: 1700000000.1\n"
+    b"agi_callerid: 5551234567\n"
+    b"agi_calleridname: Bench\n"
+    b"agi_context: from-trunk\n"
+    b"agi_extension: 15551234567\n"
+    b"agi_priority: 3\n"
+    b"\n"
+)
+
+
+def fake_asterisk(sock: socket.socket):
+    """Send the env block, then answer every command line with 200 result=0"""
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.sendall(ENV_BLOCK)
+    pending = b""
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            break
+        pending += data
+        lines = pending.count(b"\n")
+        pending = pending[pending.rfind(b"\n") + 1:]
+        if lines:
+            sock.sendall(b"200 result=0\n" * lines)
+    sock.close()
+
+
+def start_fake_asterisk_connection(port: int):
+    sock = socket.create_connection(("127.0.0.1", port))
+    thread = threading.Thread(target=fake_asterisk, args=(sock,), daemon=True)
+    thread.start()
+    return thread
+
+
+def bench_legacy(commands: int) -> list:
+    """The pre-asyncio session: one send() and one recv(1024) per command"""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    start_fake_asterisk_connection(listener.getsockname()[1])
+    conn, _ = listener.accept()
+
+    # read_env as it used to be written
+    while True:
+        line = conn.recv(1024).decode('utf-8').strip()
+        if not line or line.endswith("agi_priority: 3"):
+            break
+
+    timings = []
+    for _ in range(commands):
+        start = time.perf_counter()
+        conn.send(b'VERBOSE "bench" 1\n')
+        conn.recv(1024)
+        timings.append(time.perf_counter() - start)
+
+    conn.close()
+    listener.close()
+    return timings
+
+
+async def bench_session(commands: int, batch_size: int = 1) -> list:
+    """The buffered asyncio session, optionally pipelining `batch_size` commands per send"""
+    loop = asyncio.get_running_loop()
+    connected = loop.create_future()
+    server = await loop.create_server(
+        lambda: AGIProtocol(connected.set_result), "127.0.0.1", 0
+    )
+    port = server.sockets[0].getsockname()[1]
+    await asyncio.to_thread(start_fake_asterisk_connection, port)
+
+    session = AGISession(await connected)
+    await session.read_env()
+
+    timings = []
+    for _ in range(commands // batch_size):
+        start = time.perf_counter()
+        await session.send_batch(['VERBOSE "bench" 1'] * batch_size)
+        elapsed = (time.perf_counter() - start) / batch_size
+        timings.extend([elapsed] * batch_size)
+
+    session.connection.close()
+    server.close()
+    await server.wait_closed()
+    return timings
+
+
+def report(name: str, timings: list):
+    timings = sorted(timings)
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"{name:<22} mean {statistics.mean(timings) * 1e6:8.1f} us   "
+          f"p50 {statistics.median(timings) * 1e6:8.1f} us   p99 {p99 * 1e6:8.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--commands", type=int, default=5000,
+                        help="commands per run (default: 5000)")
+    args = parser.parse_args()
+
+    print(f"Round trip per AGI command over loopback ({args.commands} commands)")
+    report("legacy recv(1024)", bench_legacy(args.commands))
+    report("buffered AGISession", asyncio.run(bench_session(args.commands)))
+    report("pipelined batch of 3", asyncio.run(bench_session(args.commands, batch_size=3)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Benchmark: pitch detectors on caller-length recordings
+Runs each pitch detector VoiceAnalyzer has (those whose libraries are
+installed) over synthetic speech of known pitch, 10, 30 and 60 seconds long
+by default, and reports the time per recording, the speedup over a
+reference, and how far the detected pitch is from the true one.
+
+The references are the detectors as they used to be, kept here for
+comparison: for Praat, per-frame extraction (a "Get value at time" call
+every 10ms); for autocorrelation, np.correlate on one frame at a time.
+Coarse-to-fine YIN is compared with YIN searching at the full rate. A
+detector's "match" is the share of its reference's pitch frames it also
+finds, within MATCH_CENTS.
+
+Usage:
+    python scripts/bench_pitch_detectors.py
+    python scripts/bench_pitch_detectors.py --durations 60 --repeat 5 --detectors praat
+"""
+import argparse
+import statistics
+import sys
+import time
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import settings
+from services import voice_analyzer
+from services.voice_analyzer import VoiceAnalyzer
+
+# Detections this close to the reference's count as the same
+MATCH_CENTS = 50
+
+
+def synthetic_speech(seconds: float, sr: int = settings.SAMPLE_RATE,
+                     seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Speech-like audio: voiced phrases with a wandering pitch between
+    pauses, plus background noise. Returns the audio and the true pitch of
+    each sample (0 where unvoiced).
+    """
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sr)
+    f0 = np.zeros(n)
+    position = 0
+    while position < n:
+        phrase = int(rng.uniform(0.4, 2.0) * sr)
+        base = rng.uniform(90, 260)
+        t = np.arange(min(phrase, n - position)) / sr
+        f0[position:position + len(t)] = base * (1 + 0.12 * np.sin(2 * np.pi * rng.uniform(0.5, 2) * t))
+        position += phrase + int(rng.uniform(0.1, 0.5) * sr)
+
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+    # Syllable-rate loudness changes
+    envelope = 0.5 + 0.5 * np.abs(np.sin(np.pi * 4 * np.arange(n) / sr))
+    audio = 0.3 * voice * envelope * (f0 > 0) + 0.005 * rng.standard_normal(n)
+    return audio.astype(np.float64), f0
+
+
+def praat_per_frame(analyzer: VoiceAnalyzer, audio: np.ndarray, sr: int) -> Dict:
+    """The Praat detector as it was: one Python->Praat call per 10ms frame"""
+    sound = voice_analyzer.parselmouth.Sound(audio, sampling_frequency=sr)
+    pitch = voice_analyzer.call(sound, "To Pitch", 0.0, settings.MIN_PITCH, settings.MAX_PITCH)
+    times, pitches = [], []
+    for t in np.arange(0, sound.duration, 0.01):
+        value = voice_analyzer.call(pitch, "Get value at time", t, "Hertz", "Linear")
+        if value is not None and not np.isnan(value):
+            times.append(t)
+            pitches.append(value)
+    return {'times': np.array(times), 'pitches': np.array(pitches)}
+
+
+def _correlate_frame_pitch(frame: np.ndarray, sr: int) -> float:
+    corr = np.correlate(frame, frame, mode='full')
+    corr = corr[len(corr) // 2:]
+    min_lag = int(sr / settings.MAX_PITCH)
+    max_lag = int(sr / settings.MIN_PITCH)
+    if max_lag < len(corr):
+        pitch = sr / (np.argmax(corr[min_lag:max_lag]) + min_lag)
+        if settings.MIN_PITCH < pitch < settings.MAX_PITCH:
+            return pitch
+    return 0.0
+
+
+def autocorrelation_per_frame(audio: np.ndarray, sr: int) -> Dict:
+    """The autocorrelation detector as it was: np.correlate per 30ms frame in a Python loop"""
+    frame_size, hop_size = int(0.03 * sr), int(0.01 * sr)
+    times, pitches = [], []
+    for i in range(0, len(audio) - frame_size, hop_size):
+        pitch = _correlate_frame_pitch(audio[i:i + frame_size], sr)
+        if pitch:
+            times.append(i / sr)
+            pitches.append(pitch)
+    return {'times': np.array(times), 'pitches': np.array(pitches)}
+
+
+def detectors(analyzer: VoiceAnalyzer) -> Dict[str, Tuple[Callable, str]]:
+    """name -> (detect(audio, sr), name of the detector it is compared with)"""
+    found = {}
+    if voice_analyzer.PRAAT_AVAILABLE:
+        found['praat (per frame)'] = (lambda audio, sr: praat_per_frame(analyzer, audio, sr), None)
+        found['praat'] = (analyzer._detect_pitch_praat, 'praat (per frame)')
+    if voice_analyzer.AUBIO_AVAILABLE:
+        found['aubio'] = (analyzer._detect_pitch_aubio, None)
+    found['yin (full rate)'] = (partial(analyzer._detect_pitch_yin, coarse_to_fine=False), None)
+    found['yin (coarse to fine)'] = (partial(analyzer._detect_pitch_yin, coarse_to_fine=True), 'yin (full rate)')
+    found['autocorrelation (per frame)'] = (autocorrelation_per_frame, None)
+    found['autocorrelation'] = (analyzer._detect_pitch_basic, 'autocorrelation (per frame)')
+    return found
+
+
+def pitch_error_cents(pitch_data: Dict, f0: np.ndarray, sr: int) -> float:
+    """Median distance from the true pitch, in cents, over frames detected as voiced where it is"""
+    times, pitches = pitch_data['times'], pitch_data['pitches']
+    if len(times) == 0:
+        return float('nan')
+    truth = f0[np.minimum((np.asarray(times) * sr).astype(int), len(f0) - 1)]
+    voiced = truth > 0
+    if not voiced.any():
+        return float('nan')
+    return float(np.median(np.abs(1200 * np.log2(pitches[voiced] / truth[voiced]))))
+
+
+def match_rate(result: Dict, reference: Dict) -> float:
+    """Share of the reference's pitch frames found at the same time within MATCH_CENTS"""
+    if len(reference['times']) == 0:
+        return float('nan')
+    detected = dict(zip(np.round(result['times'], 4), result['pitches']))
+    matches = 0
+    for t, pitch in zip(np.round(reference['times'], 4), reference['pitches']):
+        found = detected.get(t)
+        matches += found is not None and abs(1200 * np.log2(found / pitch)) <= MATCH_CENTS
+    return matches / len(reference['times'])
+
+
+def bench(detect: Callable, audio: np.ndarray, sr: int, repeat: int) -> Tuple[List[float], Dict]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = detect(audio, sr)
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--durations", type=float, nargs="+", default=[10, 30, 60],
+                        help="recording lengths in seconds (default: 10 30 60)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per detector (default: 3)")
+    parser.add_argument("--detectors", nargs="+",
+                        help="only these detectors (default: every one installed)")
+    args = parser.parse_args()
+
+    analyzer = VoiceAnalyzer()
+    available = detectors(analyzer)
+    selected = {name: entry for name, entry in available.items()
+                if not args.detectors or name.split(" (")[0] in args.detectors}
+    missing = [name for name in ('praat', 'aubio') if name not in available]
+    if missing:
+        print(f"Not installed, skipped: {', '.join(missing)}")
+
+    sr = settings.SAMPLE_RATE
+    for seconds in args.durations:
+        audio, f0 = synthetic_speech(seconds, sr)
+        print(f"\n{seconds:g}s recording at {sr} Hz ({args.repeat} runs each)")
+        medians, results = {}, {}
+        for name, (detect, reference) in selected.items():
+            timings, results[name] = bench(detect, audio, sr, args.repeat)
+            result = results[name]
+            medians[name] = statistics.median(timings)
+            speedup = ""
+            if reference in medians:
+                speedup = (f"   {medians[reference] / medians[name]:6.1f}x vs {reference}, "
+                           f"match {match_rate(result, results[reference]):.1%}")
+            print(f"  {name:<27} median {medians[name] * 1000:9.1f} ms   "
+                  f"voiced frames {len(result['pitches']):5d}   "
+                  f"error {pitch_error_cents(result, f0, sr):6.1f} cents{speedup}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
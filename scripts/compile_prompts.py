@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Compile IVR audio into Asterisk-native formats
+Renders every prompt (audio/prompts), pre-recorded cat monologue
+(audio/cats) and meow sample (audio/meow_samples) to 8 kHz mono,
+normalizes its loudness to PROMPT_LOUDNESS_DBFS, and writes .sln, .ulaw,
+.alaw and (with sox installed) .gsm copies under audio/compiled/, plus a
+manifest.json describing each one.
+
+Asterisk plays whichever variant of a sound needs no transcoding for the
+channel's codec, and the AGI server's prompt index prefers the compiled
+copies, so playback costs Asterisk no translation CPU. Only new or changed
+sources are recompiled; compiled sounds whose source is gone are removed.
+
+Usage:
+    python scripts/compile_prompts.py            # compile what changed
+    python scripts/compile_prompts.py --force    # recompile everything
+    python scripts/compile_prompts.py --check    # exit 1 if anything is stale
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import soundfile as sf
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import settings
+from services.audio_codecs import (COMPILED_FORMATS, TELEPHONY_RATE, encode, gsm_available,
+                                   normalize_loudness, to_pcm16, to_telephony, write_gsm)
+
+MANIFEST_VERSION = 1
+SOURCE_EXTENSIONS = ('.wav', '.flac', '.ogg')
+
+# Compiled subdirectory -> source directory
+SOURCES = {
+    'prompts': settings.PROMPTS_DIR,
+    'cats': settings.CATS_DIR,
+    'meow_samples': settings.MEOW_SAMPLES_DIR,
+}
+
+
+def manifest_path() -> Path:
+    return settings.COMPILED_AUDIO_DIR / "manifest.json"
+
+
+def load_manifest() -> Dict:
+    try:
+        manifest = json.loads(manifest_path().read_text())
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {'version': MANIFEST_VERSION, 'sounds': {}}
+
+
+def find_sources() -> List[Tuple[str, Path]]:
+    """(manifest key, source file) for every compilable sound"""
+    found = []
+    for group, directory in SOURCES.items():
+        if not directory.is_dir():
+            continue
+        for path in sorted(directory.iterdir()):
+            if path.suffix.lower() in SOURCE_EXTENSIONS and path.is_file():
+                found.append((f"{group}/{path.stem}", path))
+    return found
+
+
+def is_current(entry: Dict, source: Path, formats: List[str], loudness: float) -> bool:
+    stat = source.stat()
+    return (entry is not None
+            and entry.get('source_size') == stat.st_size
+            and entry.get('source_mtime_ns') == stat.st_mtime_ns
+            and entry.get('loudness_target') == loudness
+            and set(formats) <= set(entry.get('formats', []))
+            and all((settings.COMPILED_AUDIO_DIR / f"{entry['key']}.{fmt}").exists()
+                    for fmt in entry.get('formats', [])))
+
+
+def write_atomic(path: Path, data: bytes):
+    # Asterisk and the prompt index never see a half-written file
+    temp = path.with_name(f".{path.name}.tmp")
+    temp.write_bytes(data)
+    os.replace(temp, path)
+
+
+def compile_sound(key: str, source: Path, formats: List[str], loudness: float) -> Dict:
+    audio, sample_rate = sf.read(str(source), dtype='float32', always_2d=False)
+    audio = to_telephony(audio, sample_rate)
+    audio, levels = normalize_loudness(audio, loudness)
+    pcm = to_pcm16(audio)
+
+    target = settings.COMPILED_AUDIO_DIR / key
+    target.parent.mkdir(parents=True, exist_ok=True)
+    for fmt in formats:
+        if fmt == 'gsm':
+            temp = target.with_name(f".{target.name}.gsm.tmp")
+            write_gsm(target.with_suffix('.sln'), temp)
+            os.replace(temp, target.with_suffix('.gsm'))
+        else:
+            write_atomic(target.with_suffix(f'.{fmt}'), encode(pcm, fmt))
+
+    stat = source.stat()
+    return {
+        'key': key,
+        'source': str(source.relative_to(settings.AUDIO_DIR)),
+        'source_size': stat.st_size,
+        'source_mtime_ns': stat.st_mtime_ns,
+        'source_sample_rate': sample_rate,
+        'duration': round(len(pcm) / TELEPHONY_RATE, 3),
+        'loudness_target': loudness,
+        **levels,
+        'formats': formats,
+    }
+
+
+def remove_compiled(key: str, entry: Dict):
+    for fmt in entry.get('formats', COMPILED_FORMATS):
+        (settings.COMPILED_AUDIO_DIR / f"{key}.{fmt}").unlink(missing_ok=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile IVR audio into Asterisk-native formats")
+    parser.add_argument("--force", action="store_true", help="recompile even if up to date")
+    parser.add_argument("--check", action="store_true",
+                        help="only report what is out of date (exit 1 if anything is)")
+    parser.add_argument("--loudness", type=float, default=settings.PROMPT_LOUDNESS_DBFS,
+                        help="target speech level in dBFS (default: PROMPT_LOUDNESS_DBFS)")
+    args = parser.parse_args()
+
+    formats = [fmt for fmt in COMPILED_FORMATS if fmt != 'gsm' or gsm_available()]
+    if 'gsm' not in formats:
+        print("sox not found: skipping .gsm (install sox to compile GSM prompts)")
+
+    manifest = load_manifest()
+    sounds = manifest['sounds']
+    sources = find_sources()
+    stale = [(key, source) for key, source in sources
+             if args.force or not is_current(sounds.get(key), source, formats, args.loudness)]
+    removed = sorted(set(sounds) - {key for key, _ in sources})
+
+    if args.check:
+        for key, source in stale:
+            print(f"  stale: {key} ({source})")
+        for key in removed:
+            print(f"  orphaned: {key}")
+        print(f"{len(sources) - len(stale)}/{len(sources)} sounds up to date")
+        return 1 if stale or removed else 0
+
+    failed = 0
+    for key, source in stale:
+        try:
+            entry = compile_sound(key, source, formats, args.loudness)
+        except Exception as e:
+            print(f"  ✗ {key}: {e}")
+            failed += 1
+            continue
+        sounds[key] = entry
+        print(f"  ✓ {key}: {entry['duration']:.1f}s, {entry['gain_db']:+.1f} dB "
+              f"-> {', '.join(formats)}")
+
+    for key in removed:
+        remove_compiled(key, sounds.pop(key))
+        print(f"  - {key}: source removed")
+
+    manifest.update(sample_rate=TELEPHONY_RATE, compiled_at=time.time())
+    write_atomic(manifest_path(), json.dumps(manifest, indent=1, sort_keys=True).encode())
+    print(f"Compiled {len(stale) - failed} of {len(sources)} sounds into {settings.COMPILED_AUDIO_DIR}"
+          f" ({len(sources) - len(stale)} already up to date)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+EAGI bridge for Meow-Now
+Asterisk only hands a script the caller's live audio (fd 3) when it runs
+it locally with EAGI(), not over FastAGI. This bridge is that local script:
+it connects to the Meow-Now AGI server, relays the AGI conversation between
+Asterisk (stdin/stdout) and the server, and forwards the caller's audio on
+the same connection as framed binary chunks (see services/agi_protocol.py),
+so the server can analyze the caller while they talk.
+
+Standard library only; copy it into Asterisk's agi-bin and use it in the
+dialplan in place of AGI(agi://...):
+
+    same => n,EAGI(eagi_bridge.py,meow-now,4573)
+"""
+import os
+import socket
+import sys
+import threading
+
+AUDIO_FD = 3
+AUDIO_CHUNK = 4096  # bytes per read; Asterisk writes 20ms (320 byte) frames
+
+
+def frame(payload: bytes) -> bytes:
+    return b"\x00" + len(payload).to_bytes(2, "big") + payload
+
+
+def main():
+    host = sys.argv[1] if len(sys.argv) > 1 else os.getenv("MEOW_AGI_HOST", "127.0.0.1")
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else int(os.getenv("MEOW_AGI_PORT", 4573))
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout.buffer
+
+    # The agi_* environment, up to its blank line
+    env = []
+    for line in stdin:
+        if not line.strip():
+            break
+        env.append(line)
+
+    sock = socket.create_connection((host, port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    send_lock = threading.Lock()
+
+    def send(data: bytes):
+        with send_lock:
+            sock.sendall(data)
+
+    send(b"".join(env) + b"agi_audio_stream: slin8\n\n")
+
+    def relay_responses():
+        # Asterisk's replies (and an unsolicited HANGUP) to the server, line by line
+        try:
+            for line in stdin:
+                send(line)
+        except OSError:
+            pass
+        finally:
+            try:
+                sock.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+
+    def relay_audio():
+        try:
+            while True:
+                data = os.read(AUDIO_FD, AUDIO_CHUNK)
+                if not data:
+                    break
+                send(frame(data))
+        except OSError:
+            pass
+
+    threading.Thread(target=relay_responses, daemon=True).start()
+    threading.Thread(target=relay_audio, daemon=True).start()
+
+    # The server's commands to Asterisk until the server hangs up
+    with sock.makefile("rb") as commands:
+        for line in commands:
+            stdout.write(line)
+            stdout.flush()
+
+    # Threads may still be blocked reading from Asterisk
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Fake Asterisk Manager Interface server
+Speaks enough AMI for services.ami_client: banner, Login, Ping, Logoff,
+CoreShowChannels and PlayDTMF, and generates synthetic inbound call
+traffic (Newchannel, Newstate, Newexten into the AGI, Hangup) so the live
+channel view can be exercised without Asterisk. Like Asterisk, it only sends
+a client the event classes its Login `Events` asked for.
+
+Usage:
+    python scripts/fake_ami.py --port 5038 --calls-per-second 2 --hold-time 20
+    python scripts/fake_ami.py --check   # start a server, connect AMIClient to it, print the view
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import settings
+
+BANNER = b"Asterisk Call Manager/7.0.3\r\n"
+
+# Event class of each event the fake sends, as in Asterisk's manager docs
+EVENT_CLASSES = {
+    'Newchannel': 'call', 'Newstate': 'call', 'Hangup': 'call', 'Rename': 'call',
+    'Newexten': 'dialplan',
+    'QueueCallerJoin': 'agent', 'QueueCallerLeave': 'agent', 'QueueCallerAbandon': 'agent',
+}
+
+
+def format_message(fields: Dict[str, str]) -> bytes:
+    return ("".join(f"{key}: {value}\r\n" for key, value in fields.items()) + "\r\n").encode()
+
+
+def event_mask(events: str) -> Optional[Set[str]]:
+    """The event classes a Login `Events` value subscribes to (None: all)"""
+    events = events.strip().lower()
+    if events in ("", "on", "all"):
+        return None
+    if events == "off":
+        return set()
+    return {name.strip() for name in events.split(",")}
+
+
+class FakeAMIServer:
+    """AMI server with a simulated set of inbound calls"""
+
+    def __init__(self, username: str = "admin", secret: str = "",
+                 calls_per_second: float = 1.0, hold_time: float = 20.0,
+                 pre_agi_time: float = 2.0):
+        self.username = username
+        self.secret = secret
+        self.calls_per_second = calls_per_second
+        self.hold_time = hold_time
+        self.pre_agi_time = pre_agi_time
+        self.channels: Dict[str, Dict[str, str]] = {}
+        # Channel name -> callback for digits "received" with PlayDTMF Receive: true
+        self.dtmf_listeners: Dict[str, Callable[[str], None]] = {}
+        self.clients: Set[asyncio.StreamWriter] = set()
+        self._event_masks: Dict[asyncio.StreamWriter, Optional[Set[str]]] = {}
+        self.server = None
+        self._ids = itertools.count(1)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self.server = await asyncio.start_server(self._handle_client, host, port)
+        if self.calls_per_second > 0:
+            asyncio.get_running_loop().create_task(self._generate_calls())
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        for writer in list(self.clients):
+            writer.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    # Client connections
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.write(BANNER)
+        logged_in = False
+        try:
+            while True:
+                message = await self._read_message(reader)
+                if message is None:
+                    break
+                action = message.get('Action', '').lower()
+                reply = {'ActionID': message.get('ActionID', '')}
+
+                if action == 'login':
+                    if message.get('Username') == self.username and message.get('Secret') == self.secret:
+                        logged_in = True
+                        self.clients.add(writer)
+                        self._event_masks[writer] = event_mask(message.get('Events', ''))
+                        writer.write(format_message({'Response': 'Success', **reply,
+                                                     'Message': 'Authentication accepted'}))
+                    else:
+                        writer.write(format_message({'Response': 'Error', **reply,
+                                                     'Message': 'Authentication failed'}))
+                        break
+                elif not logged_in:
+                    writer.write(format_message({'Response': 'Error', **reply,
+                                                 'Message': 'Missing authentication'}))
+                elif action == 'ping':
+                    writer.write(format_message({'Response': 'Success', **reply, 'Ping': 'Pong',
+                                                 'Timestamp': f"{time.time():.6f}"}))
+                elif action == 'coreshowchannels':
+                    writer.write(format_message({'Response': 'Success', **reply,
+                                                 'EventList': 'start',
+                                                 'Message': 'Channels will follow'}))
+                    for channel in list(self.channels.values()):
+                        writer.write(format_message({'Event': 'CoreShowChannel', **reply, **channel}))
+                    writer.write(format_message({'Event': 'CoreShowChannelsComplete', **reply,
+                                                 'EventList': 'Complete',
+                                                 'ListItems': str(len(self.channels))}))
+                elif action == 'playdtmf':
+                    name = message.get('Channel')
+                    known = any(c['Channel'] == name for c in self.channels.values())
+                    listener = self.dtmf_listeners.get(name)
+                    if listener is not None and message.get('Receive', '').lower() == 'true':
+                        listener(message.get('Digit', ''))
+                    if known or listener is not None:
+                        writer.write(format_message({'Response': 'Success', **reply,
+                                                     'Message': 'DTMF successfully queued'}))
+                    else:
+                        writer.write(format_message({'Response': 'Error', **reply,
+                                                     'Message': 'Channel not found'}))
+                elif action == 'logoff':
+                    writer.write(format_message({'Response': 'Goodbye', **reply,
+                                                 'Message': 'Thanks for all the fish.'}))
+                    break
+                else:
+                    writer.write(format_message({'Response': 'Error', **reply,
+                                                 'Message': 'Invalid/unknown command'}))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Cancelled when the event loop shuts down with clients connected
+            pass
+        finally:
+            self.clients.discard(writer)
+            self._event_masks.pop(writer, None)
+            writer.close()
+
+    @staticmethod
+    async def _read_message(reader: asyncio.StreamReader):
+        message = {}
+        while True:
+            line = await reader.readline()
+            if not line:
+                return None
+            line = line.decode().rstrip('\r\n')
+            if not line:
+                if message:
+                    return message
+                continue
+            key, _, value = line.partition(':')
+            message[key.strip()] = value.strip()
+
+    def broadcast(self, event: Dict[str, str]):
+        data = format_message(event)
+        event_class = EVENT_CLASSES.get(event.get('Event', ''), 'call')
+        for writer in list(self.clients):
+            mask = self._event_masks.get(writer)
+            if writer.is_closing():
+                self.clients.discard(writer)
+            elif mask is None or event_class in mask:
+                writer.write(data)
+
+    # Simulated calls
+
+    async def _generate_calls(self):
+        while True:
+            await asyncio.sleep(random.expovariate(self.calls_per_second))
+            asyncio.get_running_loop().create_task(self.simulate_call())
+
+    async def simulate_call(self):
+        """One inbound call: ring, answer, wait, AGI, hang up"""
+        number = next(self._ids)
+        uniqueid = f"{time.time():.0f}.{number}"
+        channel = {
+            'Channel': f"PJSIP/numberbarn-{number:08x}",
+            'ChannelState': '4',
+            'ChannelStateDesc': 'Ring',
+            'CallerIDNum': f"555{random.randint(1000000, 9999999)}",
+            'Context': 'from-trunk',
+            'Exten': '15551234567',
+            'Application': '',
+            'Uniqueid': uniqueid,
+        }
+        self.channels[uniqueid] = channel
+        self.broadcast({'Event': 'Newchannel', **channel})
+
+        await asyncio.sleep(self.pre_agi_time / 2)
+        channel.update(ChannelState='6', ChannelStateDesc='Up', Application='Wait')
+        self.broadcast({'Event': 'Newstate', **channel})
+        self.broadcast({'Event': 'Newexten', **channel, 'Extension': channel['Exten'],
+                        'AppData': '1'})
+
+        await asyncio.sleep(self.pre_agi_time / 2)
+        channel['Application'] = 'AGI'
+        self.broadcast({'Event': 'Newexten', **channel, 'Extension': channel['Exten'],
+                        'AppData': f"agi://{settings.AGI_HOST}:{settings.AGI_PORT}"})
+
+        await asyncio.sleep(random.expovariate(1 / self.hold_time))
+        self.channels.pop(uniqueid, None)
+        self.broadcast({'Event': 'Hangup', **channel, 'Cause': '16',
+                        'Cause-txt': 'Normal Clearing'})
+
+
+async def check(args):
+    """Connect the real AMIClient to a fake server and watch the view"""
+    from services.ami_client import AMIClient
+
+    server = FakeAMIServer(secret="check", calls_per_second=args.calls_per_second,
+                           hold_time=args.hold_time, pre_agi_time=args.pre_agi_time)
+    port = await server.start()
+    client = AMIClient("127.0.0.1", port, "admin", "check")
+    client.start()
+    if not await client.wait_connected(5):
+        print("AMI client failed to log in")
+        return 1
+
+    in_sync = True
+    for _ in range(args.duration):
+        await asyncio.sleep(1)
+        in_sync &= len(server.channels) == client.view.active_channels
+        print(f"fake={len(server.channels):3d}  client={client.stats()}")
+
+    await server.close()
+    await asyncio.sleep(0.5)
+    print(f"after server close: {client.stats()}")
+    in_sync &= not client.connected and client.view.active_channels == 0
+    await client.stop()
+    print("OK" if in_sync else "MISMATCH")
+    return 0 if in_sync else 1
+
+
+async def serve(args):
+    server = FakeAMIServer(args.username, args.secret, args.calls_per_second,
+                           args.hold_time, args.pre_agi_time)
+    port = await server.start(args.host, args.port)
+    print(f"Fake AMI listening on {args.host}:{port} (user {args.username!r})")
+    while True:
+        await asyncio.sleep(5)
+        print(f"{len(server.channels)} simulated channels, {len(server.clients)} AMI client(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Asterisk Manager Interface server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=settings.ASTERISK_AMI_PORT)
+    parser.add_argument("--username", default=settings.ASTERISK_AMI_USERNAME)
+    parser.add_argument("--secret", default=settings.ASTERISK_AMI_SECRET)
+    parser.add_argument("--calls-per-second", type=float, default=1.0,
+                        help="simulated call arrival rate (0 for none)")
+    parser.add_argument("--hold-time", type=float, default=20.0,
+                        help="mean seconds a simulated call stays up")
+    parser.add_argument("--pre-agi-time", type=float, default=2.0,
+                        help="seconds from channel creation to reaching the AGI")
+    parser.add_argument("--check", action="store_true",
+                        help="run a server and an AMIClient against it, print the view and exit")
+    parser.add_argument("--duration", type=int, default=5, help="seconds to run --check")
+    args = parser.parse_args()
+
+    try:
+        return asyncio.run(check(args) if args.check else serve(args))
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
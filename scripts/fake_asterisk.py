@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Fake Asterisk load generator
+Opens concurrent FastAGI connections to the AGI server and plays the part of
+Asterisk: sends an agi_* environment block, answers GET DATA with DTMF,
+"records" by copying a WAV to the requested path, and reports calls/sec,
+time-to-first-meow percentiles and error rates. No telephony stack needed.
+With --eagi it plays an EAGI call through scripts/eagi_bridge.py instead:
+the caller's audio is streamed live on the connection in 20ms frames.
+With --realtime-record RECORD FILE writes the recording as the caller talks
+and stops on silence like Asterisk; add --ami-port to also serve a fake AMI
+whose PlayDTMF can stop it early (point the server's AMI settings at it).
+
+Usage:
+    python scripts/fake_asterisk.py --calls 200 --concurrency 20 --digits 1,2
+    python scripts/fake_asterisk.py --wav caller.wav --record-delay 4 --realtime-playback
+    python scripts/fake_asterisk.py --abandon 0.3   # 30% hang up right after recording
+    python scripts/fake_asterisk.py --eagi --digits 1
+    python scripts/fake_asterisk.py --digits 1 --realtime-record --ami-port 5039
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import shutil
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import soundfile as sf
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import settings
+from services.audio_stream import encode_frame
+from scripts.fake_ami import FakeAMIServer
+
+FRAME_SECONDS = 0.02  # Asterisk sends 20ms of audio per frame
+
+_call_ids = itertools.count(1)
+
+
+def build_env(call_number: int, extension: str = "15551234567") -> Dict[str, str]:
+    """A realistic agi_* block, as Asterisk sends it for an inbound trunk call"""
+    callerid = f"555{random.randint(1000000, 9999999)}"
+    return {
+        "agi_network": "yes",
+        "agi_network_script": "",
+        "agi_request": f"agi://{settings.AGI_HOST}:{settings.AGI_PORT}",
+        "agi_channel": f"PJSIP/numberbarn-{call_number:08x}",
+        "agi_language": "en",
+        "agi_type": "PJSIP",
+        "agi_uniqueid": f"{time.time():.6f}",
+        "agi_version": "18.20.0",
+        "agi_callerid": callerid,
+        "agi_calleridname": "Load Test",
+        "agi_callingpres": "0",
+        "agi_callingani2": "0",
+        "agi_callington": "0",
+        "agi_callingtns": "0",
+        "agi_dnid": extension,
+        "agi_rdnis": "unknown",
+        "agi_context": "from-trunk",
+        "agi_extension": extension,
+        "agi_priority": "3",
+        "agi_enhanced": "0.0",
+        "agi_accountcode": "",
+        "agi_threadid": str(random.randint(100000000000, 999999999999)),
+    }
+
+
+def synth_caller_wav(path: Path, duration: float = 4.0, sample_rate: int = 8000):
+    """Speech-like test audio: voiced bursts with a wandering pitch and pauses"""
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    pitch = 140 + 40 * np.sin(2 * np.pi * 0.7 * t)
+    voiced = np.sin(2 * np.pi * np.cumsum(pitch) / sample_rate)
+    voiced += 0.4 * np.sin(4 * np.pi * np.cumsum(pitch) / sample_rate)
+    syllables = (np.sin(2 * np.pi * 2.5 * t) > -0.2).astype(float)
+    audio = 0.4 * voiced * syllables + 0.01 * np.random.randn(len(t))
+    sf.write(path, audio.astype(np.float32), sample_rate)
+
+
+def audio_duration(path: str) -> float:
+    """Length of the first existing file Asterisk would pick for a sound name"""
+    for ext in (".wav", ".sln", ".ulaw", ".alaw", ".gsm"):
+        candidate = Path(path + ext)
+        if candidate.exists():
+            if ext == ".wav":
+                return sf.info(str(candidate)).duration
+            bytes_per_second = {".sln": 16000, ".ulaw": 8000, ".alaw": 8000, ".gsm": 1650}[ext]
+            return candidate.stat().st_size / bytes_per_second
+    return 0.0
+
+
+def load_pcm(path: Path, sample_rate: int = 8000) -> bytes:
+    """A WAV as the 16-bit mono samples EAGI streams"""
+    audio, sr = sf.read(str(path), dtype="float32")
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    if sr != sample_rate:
+        positions = np.linspace(0, len(audio) - 1, int(len(audio) * sample_rate / sr))
+        audio = np.interp(positions, np.arange(len(audio)), audio)
+    return (np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes()
+
+
+def quoted_args(command: str) -> List[str]:
+    return command.split('"')[1::2]
+
+
+class CallResult:
+    """Outcome of one simulated call"""
+
+    def __init__(self, digit: str):
+        self.digit = digit
+        self.ok = False
+        self.busy = False
+        self.abandoned = False
+        self.error: Optional[str] = None
+        self.time_to_first_meow: Optional[float] = None
+        self.duration = 0.0
+        self.commands: List[str] = []
+
+
+class FakeAsteriskCall:
+    """Drives one FastAGI session the way Asterisk would"""
+
+    def __init__(self, host: str, port: int, digit: str, caller_wav: Path,
+                 record_delay: float = 0.0, playback_delay: float = 0.0,
+                 realtime_playback: bool = False, timeout: float = 300.0,
+                 abandon: bool = False, eagi: bool = False, realtime_record: bool = False,
+                 ami: Optional[FakeAMIServer] = None):
+        self.host = host
+        self.port = port
+        self.digit = digit
+        self.caller_wav = caller_wav
+        self.record_delay = record_delay
+        self.playback_delay = playback_delay
+        self.realtime_playback = realtime_playback
+        self.timeout = timeout
+        self.abandon = abandon
+        self.eagi = eagi
+        self.realtime_record = realtime_record
+        self.ami = ami
+        self._digits: asyncio.Queue = asyncio.Queue()  # DTMF "received" through AMI
+        self._talking: Optional[asyncio.Event] = None  # EAGI: caller starts speaking
+        self._spoken = False  # EAGI: caller has said everything
+
+    async def run(self) -> CallResult:
+        result = CallResult(self.digit)
+        start = time.monotonic()
+        writer = None
+        streamer = None
+        try:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+            env = build_env(next(_call_ids))
+            channel = env["agi_channel"]
+            if self.ami is not None:
+                self.ami.dtmf_listeners[channel] = self._digits.put_nowait
+            if self.eagi:
+                env.update(agi_enhanced="1.0", agi_audio_stream="slin8")
+            writer.write("".join(f"{k}: {v}\n" for k, v in env.items()).encode() + b"\n")
+            await writer.drain()
+            if self.eagi:
+                self._talking = asyncio.Event()
+                streamer = asyncio.get_running_loop().create_task(self._stream_audio(writer))
+
+            while True:
+                line = await asyncio.wait_for(reader.readline(), self.timeout)
+                if not line:
+                    result.error = "closed without HANGUP"
+                    break
+                command = line.decode().strip()
+                result.commands.append(command)
+
+                response = await self.respond(command, result, start)
+                writer.write(response.encode() + b"\n")
+                await writer.drain()
+                if self.abandon and self._starts_generation(command):
+                    # Caller hangs up while the meows / monologue are being made
+                    result.abandoned = result.ok = True
+                    writer.write(b"HANGUP\n")
+                    break
+                if command == "HANGUP":
+                    result.ok = True
+                    break
+
+        except asyncio.TimeoutError:
+            result.error = "timeout"
+        except (ConnectionError, OSError) as e:
+            result.error = type(e).__name__
+        finally:
+            if streamer is not None:
+                streamer.cancel()
+            if self.ami is not None:
+                self.ami.dtmf_listeners.pop(channel, None)
+            if writer is not None:
+                writer.close()
+            result.duration = time.monotonic() - start
+        return result
+
+    async def _stream_audio(self, writer: asyncio.StreamWriter):
+        """EAGI: silence until the caller is asked to talk, then their audio, then silence"""
+        frame_bytes = int(8000 * FRAME_SECONDS) * 2
+        silence = bytes(frame_bytes)
+        speech = load_pcm(self.caller_wav)
+        loop = asyncio.get_running_loop()
+        next_frame = loop.time()
+        offset = None
+        while not writer.is_closing():
+            if offset is None and self._talking.is_set():
+                offset = 0
+            if offset is not None and offset < len(speech):
+                chunk = speech[offset:offset + frame_bytes]
+                offset += frame_bytes
+            else:
+                chunk = silence
+                self._spoken = offset is not None
+            writer.write(encode_frame(chunk))
+            next_frame += FRAME_SECONDS
+            await asyncio.sleep(max(next_frame - loop.time(), 0))
+
+    async def respond(self, command: str, result: CallResult, start: float) -> str:
+        verb = command.split(" ", 2)
+        if command.startswith("STREAM FILE"):
+            sound = quoted_args(command)[0]
+            if "busy" in sound:
+                result.busy = True
+            if result.time_to_first_meow is None and self._is_meow(sound):
+                result.time_to_first_meow = time.monotonic() - start
+            escape_digits = (quoted_args(command)[1:] or [""])[0]
+            digit = await self._play(sound, escape_digits)
+            return f"200 result={ord(digit) if digit else 0} endpos=8000"
+        if command.startswith("GET DATA"):
+            await self._play(quoted_args(command)[0])
+            return f"200 result={self.digit}"
+        if command.startswith("WAIT FOR DIGIT"):
+            if self._talking is not None:
+                self._talking.set()
+            await asyncio.sleep(max(int(command.split()[3]), 0) / 1000)
+            return "200 result=0"
+        if command.startswith("RECORD FILE"):
+            path = quoted_args(command)[0]
+            fmt = command.split('"')[2].split()[0]
+            if self.realtime_record:
+                return await self._record(f"{path}.{fmt}", command)
+            await asyncio.sleep(self.record_delay)
+            shutil.copyfile(self.caller_wav, f"{path}.{fmt}")
+            return "200 result=0 (timeout) endpos=32000"
+        if verb[0] in ("ANSWER", "VERBOSE", "HANGUP", "NOOP") or command.startswith(("SET VARIABLE", "EXEC")):
+            return "200 result=1" if verb[0] in ("VERBOSE", "HANGUP", "NOOP") else "200 result=0"
+        if command.startswith("GET VARIABLE"):
+            return "200 result=0"
+        if command.startswith("CHANNEL STATUS"):
+            return "200 result=6"
+        return "510 Invalid or unknown command"
+
+    async def _record(self, path: str, command: str) -> str:
+        """Write the caller's audio as it is "spoken", then line noise until silence ends it"""
+        words = command.split('"')
+        escape_digits = words[3]
+        options = words[4].split()
+        timeout = int(options[0]) / 1000 if options and int(options[0]) > 0 else float("inf")
+        silence = next((float(o[2:]) for o in options if o.startswith("s=")), 0.0)
+        frame_samples = int(8000 * FRAME_SECONDS)
+        speech = load_pcm(self.caller_wav)
+        loop = asyncio.get_running_loop()
+        next_frame = loop.time()
+        written = quiet = 0
+        with open(path, "wb") as f, wave.open(f, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(8000)
+            while True:
+                while not self._digits.empty():
+                    digit = self._digits.get_nowait()
+                    if digit in escape_digits:
+                        return f"200 result={ord(digit)} endpos={written}"
+                if written / 8000 >= timeout or (silence and quiet >= silence):
+                    return f"200 result=0 (timeout) endpos={written}"
+                chunk = speech[written * 2:(written + frame_samples) * 2]
+                if len(chunk) < frame_samples * 2:
+                    noise = np.random.randn(frame_samples - len(chunk) // 2) * 0.003
+                    chunk += (noise * 32767).astype("<i2").tobytes()
+                    quiet += FRAME_SECONDS
+                wav.writeframesraw(chunk)
+                f.flush()
+                written += frame_samples
+                next_frame += FRAME_SECONDS
+                await asyncio.sleep(max(next_frame - loop.time(), 0))
+
+    async def _play(self, sound: str, escape_digits: str = "") -> str:
+        """Take as long as the sound plays; returns the escape digit (received through AMI) that ended it early"""
+        duration = audio_duration(sound) if self.realtime_playback else self.playback_delay
+        if not escape_digits:
+            if duration:
+                await asyncio.sleep(duration)
+            return ""
+        deadline = asyncio.get_running_loop().time() + duration
+        while True:
+            try:
+                digit = await asyncio.wait_for(self._digits.get(),
+                                               max(deadline - asyncio.get_running_loop().time(), 0))
+            except asyncio.TimeoutError:
+                return ""
+            if digit in escape_digits:
+                return digit
+
+    def _starts_generation(self, command: str) -> bool:
+        if self.eagi and command.startswith("WAIT FOR DIGIT"):
+            return self._spoken
+        return command.startswith("RECORD FILE") or "cats_intro" in command
+
+    @staticmethod
+    def _is_meow(sound: str) -> bool:
+        return sound.startswith((str(settings.GENERATED_DIR), str(settings.CATS_DIR)))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    return float(np.percentile(values, pct))
+
+
+def report(results: List[CallResult], wall_time: float):
+    total = len(results)
+    ok = [r for r in results if r.ok and not r.busy and not r.abandoned]
+    abandoned = [r for r in results if r.abandoned]
+    busy = [r for r in results if r.busy]
+    errors = [r for r in results if not r.ok]
+    ttfm = [r.time_to_first_meow for r in ok if r.time_to_first_meow is not None]
+
+    print()
+    print("=" * 60)
+    print(f"Calls:            {total} in {wall_time:.1f}s ({total / wall_time:.1f} calls/sec)")
+    print(f"Completed:        {len(ok)}")
+    print(f"Abandoned:        {len(abandoned)}")
+    print(f"Busy (rejected):  {len(busy)} ({100 * len(busy) / max(total, 1):.1f}%)")
+    print(f"Errors:           {len(errors)} ({100 * len(errors) / max(total, 1):.1f}%)")
+    for reason in sorted({r.error for r in errors}):
+        print(f"  - {reason}: {sum(1 for r in errors if r.error == reason)}")
+    print(f"Time to first meow ({len(ttfm)} calls):")
+    print(f"  p50 {percentile(ttfm, 50):.3f}s   p95 {percentile(ttfm, 95):.3f}s   "
+          f"p99 {percentile(ttfm, 99):.3f}s   max {max(ttfm, default=float('nan')):.3f}s")
+    print("=" * 60)
+
+
+async def run_load(args) -> List[CallResult]:
+    digits = args.digits.split(",")
+    rng = random.Random(0)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    ami = None
+    if args.ami_port:
+        ami = FakeAMIServer(settings.ASTERISK_AMI_USERNAME, settings.ASTERISK_AMI_SECRET,
+                            calls_per_second=0)
+        await ami.start(port=args.ami_port)
+        # Give the server's AMI client time to (re)connect
+        await asyncio.sleep(args.ami_wait)
+
+    async def one_call(i: int) -> CallResult:
+        async with semaphore:
+            call = FakeAsteriskCall(
+                args.host, args.port, digits[i % len(digits)], args.wav,
+                record_delay=args.record_delay, playback_delay=args.playback_delay,
+                realtime_playback=args.realtime_playback, timeout=args.timeout,
+                abandon=rng.random() < args.abandon, eagi=args.eagi,
+                realtime_record=args.realtime_record, ami=ami
+            )
+            return await call.run()
+
+    try:
+        return await asyncio.gather(*(one_call(i) for i in range(args.calls)))
+    finally:
+        if ami is not None:
+            await ami.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Asterisk FastAGI load generator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=settings.AGI_PORT)
+    parser.add_argument("-n", "--calls", type=int, default=100, help="total calls (default: 100)")
+    parser.add_argument("-c", "--concurrency", type=int, default=10,
+                        help="calls in flight at once (default: 10)")
+    parser.add_argument("--digits", default="1,2",
+                        help="menu choices to cycle through, e.g. '1' or '1,2' (default: 1,2)")
+    parser.add_argument("--wav", type=Path, help="caller audio for RECORD FILE (default: synthetic speech)")
+    parser.add_argument("--record-delay", type=float, default=0.0,
+                        help="seconds RECORD FILE takes, i.e. how long the caller talks")
+    parser.add_argument("--playback-delay", type=float, default=0.0,
+                        help="seconds every STREAM FILE / GET DATA takes")
+    parser.add_argument("--realtime-playback", action="store_true",
+                        help="make playback take as long as the audio file")
+    parser.add_argument("--abandon", type=float, default=0.0,
+                        help="fraction of callers that hang up as soon as they have been heard")
+    parser.add_argument("--eagi", action="store_true",
+                        help="stream the caller's audio live, as scripts/eagi_bridge.py does")
+    parser.add_argument("--realtime-record", action="store_true",
+                        help="RECORD FILE writes the caller's audio in real time and ends on its s= silence")
+    parser.add_argument("--ami-port", type=int, default=0,
+                        help="serve a fake AMI on this port whose PlayDTMF reaches the calls")
+    parser.add_argument("--ami-wait", type=float, default=3.0,
+                        help="seconds to wait for the server's AMI client to connect before calling")
+    parser.add_argument("--timeout", type=float, default=300.0,
+                        help="seconds to wait for the next AGI command")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.wav is None:
+            args.wav = Path(tmp) / "caller.wav"
+            synth_caller_wav(args.wav)
+
+        print(f"Placing {args.calls} calls to {args.host}:{args.port} "
+              f"({args.concurrency} concurrent, digits {args.digits})")
+        start = time.monotonic()
+        results = asyncio.run(run_load(args))
+        report(results, time.monotonic() - start)
+
+    return 1 if any(not r.ok for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,10 +7,14 @@ import sys
 import subprocess
 from pathlib import Path
 
+import numpy as np
+import soundfile as sf
+
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config import settings
+from services.cat_personalities import CAT_REGISTRY
 
 PROMPTS = {
     "welcome": "Welcome to Meow Now, the premier cat-based voice experience!",
@@ -20,13 +24,14 @@ PROMPTS = {
     "meow_goodbye": "Thanks for letting us mock you! Meow!",
     "cats_intro": "Connecting you to one of our talkative cats. Please hold.",
     "goodbye": "Thank you for calling Meow Now. Goodbye!",
-    "error": "We're sorry, something went wrong. Please try again later."
+    "error": "We're sorry, something went wrong. Please try again later.",
+    "busy": "All of our cats are busy right now. Please call back in a few minutes. Meow!"
 }
 
 
-def generate_prompt(name: str, text: str):
+def generate_prompt(name: str, text: str, directory: Path = settings.PROMPTS_DIR):
     """Generate a single audio prompt"""
-    output_file = settings.PROMPTS_DIR / f"{name}.wav"
+    output_file = directory / f"{name}.wav"
 
     print(f"Generating {name}.wav...")
 
@@ -90,6 +95,29 @@ def generate_prompt(name: str, text: str):
         return False
 
 
+def generate_hold_purr(seconds: float = 1.0):
+    """
+    Synthesize the hold sound: a purr (noise pulsing 25 times a second)
+
+    Short, so that without AMI to cut it off a loop ends soon after the
+    caller's audio is ready, and seamless when looped.
+    """
+    output_file = settings.PROMPTS_DIR / f"{settings.HOLD_PROMPT}.wav"
+    print(f"Generating {output_file.name} (synthesized purr)...")
+
+    rate = 8000
+    t = np.arange(int(seconds * rate)) / rate
+    rumble = np.convolve(np.random.default_rng(7).standard_normal(len(t)), np.ones(40) / 40, mode='same')
+    # A whole number of pulses and breaths, so the loop has no seam
+    pulses = 0.5 + 0.5 * np.sin(2 * np.pi * 25 * t) ** 2
+    breath = 0.6 + 0.4 * np.sin(np.pi * t / seconds) ** 2
+    purr = rumble * pulses * breath
+    purr *= 0.3 / np.max(np.abs(purr))
+    sf.write(output_file, purr.astype(np.float32), rate)
+    print(f"  ✓ Created {output_file}")
+    return True
+
+
 def main():
     print("=" * 60)
     print("Meow-Now Audio Prompt Generator")
@@ -124,6 +152,18 @@ def main():
             success_count += 1
         print()
 
+    # Not speech, so not TTS
+    generate_hold_purr()
+    print()
+
+    # Played when a live monologue misses MONOLOGUE_BUDGET
+    print(f"Generating {len(CAT_REGISTRY)} fallback monologues...")
+    print()
+    for name, cat_class in CAT_REGISTRY.items():
+        cat = cat_class()
+        generate_prompt(f"{name}_fallback", cat.get_fallback_monologue(cat.topics[0]), settings.CATS_DIR)
+        print()
+
     # Summary
     print("=" * 60)
     print(f"Generated {success_count}/{len(PROMPTS)} prompts successfully")
@@ -144,7 +184,7 @@ def main():
     print()
     print("Next steps:")
     print("1. Test prompts by playing them")
-    print("2. Adjust volume if needed (use sox)")
+    print("2. Compile for Asterisk: python scripts/compile_prompts.py")
     print("3. Start the application: python app.py")
     print()
 
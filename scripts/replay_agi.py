@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Replay captured AGI sessions against an AGI server
+Plays back calls saved with AGI_CAPTURE_ENABLED as regression load tests:
+each call sends its original agi_* environment, answers every command with
+the response Asterisk gave and after the time Asterisk took, hands the
+caller's real recording to RECORD FILE, streams an EAGI caller's audio
+frames when they originally arrived, and hangs up when the caller did.
+Calls start with their original spacing, or back to back with --concurrency.
+Replies and hangups are scaled by --speed; analysis and synthesis are not.
+
+If the server asks for something the capture doesn't have (the flow has
+changed since the capture), the call falls back to scripts/fake_asterisk.py
+answers and is counted as diverged. How many WAIT FOR DIGIT polls a live
+audio turn takes depends on timing, so extra or missing polls are not.
+
+Usage:
+    python scripts/replay_agi.py captures/                 # original timing
+    python scripts/replay_agi.py captures/ --speed 10      # 10x faster
+    python scripts/replay_agi.py captures/*.zip --concurrency 20 --loop 5
+"""
+import argparse
+import asyncio
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import settings
+from services.agi_protocol import command_verb, parse_result
+from services.audio_stream import encode_frame
+from services.capture import AUDIO_FILE, load, record_file_path
+from scripts.fake_asterisk import CallResult, FakeAsteriskCall, quoted_args, report, synth_caller_wav
+
+
+class ReplayResult(CallResult):
+    """Outcome of one replayed call"""
+
+    def __init__(self, capture: Dict):
+        super().__init__(digit="")
+        self.capture_id = capture['call_id']
+        self.diverged = False
+        self.original_outcome = capture.get('outcome')
+
+
+class CapturedCall:
+    """A capture file unpacked for replay"""
+
+    def __init__(self, path: Path, workdir: Path):
+        self.path = path
+        self.data = load(path)
+        self.recordings: Dict[int, Path] = {}
+        self.audio = b""
+        self.audio_frames: List[List[float]] = self.data.get('audio_frames', [])
+        with zipfile.ZipFile(path) as archive:
+            for index, name in self.data.get('recordings', {}).items():
+                target = workdir / f"{path.stem}-{name}"
+                target.write_bytes(archive.read(name))
+                self.recordings[int(index)] = target
+            if self.audio_frames:
+                self.audio = archive.read(AUDIO_FILE)
+
+    @property
+    def digit(self) -> str:
+        """The first menu choice the caller made"""
+        for entry in self.data['commands']:
+            if command_verb(entry['command']) == 'GET DATA' and 'response' in entry:
+                return parse_result(entry['response'])
+        return ""
+
+
+class ReplayCall:
+    """Drives one FastAGI session from a capture"""
+
+    def __init__(self, host: str, port: int, call: CapturedCall, fallback_wav: Path,
+                 speed: float = 1.0, timeout: float = 300.0):
+        self.host = host
+        self.port = port
+        self.call = call
+        self.speed = speed
+        self.timeout = timeout
+        # Answers for commands the capture doesn't cover
+        self.fallback = FakeAsteriskCall(host, port, call.digit or "1",
+                                         next(iter(call.recordings.values()), fallback_wav))
+        self.hung_up = asyncio.Event()
+
+    def _delays(self) -> List[Optional[float]]:
+        """Seconds Asterisk spent on each command (None: the caller hung up during it)"""
+        delays = []
+        previous = 0.0
+        for entry in self.call.data['commands']:
+            if 'replied' not in entry:
+                delays.append(None)
+                continue
+            # Pipelined commands start when the one before them finishes
+            started = max(entry['sent'], previous)
+            delays.append(max(entry['replied'] - started, 0.0))
+            previous = entry['replied']
+        return delays
+
+    async def run(self) -> ReplayResult:
+        result = ReplayResult(self.call.data)
+        result.digit = self.call.digit
+        commands = self.call.data['commands']
+        delays = self._delays()
+        start = time.monotonic()
+        writer = None
+        hangup_timer = None
+        streamer = None
+        try:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+            env = self.call.data['env']
+            writer.write("".join(f"{k}: {v}\n" for k, v in env.items()).encode() + b"\n")
+            await writer.drain()
+            if self.call.audio_frames:
+                streamer = asyncio.get_running_loop().create_task(self._stream_audio(writer, start))
+
+            if self.call.data.get('hangup_at') is not None:
+                hangup_timer = asyncio.get_running_loop().call_later(
+                    self.call.data['hangup_at'] / self.speed, self._hang_up, writer, result)
+
+            index = 0
+            polling = False
+            while True:
+                line = await asyncio.wait_for(reader.readline(), self.timeout)
+                if not line:
+                    if not self.hung_up.is_set():
+                        result.error = "closed without HANGUP"
+                    break
+                command = line.decode().strip()
+                result.commands.append(command)
+                verb = command_verb(command)
+
+                if polling and verb != 'WAIT FOR DIGIT':
+                    # The turn ended in fewer polls than it did originally
+                    while index < len(commands) and command_verb(commands[index]['command']) == 'WAIT FOR DIGIT':
+                        index += 1
+                expected = commands[index] if index < len(commands) and not result.diverged else None
+                if (polling and verb == 'WAIT FOR DIGIT' and not result.diverged
+                        and (expected is None or command_verb(expected['command']) != verb)):
+                    # ...or took more: nothing pressed, as Asterisk would say
+                    await asyncio.sleep(max(int(command.split()[3]), 0) / 1000 / self.speed)
+                    response = "200 result=0"
+                elif expected is not None and command_verb(expected['command']) == verb:
+                    if delays[index] is None:
+                        # The caller hung up during this command; the timer does that
+                        await asyncio.wait_for(self.hung_up.wait(), self.timeout)
+                        break
+                    response = await self._replay(index, command, expected['response'],
+                                                  delays[index], result, start)
+                    index += 1
+                else:
+                    result.diverged = True
+                    response = await self.fallback.respond(command, result, start)
+                polling = verb == 'WAIT FOR DIGIT'
+
+                if self.hung_up.is_set():
+                    break
+                writer.write(response.encode() + b"\n")
+                await writer.drain()
+                if command == "HANGUP":
+                    result.ok = True
+                    break
+
+        except asyncio.TimeoutError:
+            result.error = "timeout"
+        except (ConnectionError, OSError) as e:
+            if not self.hung_up.is_set():
+                result.error = type(e).__name__
+        finally:
+            if hangup_timer is not None:
+                hangup_timer.cancel()
+            if streamer is not None:
+                streamer.cancel()
+            if writer is not None:
+                writer.close()
+            result.duration = time.monotonic() - start
+        return result
+
+    async def _replay(self, index: int, command: str, response: str, delay: float,
+                      result: ReplayResult, start: float) -> str:
+        verb = command_verb(command)
+        if verb == 'STREAM FILE':
+            sound = quoted_args(command)[0]
+            if "busy" in sound:
+                result.busy = True
+            if result.time_to_first_meow is None and FakeAsteriskCall._is_meow(sound):
+                result.time_to_first_meow = time.monotonic() - start
+        await asyncio.sleep(delay / self.speed)
+        if verb == 'RECORD FILE':
+            recording = self.call.recordings.get(index)
+            target = record_file_path(command)
+            if recording is not None and target is not None:
+                shutil.copyfile(recording, target)
+        return response
+
+    async def _stream_audio(self, writer: asyncio.StreamWriter, start: float):
+        """EAGI: send the caller's audio frames on their original schedule"""
+        offset = 0
+        for at, length in self.call.audio_frames:
+            await asyncio.sleep(max(start + at / self.speed - time.monotonic(), 0))
+            if self.hung_up.is_set() or writer.is_closing():
+                return
+            writer.write(encode_frame(self.call.audio[offset:offset + length]))
+            offset += length
+
+    def _hang_up(self, writer: asyncio.StreamWriter, result: ReplayResult):
+        if writer.is_closing():
+            return
+        self.hung_up.set()
+        result.abandoned = result.ok = True
+        writer.write(b"HANGUP\n")
+        writer.close()
+
+
+def find_captures(paths: List[Path]) -> List[Path]:
+    captures = []
+    for path in paths:
+        captures.extend(sorted(path.glob("*.zip")) if path.is_dir() else [path])
+    return captures
+
+
+async def run_replay(args, calls: List[CapturedCall], fallback_wav: Path) -> List[ReplayResult]:
+    calls = sorted(calls, key=lambda call: call.data['started_at'])
+    captured = len(calls)
+    first = calls[0].data['started_at']
+    span = calls[-1].data['started_at'] - first
+    calls = calls * args.loop
+    semaphore = asyncio.Semaphore(args.concurrency) if args.concurrency else None
+
+    async def one_call(i: int, call: CapturedCall) -> ReplayResult:
+        replay = ReplayCall(args.host, args.port, call, fallback_wav,
+                            speed=args.speed, timeout=args.timeout)
+        if semaphore is not None:
+            async with semaphore:
+                return await replay.run()
+        # Original arrival pattern, each loop after the previous one
+        offset = call.data['started_at'] - first + (i // captured) * (span + 1)
+        await asyncio.sleep(offset / args.speed)
+        return await replay.run()
+
+    return await asyncio.gather(*(one_call(i, call) for i, call in enumerate(calls)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured AGI sessions")
+    parser.add_argument("captures", type=Path, nargs="+",
+                        help="capture zips or directories of them")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=settings.AGI_PORT)
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="time compression: 10 replays a minute of traffic in 6 seconds")
+    parser.add_argument("-c", "--concurrency", type=int, default=0,
+                        help="run calls back to back, this many at once, ignoring arrival times")
+    parser.add_argument("--loop", type=int, default=1, help="replay the captures this many times")
+    parser.add_argument("--timeout", type=float, default=300.0,
+                        help="seconds to wait for the next AGI command")
+    args = parser.parse_args()
+
+    paths = find_captures(args.captures)
+    if not paths:
+        print("No captures found")
+        return 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        calls = [CapturedCall(path, workdir) for path in paths]
+        fallback_wav = workdir / "fallback.wav"
+        synth_caller_wav(fallback_wav)
+
+        mode = f"{args.concurrency} concurrent" if args.concurrency else "original arrival times"
+        print(f"Replaying {len(calls)} captured calls x{args.loop} to {args.host}:{args.port} "
+              f"({mode}, {args.speed:g}x speed)")
+        start = time.monotonic()
+        results = asyncio.run(run_replay(args, calls, fallback_wav))
+        report(results, time.monotonic() - start)
+
+    diverged = [r for r in results if r.diverged]
+    print(f"Diverged from capture: {len(diverged)}")
+    for r in diverged[:10]:
+        print(f"  - {r.capture_id}")
+    newly_busy = [r for r in results if r.busy and r.original_outcome != "busy"]
+    if newly_busy:
+        print(f"Turned away in replay but not originally: {len(newly_busy)}")
+
+    return 1 if any(not r.ok for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
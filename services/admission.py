@@ -0,0 +1,135 @@
+"""
+Call Admission Control
+Caps the number of calls running the IVR at once. Calls beyond the cap wait
+in a bounded queue for a limited time; anything else gets the busy prompt.
+
+With a connected AMI client, calls Asterisk has up that haven't reached the
+AGI yet count toward the queue: they are already on their way to it, so a
+burst of ringing calls turns callers away before the queue overflows rather
+than after. Without a live view only the AGI's own queue counts. The view
+is host-wide, so each of several pre-forked workers counts its share.
+"""
+import asyncio
+import logging
+import time
+from typing import Optional, TYPE_CHECKING
+
+from config import settings
+from services import metrics
+
+if TYPE_CHECKING:
+    from services.ami_client import AMIClient
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_CALLS = metrics.gauge(
+    "meow_calls_active", "Calls currently running the IVR")
+WAITING_CALLS = metrics.gauge(
+    "meow_calls_waiting", "Calls queued for a free call slot")
+ADMITTED_CALLS = metrics.counter(
+    "meow_calls_admitted_total", "Calls admitted to the IVR")
+REJECTED_CALLS = metrics.counter(
+    "meow_calls_rejected_total", "Calls sent to the busy prompt", ("reason",))
+ADMISSION_WAIT_SECONDS = metrics.counter(
+    "meow_call_admission_wait_seconds_total", "Total time calls spent queued for a slot")
+
+
+class AdmissionController:
+    """
+    Bounded call slots with a bounded, time-limited wait queue
+
+    With an AMI client attached, calls waiting in Asterisk count toward the
+    queue, and stats() and rejection logs also carry Asterisk's own view of
+    the load (channels up, calls not yet in the AGI).
+    """
+
+    def __init__(self, max_active: int = settings.MAX_CONCURRENT_CALLS,
+                 max_queue: int = settings.CALL_QUEUE_SIZE,
+                 max_wait: float = settings.CALL_QUEUE_MAX_WAIT,
+                 ami: Optional['AMIClient'] = None, workers: int = 1):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.ami = ami
+        self.workers = max(workers, 1)
+        self.active = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(max_active)
+        self.logger = logging.getLogger(__name__)
+
+    async def acquire(self) -> bool:
+        """
+        Try to get a call slot
+
+        Returns:
+            True if the call was admitted (call release() when done),
+            False if it should be turned away
+        """
+        if not self._slots.locked():
+            # A free slot is taken without suspending
+            await self._slots.acquire()
+            self._admit()
+            return True
+
+        if self.waiting + self.upstream_waiting >= self.max_queue:
+            self._reject("queue_full")
+            return False
+
+        self.waiting += 1
+        WAITING_CALLS.set(self.waiting)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self._reject("wait_timeout")
+            return False
+        finally:
+            self.waiting -= 1
+            WAITING_CALLS.set(self.waiting)
+            ADMISSION_WAIT_SECONDS.inc(time.monotonic() - start)
+
+        self._admit()
+        return True
+
+    @property
+    def upstream_waiting(self) -> int:
+        """
+        This worker's share of the calls in Asterisk not yet at the AGI,
+        per the AMI view (0 while it is down)
+        """
+        if self.ami is None or not self.ami.connected:
+            return 0
+        # The kernel spreads calls evenly over the workers; round up so one
+        # ringing call still counts everywhere
+        return -(-self.ami.view.calls_waiting // self.workers)
+
+    def _admit(self):
+        self.active += 1
+        ACTIVE_CALLS.set(self.active)
+        ADMITTED_CALLS.inc()
+
+    def release(self):
+        """Free a slot taken by acquire()"""
+        self.active -= 1
+        ACTIVE_CALLS.set(self.active)
+        self._slots.release()
+
+    def _reject(self, reason: str):
+        REJECTED_CALLS.inc(reason=reason)
+        upstream = ""
+        if self.ami is not None and self.ami.connected:
+            view = self.ami.view
+            upstream = f", asterisk_channels={view.active_channels}, asterisk_waiting={view.calls_waiting}"
+        self.logger.warning(f"Call rejected ({reason}): active={self.active}, "
+                            f"waiting={self.waiting}{upstream}")
+
+    def stats(self) -> dict:
+        """Current pool state for health/status endpoints"""
+        return {
+            'active': self.active,
+            'waiting': self.waiting,
+            'max_active': self.max_active,
+            'max_queue': self.max_queue,
+            'max_wait': self.max_wait,
+            'asterisk': self.ami.stats() if self.ami is not None else None,
+        }
@@ -0,0 +1,291 @@
+"""
+AGI Protocol I/O
+Buffered, framed reader for FastAGI connections. Incoming bytes are received
+straight into one reusable bytearray and split into the environment block
+and command responses incrementally, however TCP fragments or coalesces them.
+"""
+import asyncio
+import logging
+import socket
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+from config import settings
+from services.audio_stream import AUDIO_FRAME_HEADER, AUDIO_FRAME_MARKER, AudioRingBuffer
+from services.cancellation import CancellationToken
+
+logger = logging.getLogger(__name__)
+
+# Keep at least this much free space at the end of the receive buffer
+MIN_FREE_BUFFER = 1024
+
+# AGI verbs that aren't two words long ("STREAM FILE", "GET DATA", ...)
+ONE_WORD_VERBS = {"ANSWER", "EXEC", "GOSUB", "HANGUP", "NOOP", "VERBOSE"}
+THREE_WORD_VERBS = {"CONTROL STREAM FILE", "GET FULL VARIABLE", "WAIT FOR DIGIT"}
+
+
+class AGIConnectionClosed(ConnectionError):
+    """Raised when Asterisk has closed the AGI connection"""
+
+
+def parse_result(response: str) -> str:
+    """Extract the value from a "200 result=<value> ..." response"""
+    if 'result=' in response:
+        return response.split('result=')[1].split()[0]
+    return ""
+
+
+def indicates_hangup(command: str, response: str) -> bool:
+    """
+    Whether a command response means the caller's channel is gone
+
+    Asterisk answers commands on a hung-up channel with result=-1, or with
+    511 once it has noticed the hangup. A few -1 results mean something
+    else: a sound file that couldn't be opened, or a recording that
+    couldn't be written.
+    """
+    if response.startswith('511'):
+        return True
+    if parse_result(response) != '-1':
+        return False
+    verb = command_verb(command)
+    if verb == 'STREAM FILE' and 'endpos=0' in response:
+        return False
+    if verb == 'RECORD FILE' and '(writefile)' in response:
+        return False
+    return True
+
+
+def command_verb(command: str) -> str:
+    """The AGI verb of a command line, e.g. 'STREAM FILE' for 'STREAM FILE "x" ""'"""
+    words = command.split(None, 3)
+    if not words:
+        return ""
+    if words[0].upper() in ONE_WORD_VERBS:
+        return words[0].upper()
+    three = " ".join(words[:3]).upper()
+    if three in THREE_WORD_VERBS:
+        return three
+    return " ".join(words[:2]).upper()
+
+
+def configure_socket(sock: socket.socket):
+    """Apply per-connection TCP options for small request/response traffic"""
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    except OSError as e:
+        logger.debug(f"Could not set socket options: {e}")
+
+
+class AGIProtocol(asyncio.BufferedProtocol):
+    """
+    One FastAGI connection
+
+    Lines are framed on '\\n'. Until the blank line that ends the environment
+    block, lines are parsed as "agi_key: value" pairs; after that each line
+    is a command response, except for:
+        - "520-..." usage blocks, which run until a "520 ..." line and are
+          delivered as one multi-line response
+        - a bare "HANGUP", which Asterisk sends unsolicited and is recorded
+          in `hangup_received` rather than consumed as a response
+
+    EAGI calls (an `agi_audio_stream` env variable, set by
+    scripts/eagi_bridge.py) also carry the caller's audio on the same
+    connection, as binary frames between lines: a NUL byte, a 16-bit
+    big-endian length and that many bytes of 8 kHz 16-bit samples. Those go
+    straight from the receive buffer into the `audio` ring buffer, and to
+    `audio_listener` if one is set (session capture).
+
+    `cancellation` is tripped when the caller hangs up: on that HANGUP line
+    or when the connection closes.
+    """
+
+    def __init__(self, on_connection: Callable[['AGIProtocol'], None],
+                 buffer_size: int = settings.AGI_READ_BUFFER_SIZE):
+        self._on_connection = on_connection
+        self._buffer = bytearray(buffer_size)
+        self._start = 0  # first byte not yet framed
+        self._end = 0    # end of received data
+        self._env_done: Optional[asyncio.Future] = None
+        self._responses: Deque[str] = deque()
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._discard = 0  # responses still to come for commands nobody waits on
+        self._multiline: Optional[List[str]] = None
+        self.transport: Optional[asyncio.Transport] = None
+        self.env: Dict[str, str] = {}
+        self.closed = False
+        self.hangup_received = False
+        self.audio: Optional[AudioRingBuffer] = None
+        self.audio_listener: Optional[Callable[[memoryview], None]] = None
+        self.cancellation = CancellationToken()
+        self.bytes_received = 0
+        self.bytes_sent = 0
+
+    @property
+    def peername(self):
+        return self.transport.get_extra_info('peername') if self.transport else None
+
+    # asyncio callbacks
+
+    def connection_made(self, transport: asyncio.Transport):
+        self.transport = transport
+        sock = transport.get_extra_info('socket')
+        if sock is not None:
+            configure_socket(sock)
+        self._env_done = asyncio.get_running_loop().create_future()
+        self._on_connection(self)
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        if self._start == self._end:
+            self._start = self._end = 0
+        elif len(self._buffer) - self._end < MIN_FREE_BUFFER:
+            pending = self._end - self._start
+            if pending + MIN_FREE_BUFFER > len(self._buffer):
+                # A single frame is larger than the buffer: move to a bigger one
+                grown = bytearray(max(len(self._buffer) * 2, pending + MIN_FREE_BUFFER))
+                grown[:pending] = self._buffer[self._start:self._end]
+                self._buffer = grown
+            else:
+                self._buffer[:pending] = self._buffer[self._start:self._end]
+            self._start, self._end = 0, pending
+        return memoryview(self._buffer)[self._end:]
+
+    def buffer_updated(self, nbytes: int):
+        self._end += nbytes
+        self.bytes_received += nbytes
+
+        buffer = self._buffer
+        while self._start < self._end:
+            if buffer[self._start] == AUDIO_FRAME_MARKER:
+                if not self._take_audio_frame():
+                    break
+                continue
+            newline = buffer.find(b'\n', self._start, self._end)
+            if newline < 0:
+                break
+            line = buffer[self._start:newline].decode('utf-8', 'replace').rstrip('\r')
+            self._start = newline + 1
+            self._handle_line(line)
+
+    def _take_audio_frame(self) -> bool:
+        """Consume one complete audio frame at _start; False if it hasn't all arrived"""
+        available = self._end - self._start
+        if available < AUDIO_FRAME_HEADER:
+            return False
+        length = int.from_bytes(self._buffer[self._start + 1:self._start + AUDIO_FRAME_HEADER], 'big')
+        if available < AUDIO_FRAME_HEADER + length:
+            return False
+        payload_start = self._start + AUDIO_FRAME_HEADER
+        if self.audio is not None:
+            with memoryview(self._buffer) as view:
+                payload = view[payload_start:payload_start + length]
+                self.audio.write(payload)
+                if self.audio_listener is not None:
+                    self.audio_listener(payload)
+                payload.release()
+        self._start = payload_start + length
+        return True
+
+    def eof_received(self) -> bool:
+        return False
+
+    def connection_lost(self, exc: Optional[Exception]):
+        self.closed = True
+        self.cancellation.cancel("connection closed")
+        if self._env_done is not None and not self._env_done.done():
+            self._env_done.set_result(self.env)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(AGIConnectionClosed("AGI connection closed"))
+
+    # Framing
+
+    def _handle_line(self, line: str):
+        if not self._env_done.done():
+            if not line:
+                if 'agi_audio_stream' in self.env:
+                    self.audio = AudioRingBuffer()
+                self._env_done.set_result(self.env)
+            elif ':' in line:
+                key, value = line.split(':', 1)
+                self.env[key.strip()] = value.strip()
+            return
+
+        if self._multiline is not None:
+            self._multiline.append(line)
+            if line.startswith('520 '):
+                response = '\n'.join(self._multiline)
+                self._multiline = None
+                self._deliver(response)
+        elif line.startswith('520-'):
+            self._multiline = [line]
+        elif line == 'HANGUP':
+            self.hangup_received = True
+            self.cancellation.cancel("hangup")
+        elif line:
+            self._deliver(line)
+
+    def _deliver(self, response: str):
+        if self._discard:
+            self._discard -= 1
+            return
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(response)
+                return
+        self._responses.append(response)
+
+    # Session API
+
+    async def read_env(self, timeout: Optional[float] = settings.AGI_ENV_TIMEOUT) -> Dict[str, str]:
+        """Wait for the environment block"""
+        return await asyncio.wait_for(asyncio.shield(self._env_done), timeout)
+
+    def write(self, data: bytes):
+        """Queue bytes for Asterisk"""
+        if self.closed or self.transport.is_closing():
+            raise AGIConnectionClosed("AGI connection closed")
+        self.transport.write(data)
+        self.bytes_sent += len(data)
+
+    async def read_response(self, timeout: Optional[float] = settings.AGI_COMMAND_TIMEOUT) -> str:
+        """Wait for the next command response, in order"""
+        if self._responses:
+            return self._responses.popleft()
+        if self.closed:
+            raise AGIConnectionClosed("AGI connection closed")
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        # A bare timer is much cheaper per command than asyncio.wait_for
+        timer = loop.call_later(timeout, self._expire, waiter) if timeout else None
+        try:
+            return await waiter
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    def discard_responses(self, count: int):
+        """
+        Drop the responses to the next `count` commands already sent, e.g. the
+        rest of a pipelined batch cut short by a hangup, so they aren't taken
+        as the replies to later commands
+        """
+        while count and self._responses:
+            self._responses.popleft()
+            count -= 1
+        self._discard += count
+
+    def _expire(self, waiter: asyncio.Future):
+        if not waiter.done():
+            waiter.set_exception(asyncio.TimeoutError("No AGI response from Asterisk"))
+            # Responses are matched by order, so a missed one poisons the stream
+            self.close()
+
+    def close(self):
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.close()
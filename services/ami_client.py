@@ -0,0 +1,333 @@
+"""
+Asterisk Manager Interface (AMI) Client
+One persistent, self-reconnecting AMI connection per AGI process. It logs
+in with the ASTERISK_AMI_* credentials, subscribes to the call, dialplan
+(Newexten, which shows a call reaching the AGI) and agent (queue) event
+classes, and keeps a live view of the channels Asterisk has up. Admission control counts the
+calls it shows waiting toward the call queue, and the quality governor
+toward load.
+"""
+import asyncio
+import itertools
+import logging
+import time
+from typing import Dict, Optional
+
+from config import settings
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Every pre-fork worker has its own connection to the same Asterisk
+AMI_CONNECTED = metrics.gauge(
+    "meow_ami_connected", "1 while the AMI connection is logged in", merge="min")
+AMI_RECONNECTS = metrics.counter(
+    "meow_ami_reconnects_total", "AMI connection attempts after the first")
+ASTERISK_CHANNELS = metrics.gauge(
+    "meow_asterisk_channels", "Channels up in Asterisk, as seen over AMI", merge="max")
+ASTERISK_CALLS_WAITING = metrics.gauge(
+    "meow_asterisk_calls_waiting", "Inbound calls in Asterisk that have not reached the AGI yet",
+    merge="max")
+
+
+# Newchannel/Hangup are "call", Newexten "dialplan", QueueCaller* "agent";
+# the AMI user's read= permissions in manager.conf must include all three
+EVENT_CLASSES = "call,dialplan,agent"
+
+
+class AMIError(Exception):
+    """Raised when an AMI action fails or the connection is down"""
+
+
+class Channel:
+    """What we know about one Asterisk channel"""
+
+    def __init__(self, uniqueid: str, name: str = "", state: str = "",
+                 context: str = "", exten: str = "", application: str = ""):
+        self.uniqueid = uniqueid
+        self.name = name
+        self.state = state
+        self.context = context
+        self.exten = exten
+        self.application = application
+        self.created = time.monotonic()
+
+    @property
+    def in_agi(self) -> bool:
+        return self.application.upper() in ("AGI", "EAGI")
+
+    def to_dict(self) -> dict:
+        return {
+            'uniqueid': self.uniqueid,
+            'name': self.name,
+            'state': self.state,
+            'context': self.context,
+            'exten': self.exten,
+            'application': self.application,
+            'age': round(time.monotonic() - self.created, 1),
+        }
+
+
+class ChannelView:
+    """
+    Live, in-memory picture of Asterisk's channels, fed by AMI events
+
+    A call is "waiting" from the moment its channel appears until it reaches
+    the AGI application (ringing, Answer, Wait) or while it sits in an
+    Asterisk queue.
+    """
+
+    def __init__(self):
+        self.channels: Dict[str, Channel] = {}
+        self.queued: Dict[str, str] = {}  # uniqueid -> queue name
+        self.updated = 0.0
+
+    @property
+    def active_channels(self) -> int:
+        return len(self.channels)
+
+    @property
+    def calls_in_agi(self) -> int:
+        return sum(1 for channel in self.channels.values() if channel.in_agi)
+
+    @property
+    def calls_waiting(self) -> int:
+        pre_agi = sum(1 for uniqueid, channel in self.channels.items()
+                      if not channel.in_agi and uniqueid not in self.queued)
+        return pre_agi + len(self.queued)
+
+    def clear(self):
+        self.channels.clear()
+        self.queued.clear()
+        self._publish()
+
+    def handle_event(self, event: Dict[str, str]):
+        """Apply one AMI event to the view"""
+        name = event.get('Event', '')
+        uniqueid = event.get('Uniqueid', '')
+
+        if name in ('Newchannel', 'CoreShowChannel'):
+            self.channels[uniqueid] = Channel(
+                uniqueid,
+                name=event.get('Channel', ''),
+                state=event.get('ChannelStateDesc', ''),
+                context=event.get('Context', ''),
+                exten=event.get('Exten', ''),
+                application=event.get('Application', ''),
+            )
+        elif name == 'Hangup':
+            self.channels.pop(uniqueid, None)
+            self.queued.pop(uniqueid, None)
+        elif name == 'QueueCallerJoin':
+            self.queued[uniqueid] = event.get('Queue', '')
+        elif name in ('QueueCallerLeave', 'QueueCallerAbandon'):
+            self.queued.pop(uniqueid, None)
+        else:
+            channel = self.channels.get(uniqueid)
+            if channel is None:
+                return
+            if name == 'Newstate':
+                channel.state = event.get('ChannelStateDesc', channel.state)
+            elif name == 'Newexten':
+                channel.context = event.get('Context', channel.context)
+                channel.exten = event.get('Extension', event.get('Exten', channel.exten))
+                channel.application = event.get('Application', channel.application)
+            elif name == 'Rename':
+                channel.name = event.get('Newname', channel.name)
+            else:
+                return
+
+        self._publish()
+
+    def _publish(self):
+        self.updated = time.monotonic()
+        ASTERISK_CHANNELS.set(self.active_channels)
+        ASTERISK_CALLS_WAITING.set(self.calls_waiting)
+
+    def stats(self) -> dict:
+        return {
+            'active_channels': self.active_channels,
+            'calls_in_agi': self.calls_in_agi,
+            'calls_waiting': self.calls_waiting,
+        }
+
+
+class AMIClient:
+    """
+    Persistent AMI connection with automatic reconnect
+
+    start() runs the connection as a background task on the current event
+    loop. While logged in, `view` tracks Asterisk's channels; while
+    disconnected, `connected` is False and the view is empty, so readers
+    should fall back to their own estimates.
+    """
+
+    def __init__(self, host: str = settings.ASTERISK_HOST, port: int = settings.ASTERISK_AMI_PORT,
+                 username: str = settings.ASTERISK_AMI_USERNAME,
+                 secret: str = settings.ASTERISK_AMI_SECRET):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.secret = secret
+        self.view = ChannelView()
+        self.connected = False
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._action_ids = itertools.count(1)
+        self._task: Optional[asyncio.Task] = None
+        self._logged_in = asyncio.Event()
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        """Connect in the background (call from the event loop)"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Log off and stop reconnecting"""
+        if self._task is None:
+            return
+        if self.connected:
+            try:
+                await self.action("Logoff", timeout=1)
+            except (AMIError, asyncio.TimeoutError):
+                pass
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def wait_connected(self, timeout: Optional[float] = None) -> bool:
+        """Wait until logged in; False on timeout (or at once if never started)"""
+        if self._task is None and not self._logged_in.is_set():
+            return False
+        try:
+            await asyncio.wait_for(self._logged_in.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def action(self, name: str, timeout: float = settings.AMI_ACTION_TIMEOUT,
+                     **fields) -> Dict[str, str]:
+        """
+        Send an AMI action and return its response
+
+        Raises:
+            AMIError: not connected, or Asterisk answered Response: Error
+            asyncio.TimeoutError: no response within `timeout`
+        """
+        if self._writer is None:
+            raise AMIError("AMI not connected")
+
+        action_id = str(next(self._action_ids))
+        future = asyncio.get_running_loop().create_future()
+        self._pending[action_id] = future
+        self._send({'Action': name, 'ActionID': action_id, **fields})
+        try:
+            response = await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(action_id, None)
+
+        if response.get('Response') == 'Error':
+            raise AMIError(f"{name} failed: {response.get('Message', 'unknown error')}")
+        return response
+
+    def stats(self) -> dict:
+        return {'connected': self.connected, **self.view.stats()}
+
+    # Connection handling
+
+    async def _run(self):
+        delay = settings.AMI_RECONNECT_DELAY
+        attempts = 0
+        while True:
+            if attempts:
+                AMI_RECONNECTS.inc()
+            attempts += 1
+            try:
+                await self._session()
+                delay = settings.AMI_RECONNECT_DELAY
+            except asyncio.CancelledError:
+                raise
+            except (OSError, AMIError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                self.logger.warning(f"AMI connection to {self.host}:{self.port} lost: {e}")
+            finally:
+                self._disconnected()
+
+            self.logger.info(f"Reconnecting to AMI in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.AMI_RECONNECT_MAX_DELAY)
+
+    async def _session(self):
+        """One connection: log in, seed the view, then process events until it drops"""
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), settings.AMI_ACTION_TIMEOUT)
+        self._writer = writer
+
+        banner = await asyncio.wait_for(reader.readline(), settings.AMI_ACTION_TIMEOUT)
+        if not banner.startswith(b"Asterisk Call Manager"):
+            raise AMIError(f"Unexpected AMI banner: {banner!r}")
+
+        reader_task = asyncio.get_running_loop().create_task(self._read_messages(reader))
+        try:
+            await self.action("Login", Username=self.username, Secret=self.secret,
+                              Events=EVENT_CLASSES)
+            self.view.clear()
+            await self.action("CoreShowChannels")
+            self.connected = True
+            self._logged_in.set()
+            AMI_CONNECTED.set(1)
+            self.logger.info(f"AMI connected to {self.host}:{self.port}")
+
+            # Keepalive: a dead peer shows up as a Ping timeout
+            while not reader_task.done():
+                done, _ = await asyncio.wait({reader_task}, timeout=settings.AMI_PING_INTERVAL)
+                if not done:
+                    await self.action("Ping")
+            reader_task.result()
+        finally:
+            reader_task.cancel()
+
+    async def _read_messages(self, reader: asyncio.StreamReader):
+        message: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise AMIError("AMI connection closed")
+            line = line.decode('utf-8', 'replace').rstrip('\r\n')
+            if line:
+                key, _, value = line.partition(':')
+                message[key.strip()] = value.strip()
+                continue
+            if message:
+                self._dispatch(message)
+                message = {}
+
+    def _dispatch(self, message: Dict[str, str]):
+        if 'Response' in message:
+            future = self._pending.get(message.get('ActionID', ''))
+            if future is not None and not future.done():
+                future.set_result(message)
+        elif 'Event' in message:
+            self.view.handle_event(message)
+
+    def _send(self, fields: Dict[str, str]):
+        lines = ''.join(f"{key}: {value}\r\n" for key, value in fields.items())
+        self._writer.write(f"{lines}\r\n".encode('utf-8'))
+
+    def _disconnected(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(AMIError("AMI connection lost"))
+        self._pending.clear()
+        if self.connected:
+            self.logger.warning("AMI disconnected; channel view unavailable")
+        self.connected = False
+        self._logged_in.clear()
+        AMI_CONNECTED.set(0)
+        self.view.clear()
@@ -0,0 +1,115 @@
+"""
+Telephony Audio Encoding
+Turns arbitrary audio into the formats Asterisk plays without transcoding:
+8 kHz mono, loudness-normalized, as signed linear (.sln), G.711 mu-law
+(.ulaw) and A-law (.alaw), and GSM (.gsm, through sox when installed).
+Used by scripts/compile_prompts.py.
+"""
+import logging
+import shutil
+import subprocess
+from math import gcd
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from scipy.signal import resample_poly
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+TELEPHONY_RATE = 8000
+COMPILED_FORMATS = ('sln', 'ulaw', 'alaw', 'gsm')
+
+# Segment end points of the G.711 companding curves (ITU-T G.711 / Sun g711.c)
+_ULAW_SEGMENT_ENDS = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+_ALAW_SEGMENT_ENDS = np.array([0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF])
+_ULAW_BIAS = 0x84
+_ULAW_CLIP = 8159
+
+
+def to_telephony(audio: np.ndarray, sample_rate: int) -> np.ndarray:
+    """Mono float audio resampled to 8 kHz"""
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    if sample_rate != TELEPHONY_RATE:
+        divisor = gcd(TELEPHONY_RATE, sample_rate)
+        audio = resample_poly(audio, TELEPHONY_RATE // divisor, sample_rate // divisor)
+    return audio.astype(np.float32)
+
+
+def normalize_loudness(audio: np.ndarray, target_dbfs: float = settings.PROMPT_LOUDNESS_DBFS,
+                       peak_dbfs: float = -1.0, sample_rate: int = TELEPHONY_RATE
+                       ) -> Tuple[np.ndarray, Dict[str, Optional[float]]]:
+    """
+    Scale audio so its active (non-silent) RMS level is `target_dbfs`
+
+    Frames more than 40 dB below the loudest are left out of the level, so
+    pauses don't make a prompt come out louder. The gain is capped so peaks
+    stay below `peak_dbfs`. Returns the audio and what was done to it.
+    """
+    frame = int(0.02 * sample_rate)
+    count = len(audio) // frame
+    if count == 0 or not np.any(audio):
+        return audio, {'gain_db': 0.0, 'level_dbfs': None, 'peak_dbfs': None}
+
+    power = np.mean(audio[:count * frame].reshape(count, frame) ** 2, axis=1)
+    active = power[power > power.max() * 1e-4]
+    level_db = 10 * np.log10(np.mean(active))
+    peak = float(np.max(np.abs(audio)))
+    gain_db = min(target_dbfs - level_db, peak_dbfs - 20 * np.log10(peak))
+    audio = audio * np.float32(10 ** (gain_db / 20))
+    return audio, {
+        'gain_db': round(float(gain_db), 2),
+        'level_dbfs': round(float(level_db + gain_db), 2),
+        'peak_dbfs': round(float(20 * np.log10(peak) + gain_db), 2),
+    }
+
+
+def to_pcm16(audio: np.ndarray) -> np.ndarray:
+    return (np.clip(audio, -1.0, 32767 / 32768) * 32768).astype(np.int16)
+
+
+def lin2ulaw(pcm: np.ndarray) -> np.ndarray:
+    """16-bit linear samples to G.711 mu-law bytes"""
+    value = pcm.astype(np.int32) >> 2
+    mask = np.where(value < 0, 0x7F, 0xFF)
+    value = np.minimum(np.abs(value), _ULAW_CLIP) + (_ULAW_BIAS >> 2)
+    segment = np.searchsorted(_ULAW_SEGMENT_ENDS, value)
+    ulaw = np.where(segment >= 8, 0x7F, (segment << 4) | ((value >> (segment + 1)) & 0x0F))
+    return (ulaw ^ mask).astype(np.uint8)
+
+
+def lin2alaw(pcm: np.ndarray) -> np.ndarray:
+    """16-bit linear samples to G.711 A-law bytes"""
+    value = pcm.astype(np.int32) >> 3
+    mask = np.where(value >= 0, 0xD5, 0x55)
+    value = np.where(value >= 0, value, -value - 1)
+    segment = np.searchsorted(_ALAW_SEGMENT_ENDS, value)
+    mantissa = np.where(segment < 2, value >> 1, value >> segment) & 0x0F
+    alaw = np.where(segment >= 8, 0x7F, (np.minimum(segment, 7) << 4) | mantissa)
+    return (alaw ^ mask).astype(np.uint8)
+
+
+def gsm_available() -> bool:
+    return shutil.which("sox") is not None
+
+
+def write_gsm(sln_file: Path, gsm_file: Path):
+    """Encode a .sln file to GSM 06.10 with sox"""
+    subprocess.run(
+        ["sox", "-t", "raw", "-r", str(TELEPHONY_RATE), "-e", "signed-integer", "-b", "16",
+         "-c", "1", str(sln_file), "-t", "gsm", str(gsm_file)],
+        check=True, capture_output=True)
+
+
+def encode(pcm: np.ndarray, fmt: str) -> bytes:
+    """8 kHz 16-bit samples in one of the byte-oriented formats"""
+    if fmt == 'sln':
+        return pcm.astype('<i2').tobytes()
+    if fmt == 'ulaw':
+        return lin2ulaw(pcm).tobytes()
+    if fmt == 'alaw':
+        return lin2alaw(pcm).tobytes()
+    raise ValueError(f"Cannot encode {fmt} in Python")
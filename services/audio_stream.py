@@ -0,0 +1,85 @@
+"""
+Live Call Audio
+Ring buffer for the caller audio an EAGI call streams alongside its AGI
+commands (see scripts/eagi_bridge.py): 8 kHz signed 16-bit mono, written
+frame by frame as it arrives and read by position, so analysis can keep up
+with the caller without an intermediate recording file.
+"""
+import logging
+from typing import Tuple
+
+import numpy as np
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# First byte of an audio frame on an EAGI connection; AGI text never has one
+AUDIO_FRAME_MARKER = 0
+AUDIO_FRAME_HEADER = 3  # marker + 16-bit big-endian payload length
+
+
+def encode_frame(payload: bytes) -> bytes:
+    """Frame raw audio for the AGI connection"""
+    return bytes((AUDIO_FRAME_MARKER,)) + len(payload).to_bytes(2, 'big') + payload
+
+
+class AudioRingBuffer:
+    """
+    Fixed-size ring of the most recent caller audio
+
+    Positions count samples since the call started, so a reader that falls
+    more than `seconds` behind loses the oldest audio (and is told how much)
+    rather than blocking the writer.
+    """
+
+    def __init__(self, seconds: float = settings.EAGI_BUFFER_SECONDS,
+                 sample_rate: int = settings.SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.samples = np.zeros(int(seconds * sample_rate), dtype=np.int16)
+        self.written = 0  # samples written since the call started
+        self.overruns = 0  # samples readers missed
+        self._odd_byte = b''
+
+    @property
+    def seconds_written(self) -> float:
+        return self.written / self.sample_rate
+
+    def write(self, data):
+        """Append raw little-endian 16-bit samples (bytes or memoryview)"""
+        if self._odd_byte:
+            data = self._odd_byte + bytes(data)
+            self._odd_byte = b''
+        if len(data) % 2:
+            self._odd_byte = bytes(data[-1:])
+            data = data[:-1]
+        incoming = np.frombuffer(data, dtype='<i2')
+
+        capacity = len(self.samples)
+        if len(incoming) > capacity:
+            self.written += len(incoming) - capacity
+            incoming = incoming[-capacity:]
+        start = self.written % capacity
+        first = min(len(incoming), capacity - start)
+        self.samples[start:start + first] = incoming[:first]
+        self.samples[:len(incoming) - first] = incoming[first:]
+        self.written += len(incoming)
+
+    def read(self, position: int) -> Tuple[np.ndarray, int]:
+        """
+        Audio from `position` up to now, as float32 in [-1, 1)
+
+        Returns the samples and the position to read from next.
+        """
+        capacity = len(self.samples)
+        oldest = max(self.written - capacity, 0)
+        if position < oldest:
+            self.overruns += oldest - position
+            logger.warning(f"Audio reader fell behind, dropped {(oldest - position) / self.sample_rate:.2f}s")
+            position = oldest
+
+        count = self.written - position
+        start = position % capacity
+        first = min(count, capacity - start)
+        audio = np.concatenate((self.samples[start:start + first], self.samples[:count - first]))
+        return audio.astype(np.float32) / 32768.0, self.written
@@ -0,0 +1,144 @@
+"""
+Call Cancellation
+A per-call token that is tripped when the caller hangs up, so analysis,
+synthesis, LLM and TTS work for a call nobody is listening to stops early
+and gives its worker back.
+
+Deadlines are the other way call work stops early: a latency budget for a
+stage the caller is waiting on, after which the stage gives up on its
+best output and falls back to something cheaper (see FALLBACKS).
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+ABANDONED_WORK = metrics.counter(
+    "meow_abandoned_work_total",
+    "In-flight call work abandoned because the caller hung up", ("stage",))
+
+
+FALLBACKS = metrics.counter(
+    "meow_fallbacks_total",
+    "Call stages that ran out of latency budget and fell back to cheaper output",
+    ("stage", "fallback"))
+
+
+class CallCancelled(Exception):
+    """Raised inside call work once the caller has hung up"""
+
+
+class DeadlineExceeded(Exception):
+    """Raised inside call work once its latency budget has run out"""
+
+
+class CancellationToken:
+    """
+    Thread-safe, one-shot cancellation flag
+
+    Tripped from the event loop (hangup detection) and polled from worker
+    threads (analysis, synthesis) via raise_if_cancelled(). Callbacks let
+    blocking work be interrupted from outside, e.g. killing a subprocess.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled"):
+        """Trip the token and run registered callbacks (once)"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        logger.debug(f"Call cancelled: {reason}")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Cancellation callback failed: {e}")
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise CallCancelled(self.reason)
+
+    def add_callback(self, callback: Callable[[], None]):
+        """Call `callback` on cancellation, or right away if already cancelled"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback: Callable[[], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    async def wait(self):
+        """Wait on the event loop until the token is cancelled"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        self.add_callback(wake)
+        try:
+            await future
+        finally:
+            self.remove_callback(wake)
+
+
+class Deadline:
+    """
+    Latency budget for work a caller is waiting on
+
+    Work polls it like a cancellation token (raise_if_expired()) and sizes
+    its own timeouts from remaining(). Pickled as the time remaining, so
+    it keeps counting down in an analysis pool worker.
+    """
+
+    def __init__(self, seconds: float, remaining: Optional[float] = None):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + (seconds if remaining is None else remaining)
+
+    @classmethod
+    def unlimited(cls) -> 'Deadline':
+        return cls(float('inf'))
+
+    def __reduce__(self):
+        return Deadline, (self.seconds, self.remaining())
+
+    def remaining(self, reserve: float = 0.0) -> float:
+        """Seconds left, less `reserve` kept back for later stages (never negative)"""
+        return max(self.expires_at - time.monotonic() - reserve, 0.0)
+
+    def timeout(self, reserve: float = 0.0) -> Optional[float]:
+        """remaining() as a timeout for asyncio or requests: None if unlimited"""
+        return None if self.seconds == float('inf') else self.remaining(reserve)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def exceeded(self) -> DeadlineExceeded:
+        return DeadlineExceeded(f"over the {self.seconds:g}s budget")
+
+    def raise_if_expired(self, reserve: float = 0.0):
+        if time.monotonic() >= self.expires_at - reserve:
+            raise self.exceeded()
@@ -0,0 +1,181 @@
+"""
+AGI Session Capture
+Opt-in recording of real calls for replay as load tests: the agi_*
+environment, every command with its response and timing, when the caller
+hung up, and the caller audio, both what RECORD FILE produced and what an
+EAGI call streamed live (with the time each frame arrived). Each call
+becomes one zip in AGI_CAPTURE_DIR (call.json, recording-<n>.wav files and
+audio.sln), which scripts/replay_agi.py plays back against an AGI server.
+
+Captures contain callers' voices and numbers; treat them like recordings.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import shlex
+import shutil
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from services.agi_protocol import command_verb
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_VERSION = 2
+
+# EAGI caller audio in a capture: raw 8 kHz 16-bit samples, as the frames carried them
+AUDIO_FILE = "audio.sln"
+
+
+def should_capture() -> bool:
+    """Whether to capture the call that is starting now"""
+    return settings.AGI_CAPTURE_ENABLED and random.random() < settings.AGI_CAPTURE_SAMPLE
+
+
+def record_file_path(command: str) -> Optional[Path]:
+    """The file a RECORD FILE command writes, e.g. /x/caller_1.wav"""
+    try:
+        words = shlex.split(command)
+    except ValueError:
+        return None
+    if len(words) < 4:
+        return None
+    return Path(f"{words[2]}.{words[3]}")
+
+
+class SessionCapture:
+    """
+    Command/response log of one AGI session
+
+    Times are seconds since the session started. A command is "sent" when
+    written and "replied" when its response arrived; commands the caller
+    hung up on have no reply. EAGI audio frames are logged as (arrival
+    time, bytes).
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.commands: List[Dict] = []
+        self.hangup_at: Optional[float] = None
+        self.hangup_reason: Optional[str] = None
+        self.server_hung_up = False
+        self._recordings: Dict[int, Path] = {}  # command index -> pending copy
+        self.audio_frames: List[Tuple[float, int]] = []
+        self._audio = bytearray()
+
+    def _now(self) -> float:
+        return round(time.perf_counter() - self._start, 4)
+
+    def sent(self, commands: List[str]) -> int:
+        """Log commands written in one send; returns the index of the first"""
+        first = len(self.commands)
+        now = self._now()
+        for command in commands:
+            self.commands.append({'command': command, 'sent': now})
+            if command_verb(command) == 'HANGUP':
+                self.server_hung_up = True
+        return first
+
+    def replied(self, index: int, response: str):
+        self.commands[index].update(response=response, replied=self._now())
+
+    def heard(self, payload: memoryview):
+        """Log a frame of the caller's EAGI audio"""
+        self.audio_frames.append((self._now(), len(payload)))
+        self._audio += payload
+
+    def caller_hung_up(self, reason: str):
+        """Called when the call's cancellation token trips"""
+        # The connection closing after our own HANGUP isn't the caller leaving
+        if self.hangup_at is None and not self.server_hung_up:
+            self.hangup_at = self._now()
+            self.hangup_reason = reason
+
+    async def keep_recording(self, index: int, command: str):
+        """
+        Hold on to the audio a RECORD FILE wrote before the call deletes it
+
+        The file system work runs in a thread, off the event loop; awaiting it
+        keeps the handler from deleting the recording first.
+        """
+        source = record_file_path(command)
+        if source is None:
+            return
+        pending = await asyncio.to_thread(self._link_recording, index, source)
+        if pending is not None:
+            self._recordings[index] = pending
+
+    def _link_recording(self, index: int, source: Path) -> Optional[Path]:
+        if not source.exists():
+            return None
+        directory = Path(settings.AGI_CAPTURE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        pending = directory / f".pending-{os.getpid()}-{id(self)}-{index}{source.suffix}"
+        try:
+            # A hard link costs nothing and survives the handler's unlink
+            os.link(source, pending)
+        except OSError:
+            shutil.copyfile(source, pending)
+        return pending
+
+    def save(self, directory: Path, env: Dict[str, str], call_id: str,
+             outcome: str, duration: float) -> Path:
+        """Write the capture zip (blocking; run it off the event loop)"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))
+        path = directory / f"{stamp}-{call_id}.zip"
+
+        recordings = {}
+        try:
+            with zipfile.ZipFile(path.with_suffix(".tmp"), "w", zipfile.ZIP_DEFLATED) as archive:
+                for index, pending in self._recordings.items():
+                    name = f"recording-{index}{pending.suffix}"
+                    archive.write(pending, name)
+                    recordings[str(index)] = name
+                if self.audio_frames:
+                    archive.writestr(AUDIO_FILE, bytes(self._audio))
+                archive.writestr("call.json", json.dumps({
+                    'version': CAPTURE_VERSION,
+                    'call_id': call_id,
+                    'started_at': self.started_at,
+                    'duration': duration,
+                    'outcome': outcome,
+                    'env': env,
+                    'commands': self.commands,
+                    'hangup_at': self.hangup_at,
+                    'hangup_reason': self.hangup_reason,
+                    'recordings': recordings,
+                    'audio_frames': self.audio_frames,
+                }, indent=1))
+            os.replace(path.with_suffix(".tmp"), path)
+        finally:
+            self.discard()
+
+        prune(directory)
+        return path
+
+    def discard(self):
+        for pending in self._recordings.values():
+            pending.unlink(missing_ok=True)
+        self._recordings.clear()
+        self._audio = bytearray()
+
+
+def prune(directory: Path, keep: int = settings.AGI_CAPTURE_MAX_FILES):
+    """Delete the oldest captures beyond `keep`"""
+    captures = sorted(Path(directory).glob("*.zip"))
+    for old in captures[:max(len(captures) - keep, 0)]:
+        old.unlink(missing_ok=True)
+
+
+def load(path: Path) -> Dict:
+    """Read a capture's call.json"""
+    with zipfile.ZipFile(path) as archive:
+        return json.loads(archive.read("call.json"))
@@ -3,21 +3,50 @@ Cat Personalities Service
 Multiple talkative cat characters with unique personalities
 Uses Ollama LLM for dynamic, natural conversations
 """
+import asyncio
 import logging
 import random
+import signal
 import requests
 import json
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Deque, Dict, List, Optional, Tuple
 import soundfile as sf
 import numpy as np
 import subprocess
 import tempfile
+import time
+from collections import deque
 
 from config import settings
+from services import metrics, quality, tracing
+from services.agi_protocol import AGIConnectionClosed
+from services.cancellation import (ABANDONED_WORK, FALLBACKS, CallCancelled, CancellationToken,
+                                   Deadline, DeadlineExceeded)
+from services.prompts import CAT_AUDIO
+from services.scheduler import JobScheduler
 
 logger = logging.getLogger(__name__)
 
+MONOLOGUE_SOURCES = metrics.counter(
+    "meow_monologues_total",
+    "Talkative-cat monologues played, by where they came from "
+    "(prerecorded, pool, speculative, fresh)", ("source",))
+MONOLOGUE_PREWARMS = metrics.counter(
+    "meow_monologue_prewarms_total", "Monologues started speculatively before the caller chose")
+MONOLOGUES_EXPIRED = metrics.counter(
+    "meow_monologues_expired_total", "Speculative monologues discarded unplayed after MONOLOGUE_POOL_TTL")
+
+# TTS runs in at most TTS_CONCURRENCY processes at once. Starting rates, in
+# seconds per character, until real runs have been timed
+TTS_SCHEDULER = JobScheduler("tts", settings.TTS_CONCURRENCY, rates={
+    'piper': 0.01,
+    'coqui': 0.05,
+})
+
+# After a speculative monologue fails (e.g. no TTS installed), seconds before trying again
+PREWARM_RETRY_DELAY = 60
+
 
 class CatPersonality:
     """Base class for cat personality"""
@@ -31,17 +60,25 @@ class CatPersonality:
         self.topics = topics
         self.logger = logging.getLogger(f"{__name__}.{name}")
 
-    def generate_monologue(self, ollama_url: Optional[str] = None) -> str:
+    def generate_monologue(self, ollama_url: Optional[str] = None,
+                           cancel: Optional[CancellationToken] = None,
+                           deadline: Optional[Deadline] = None) -> str:
         """
         Generate a cat monologue using Ollama LLM
 
         Args:
             ollama_url: URL to Ollama API (e.g., http://tailscale-host:11434)
+            cancel: Token checked between streamed tokens; when tripped the
+                    request is dropped and CallCancelled raised
+            deadline: Budget for the request; when it runs out the request
+                      is dropped and DeadlineExceeded raised
 
         Returns:
             Generated text for TTS
         """
         topic = random.choice(self.topics)
+        cancel = cancel or CancellationToken()
+        deadline = deadline or Deadline.unlimited()
 
         prompt = f"""{self.personality_prompt}
 
@@ -54,30 +91,49 @@ Do not use asterisks or stage directions. Just the spoken words.
 Monologue:"""
 
         if ollama_url:
-            # Use Ollama LLM for dynamic generation
+            # Use Ollama LLM for dynamic generation; streamed so a hangup
+            # stops generation after the current token instead of the whole reply
+            deadline.raise_if_expired()
+            timeout = deadline.timeout()
             try:
-                response = requests.post(
+                with requests.post(
                     f"{ollama_url}/api/generate",
                     json={
                         "model": "llama2",  # or any model user has installed
                         "prompt": prompt,
-                        "stream": False,
+                        "stream": True,
                         "options": {
                             "temperature": 0.9,
                             "max_tokens": 60
                         }
                     },
-                    timeout=10
-                )
-
-                if response.status_code == 200:
-                    result = response.json()
-                    text = result.get('response', '').strip()
-                    self.logger.info(f"Generated dynamic monologue: {text[:50]}...")
-                    return text
-                else:
-                    self.logger.warning(f"Ollama API error: {response.status_code}")
+                    timeout=10 if timeout is None else min(10, timeout),
+                    stream=True
+                ) as response:
+                    if response.status_code == 200:
+                        parts = []
+                        for line in response.iter_lines():
+                            cancel.raise_if_cancelled()
+                            deadline.raise_if_expired()
+                            if not line:
+                                continue
+                            chunk = json.loads(line)
+                            parts.append(chunk.get('response', ''))
+                            if chunk.get('done'):
+                                break
+                        text = ''.join(parts).strip()
+                        self.logger.info(f"Generated dynamic monologue: {text[:50]}...")
+                        return text
+                    else:
+                        self.logger.warning(f"Ollama API error: {response.status_code}")
+            except CallCancelled:
+                self.logger.info("Dropped Ollama request, caller hung up")
+                raise
+            except DeadlineExceeded:
+                raise
             except Exception as e:
+                if deadline.expired:
+                    raise deadline.exceeded() from e
                 self.logger.warning(f"Error calling Ollama API: {e}")
 
         # Fallback to pre-written monologues
@@ -218,69 +274,67 @@ CAT_REGISTRY = {
 }
 
 
-class TalkativeCatHandler:
-    """Handles the talkative cats call flow"""
-
-    def __init__(self, session):
-        self.session = session
+class MonologueRenderer:
+    """
+    Turns a cat personality into a playable monologue: LLM text, then TTS
+
+    A hangup (or shutdown) trips `cancel`, which drops the Ollama stream and
+    kills the TTS process. With a `deadline`, the LLM gets what is left of
+    it less MONOLOGUE_TTS_RESERVE, and settles for the cat's scripted
+    monologue if that runs out; TTS running past it raises
+    DeadlineExceeded. Without `use_llm` (the minimal quality tier) the
+    scripted monologue is spoken straight away. Stages are recorded as
+    spans on `trace`.
+    """
+
+    def __init__(self, cancel: CancellationToken, trace: tracing.CallTrace,
+                 ollama_url: Optional[str] = None, deadline: Optional[Deadline] = None,
+                 use_llm: bool = True):
+        self.cancel = cancel
+        self.trace = trace
+        self.ollama_url = ollama_url
+        self.deadline = deadline or Deadline.unlimited()
+        self.use_llm = use_llm
         self.logger = logging.getLogger(__name__)
-        self.ollama_url = os.getenv("OLLAMA_URL", None)  # e.g., "http://tailscale-host:11434"
-
-    def run(self):
-        """Execute talkative cat flow"""
-        try:
-            # Select random enabled personality
-            enabled_cats = [
-                name for name, enabled in settings.CAT_PERSONALITIES.items()
-                if enabled and name in CAT_REGISTRY
-            ]
-
-            if not enabled_cats:
-                self.logger.error("No cat personalities enabled!")
-                return
-
-            cat_name = random.choice(enabled_cats)
-            cat_class = CAT_REGISTRY[cat_name]
-            cat = cat_class()
-
-            self.logger.info(f"Selected cat personality: {cat.name}")
-
-            # Check if we have a pre-recorded audio for this cat
-            audio_file = self._get_or_generate_audio(cat)
-
-            if audio_file and audio_file.exists():
-                # Play the audio
-                audio_path = str(audio_file).replace('.wav', '')
-                self.session.stream_file(audio_path)
-                self.logger.info(f"Played audio: {audio_file}")
-            else:
-                self.logger.error("Failed to generate cat audio")
 
-            # Hang up after playing (cats don't wait for responses)
-            # The IVR handler will handle the actual hangup
-
-        except Exception as e:
-            self.logger.error(f"Error in talkative cats: {e}", exc_info=True)
+    async def render(self, cat: CatPersonality) -> Optional[Path]:
+        """Generate a new monologue for `cat`; the audio file, or None if TTS failed"""
+        if not self.use_llm:
+            return await self._speak(cat.get_fallback_monologue(random.choice(cat.topics)), cat,
+                                     scripted=True)
 
-    def _get_or_generate_audio(self, cat: CatPersonality) -> Optional[Path]:
-        """Get or generate audio for cat monologue"""
-        # Check for pre-recorded audio first
-        prerecorded = settings.CATS_DIR / f"{cat.name.lower()}.wav"
-        if prerecorded.exists():
-            self.logger.info(f"Using pre-recorded audio: {prerecorded}")
-            return prerecorded
-
-        # Generate new monologue
         self.logger.info("Generating new monologue with LLM")
-        text = cat.generate_monologue(self.ollama_url)
+        llm_deadline = Deadline(self.deadline.seconds,
+                                self.deadline.remaining(settings.MONOLOGUE_TTS_RESERVE))
+        # The Ollama request blocks, so it runs on a worker thread
+        with self.trace.span("llm", personality=cat.name) as span:
+            try:
+                text = await asyncio.to_thread(
+                    cat.generate_monologue, self.ollama_url, self.cancel, llm_deadline)
+            except DeadlineExceeded as e:
+                self.logger.warning(f"LLM {e}, using a scripted monologue")
+                FALLBACKS.inc(stage="llm", fallback="scripted_text")
+                span['fallback'] = "scripted_text"
+                text = cat.get_fallback_monologue(random.choice(cat.topics))
+        self.cancel.raise_if_cancelled()
 
         # Generate speech using TTS
-        audio_file = self._text_to_speech(text, cat)
+        return await self._speak(text, cat)
+
+    async def _speak(self, text: str, cat: CatPersonality, **span_attrs) -> Optional[Path]:
+        """TTS once a TTS slot is free, shorter texts first (see services.scheduler)"""
+        async with TTS_SCHEDULER.job(settings.TTS_ENGINE, len(text), self.cancel, self.deadline,
+                                     self.trace):
+            with self.trace.span("tts", engine=settings.TTS_ENGINE, **span_attrs):
+                return await self._text_to_speech(text, cat)
 
-        return audio_file
+    async def _text_to_speech(self, text: str, cat: CatPersonality) -> Optional[Path]:
+        """
+        Convert text to speech using local TTS
 
-    def _text_to_speech(self, text: str, cat: CatPersonality) -> Optional[Path]:
-        """Convert text to speech using local TTS"""
+        A tripped `cancel` kills the TTS process and raises CallCancelled;
+        running out of `deadline` kills it and raises DeadlineExceeded
+        """
         output_file = settings.GENERATED_DIR / f"{cat.name.lower()}_{random.randint(1000, 9999)}.wav"
 
         try:
@@ -295,19 +349,38 @@ class TalkativeCatHandler:
                     "--output_file", str(output_file)
                 ]
 
-                # Run piper with text input
-                process = subprocess.Popen(
-                    cmd,
+                # Run piper with text input (awaited, no thread held while it runs)
+                process = await asyncio.create_subprocess_exec(
+                    *cmd,
                     stdin=subprocess.PIPE,
                     stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE
+                    stderr=subprocess.PIPE,
+                    start_new_session=True
                 )
 
-                stdout, stderr = process.communicate(input=text.encode())
+                def kill():
+                    # The whole process group, so helpers holding the pipes die too
+                    if process.returncode is None:
+                        try:
+                            os.killpg(process.pid, signal.SIGKILL)
+                        except ProcessLookupError:
+                            pass
+
+                self.cancel.add_callback(kill)
+                try:
+                    stdout, stderr = await asyncio.wait_for(
+                        process.communicate(input=text.encode()), self.deadline.timeout())
+                except asyncio.TimeoutError:
+                    kill()
+                    await process.wait()
+                    raise self.deadline.exceeded()
+                finally:
+                    self.cancel.remove_callback(kill)
+                self.cancel.raise_if_cancelled()
 
                 if process.returncode == 0 and output_file.exists():
                     # Adjust pitch if needed (using sox or similar)
-                    self._adjust_audio_properties(output_file, cat)
+                    await asyncio.to_thread(self._adjust_audio_properties, output_file, cat)
                     return output_file
                 else:
                     self.logger.error(f"Piper TTS failed: {stderr.decode()}")
@@ -316,21 +389,35 @@ class TalkativeCatHandler:
                 # Use Coqui TTS (more customizable)
                 self.logger.info("Using Coqui TTS")
                 try:
-                    from TTS.api import TTS
-                    tts = TTS(model_name="tts_models/en/ljspeech/tacotron2-DDC")
-                    tts.tts_to_file(text=text, file_path=str(output_file))
+                    # The thread can't be stopped; past the deadline it is left to finish
+                    await asyncio.wait_for(asyncio.to_thread(self._coqui_to_file, text, output_file),
+                                           self.deadline.timeout())
+                    self.cancel.raise_if_cancelled()
 
                     if output_file.exists():
-                        self._adjust_audio_properties(output_file, cat)
+                        await asyncio.to_thread(self._adjust_audio_properties, output_file, cat)
                         return output_file
+                except asyncio.TimeoutError:
+                    raise self.deadline.exceeded()
+                except CallCancelled:
+                    raise
                 except Exception as e:
                     self.logger.error(f"Coqui TTS error: {e}")
 
+        except (CallCancelled, DeadlineExceeded):
+            output_file.unlink(missing_ok=True)
+            raise
         except Exception as e:
             self.logger.error(f"TTS generation error: {e}", exc_info=True)
 
         return None
 
+    def _coqui_to_file(self, text: str, output_file: Path):
+        """Synthesize with Coqui TTS (CPU-bound, runs in a worker thread)"""
+        from TTS.api import TTS
+        tts = TTS(model_name="tts_models/en/ljspeech/tacotron2-DDC")
+        tts.tts_to_file(text=text, file_path=str(output_file))
+
     def _adjust_audio_properties(self, audio_file: Path, cat: CatPersonality):
         """Adjust pitch and speed of audio file"""
         try:
@@ -364,5 +451,267 @@ class TalkativeCatHandler:
             self.logger.error(f"Error adjusting audio: {e}")
 
 
+class MonologuePool:
+    """
+    Ready-to-play monologues shared by the calls in this process
+
+    Each admitted call starts one speculatively (prepare()) while the
+    caller is still listening to the menu, so whoever presses 2 takes a
+    finished monologue (take()), or waits for one already on its way,
+    instead of starting the LLM and TTS from cold. Monologues nobody took
+    wait for the next caller, up to MONOLOGUE_POOL_TTL seconds; at most
+    MONOLOGUE_POOL_SIZE are ready or being made at once, which also bounds
+    the speculative load on Ollama and the TTS. Nothing is started
+    speculatively while the server is at the minimal quality tier.
+    """
+
+    def __init__(self, size: int = settings.MONOLOGUE_POOL_SIZE,
+                 ttl: float = settings.MONOLOGUE_POOL_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.ready: Deque[Tuple[float, CatPersonality, Path]] = deque()
+        self.pending: Dict[asyncio.Task, CancellationToken] = {}
+        self._changed = asyncio.Event()
+        self._failed_at: Optional[float] = None
+        self.logger = logging.getLogger(f"{__name__}.MonologuePool")
+
+    def prepare(self) -> bool:
+        """Start a monologue in the background if the pool has room; returns whether it did"""
+        self._expire()
+        if not settings.MONOLOGUE_PREWARM or len(self.ready) + len(self.pending) >= self.size:
+            return False
+        if quality.current() == quality.MINIMAL:
+            return False  # no CPU to spare on guesses
+        # Don't keep retrying a TTS that doesn't work
+        if self._failed_at is not None and time.monotonic() - self._failed_at < PREWARM_RETRY_DELAY:
+            return False
+        cats = [name for name in enabled_cats() if CAT_AUDIO.find(name) is None]
+        if not cats:
+            return False  # every cat is pre-recorded
+
+        cancel = CancellationToken()
+        task = asyncio.get_running_loop().create_task(self._render(CAT_REGISTRY[random.choice(cats)](), cancel))
+        self.pending[task] = cancel
+        MONOLOGUE_PREWARMS.inc()
+        return True
+
+    async def take(self, cancel: CancellationToken, deadline: Optional[Deadline] = None
+                   ) -> Optional[Tuple[CatPersonality, Path, str]]:
+        """
+        The oldest ready monologue, waiting for one in progress if none is ready
+
+        Returns (cat, audio file, "pool" or "speculative"), or None when
+        nothing is ready or on its way. Raises DeadlineExceeded if the one
+        on its way doesn't arrive within `deadline`.
+        """
+        deadline = deadline or Deadline.unlimited()
+        self._expire()
+        source = "pool"
+        while not self.ready:
+            if not self.pending:
+                return None
+            source = "speculative"
+            self._changed.clear()
+            waiter = asyncio.ensure_future(self._changed.wait())
+            hangup = asyncio.ensure_future(cancel.wait())
+            try:
+                await asyncio.wait({waiter, hangup}, timeout=deadline.timeout(),
+                                   return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                waiter.cancel()
+                hangup.cancel()
+            # The monologue stays in the pool for the next caller
+            cancel.raise_if_cancelled()
+            if not self.ready:
+                deadline.raise_if_expired()
+        _, cat, path = self.ready.popleft()
+        return cat, path, source
+
+    def take_ready(self) -> Optional[Tuple[CatPersonality, Path]]:
+        """The oldest ready monologue, if there is one, without waiting"""
+        self._expire()
+        if not self.ready:
+            return None
+        _, cat, path = self.ready.popleft()
+        return cat, path
+
+    async def close(self):
+        """Stop monologues in progress and delete unclaimed ones (server shutdown)"""
+        for cancel in self.pending.values():
+            cancel.cancel("shutting down")
+        if self.pending:
+            await asyncio.wait(list(self.pending))
+        while self.ready:
+            self.ready.popleft()[2].unlink(missing_ok=True)
+
+    async def _render(self, cat: CatPersonality, cancel: CancellationToken):
+        # Traced like a call of its own, since it may outlive the call that started it
+        trace = tracing.CallTrace()
+        tier = quality.current()
+        trace.attrs.update(kind="prewarm", personality=cat.name, quality=tier)
+        try:
+            path = await MonologueRenderer(cancel, trace, os.getenv("OLLAMA_URL", None),
+                                           use_llm=quality.llm_monologues(tier)).render(cat)
+        except CallCancelled:
+            path = None
+        except Exception as e:
+            self.logger.warning(f"Speculative monologue failed: {e}")
+            path = None
+        finally:
+            self.pending.pop(asyncio.current_task(), None)
+        trace.finish("completed" if path is not None else "cancelled" if cancel.cancelled else "failed")
+        tracing.RECORDER.record(trace)
+
+        if path is not None:
+            self.ready.append((time.monotonic(), cat, path))
+            self._failed_at = None
+            self.logger.debug(f"Monologue ready for the next caller: {path}")
+        elif not cancel.cancelled:
+            self._failed_at = time.monotonic()
+        self._changed.set()
+
+    def _expire(self):
+        while self.ready and time.monotonic() - self.ready[0][0] > self.ttl:
+            self.ready.popleft()[2].unlink(missing_ok=True)
+            MONOLOGUES_EXPIRED.inc()
+
+
+def enabled_cats() -> List[str]:
+    return [name for name, enabled in settings.CAT_PERSONALITIES.items()
+            if enabled and name in CAT_REGISTRY]
+
+
+# Created on first use, inside the server's event loop
+_pool: Optional[MonologuePool] = None
+
+
+def monologue_pool() -> MonologuePool:
+    global _pool
+    if _pool is None:
+        _pool = MonologuePool()
+    return _pool
+
+
+class TalkativeCatHandler:
+    """Handles the talkative cats call flow"""
+
+    def __init__(self, session):
+        self.session = session
+        self.cancel: CancellationToken = session.cancellation
+        self.logger = logging.getLogger(__name__)
+        self.ollama_url = os.getenv("OLLAMA_URL", None)  # e.g., "http://tailscale-host:11434"
+
+    async def run(self, lead_in=None, closing=None):
+        """
+        Execute talkative cat flow
+
+        Args:
+            lead_in: AGIBatch (the intro) to play while the monologue is
+                     generated; the hold sound follows if it isn't ready
+            closing: AGIBatch to queue the monologue playback into instead of
+                     playing it immediately (the caller sends it)
+        """
+        try:
+            # Select random enabled personality
+            cats = enabled_cats()
+
+            if not cats:
+                self.logger.error("No cat personalities enabled!")
+                return
+
+            cat = CAT_REGISTRY[random.choice(cats)]()
+
+            # Check if we have a pre-recorded audio for this cat, generating
+            # one while the intro plays if not. A ready-made monologue may be
+            # another cat's, so name the one the caller actually hears
+            cat, audio_file = await self.session.play_while(
+                self._get_or_generate_audio(cat), lead_in, stage="talkative_cats")
+            self.session.trace.attrs['cat'] = cat.name
+            self.logger.info(f"Selected cat personality: {cat.name}")
+
+            if audio_file is not None:
+                # Play the audio
+                audio_path = str(audio_file.with_suffix(''))
+                if closing is not None:
+                    closing.stream_file(audio_path)
+                    self.logger.info(f"Queued audio: {audio_file}")
+                else:
+                    await self.session.stream_file(audio_path)
+                    self.logger.info(f"Played audio: {audio_file}")
+            else:
+                self.logger.error("Failed to generate cat audio")
+
+            # Hang up after playing (cats don't wait for responses)
+            # The IVR handler will handle the actual hangup
+
+        except CallCancelled as e:
+            self.logger.info(f"Abandoned cat monologue, caller hung up ({e})")
+            ABANDONED_WORK.inc(stage="talkative_cats")
+            raise
+        except AGIConnectionClosed:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error in talkative cats: {e}", exc_info=True)
+
+    async def _get_or_generate_audio(self, cat: CatPersonality) -> Tuple[CatPersonality, Optional[Path]]:
+        """
+        Get or generate audio for cat monologue
+
+        Generation gets MONOLOGUE_BUDGET seconds; past that the caller hears
+        a pre-rendered monologue instead. Returns the cat whose monologue it
+        is (a pooled or fallback one may not be `cat`'s) and its audio.
+        """
+        deadline = Deadline(settings.MONOLOGUE_BUDGET)
+        trace = self.session.trace
+        # Check for pre-recorded audio first
+        prerecorded = CAT_AUDIO.find(cat.name.lower())
+        if prerecorded is not None:
+            self.logger.info(f"Using pre-recorded audio: {prerecorded}")
+            MONOLOGUE_SOURCES.inc(source="prerecorded")
+            trace.attrs['monologue'] = "prerecorded"
+            return cat, prerecorded
+
+        stage = "monologue_pool"
+        try:
+            # Then one made speculatively, for this caller or an earlier one
+            with trace.span("monologue_pool") as span:
+                taken = await monologue_pool().take(self.cancel, deadline)
+                span['hit'] = taken is not None
+            if taken is not None:
+                cat, audio_file, source = taken
+                self.logger.info(f"Using {source} monologue from {cat.name}: {audio_file}")
+                MONOLOGUE_SOURCES.inc(source=source)
+                trace.attrs['monologue'] = source
+                return cat, audio_file
+
+            MONOLOGUE_SOURCES.inc(source="fresh")
+            tier = quality.current()
+            trace.attrs.update(monologue="fresh", quality=tier)
+            stage = "tts"  # the LLM settles for scripted text rather than run over
+            return cat, await MonologueRenderer(self.cancel, trace, self.ollama_url, deadline,
+                                                use_llm=quality.llm_monologues(tier)).render(cat)
+
+        except DeadlineExceeded as e:
+            self.logger.warning(f"Monologue ({stage}) {e}, falling back to a pre-rendered one")
+            cat, audio_file = self._prerendered_fallback(cat)
+            fallback = "prerendered" if audio_file is not None else "none"
+            FALLBACKS.inc(stage=stage, fallback=fallback)
+            trace.attrs['fallback'] = f"{stage}: {fallback}"
+            return cat, audio_file
+
+    def _prerendered_fallback(self, cat: CatPersonality) -> Tuple[CatPersonality, Optional[Path]]:
+        """A monologue that is ready now: one just finished for the pool, else a `<cat>_fallback` recording"""
+        taken = monologue_pool().take_ready()
+        if taken is not None:
+            return taken[0], taken[1]
+        names = [cat.name.lower()] + [name for name in enabled_cats() if name != cat.name.lower()]
+        for name in names:
+            audio_file = CAT_AUDIO.find(f"{name}_fallback")
+            if audio_file is not None:
+                return (cat if name == cat.name.lower() else CAT_REGISTRY[name]()), audio_file
+        self.logger.error("No pre-rendered fallback monologue (audio/cats/<cat>_fallback.wav)")
+        return cat, None
+
+
 # Need to import os for environment variable
 import os
@@ -0,0 +1,132 @@
+"""
+Voice Endpointer
+Decides, from the caller's audio as it arrives, when they have finished
+talking, so a recording can stop after a short hangover instead of
+Asterisk's fixed RECORD FILE silence timeout.
+
+A 20ms frame counts as speech when its energy is above both an absolute
+floor and the running noise estimate, and its zero-crossing rate is low
+enough to be voice rather than hiss (very loud frames count regardless, for
+fricatives). Speech starts after ENDPOINT_MIN_SPEECH seconds of speech
+frames and has ended once ENDPOINT_HANGOVER seconds pass without any.
+"""
+import logging
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from config import settings
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT_SAVED_SECONDS = metrics.histogram(
+    "meow_endpoint_saved_seconds",
+    "Recording time saved per call by ending on the endpointer instead of the silence timeout",
+    buckets=(0.25, 0.5, 1, 1.5, 2, 2.5, 3, 4, 5))
+ENDPOINTS = metrics.counter(
+    "meow_endpoints_total", "How caller turns ended", ("reason",))
+
+FRAME_SECONDS = 0.02
+WAV_HEADER_BYTES = 44  # Asterisk's 16-bit PCM wav header
+
+
+class Endpointer:
+    """Energy / zero-crossing voice activity detector with hangover"""
+
+    def __init__(self, sample_rate: int = settings.SAMPLE_RATE,
+                 hangover: float = settings.ENDPOINT_HANGOVER,
+                 min_speech: float = settings.ENDPOINT_MIN_SPEECH):
+        self.sample_rate = sample_rate
+        self.frame_size = int(FRAME_SECONDS * sample_rate)
+        self.hangover = hangover
+        self.min_speech_frames = max(1, round(min_speech / FRAME_SECONDS))
+        self.noise_db = settings.ENDPOINT_THRESHOLD_DB - settings.ENDPOINT_SNR_DB
+        self.frames = 0
+        self.speech_started: Optional[float] = None  # seconds into the audio
+        self.speech_ended: Optional[float] = None  # end of the last speech frame
+        self._run = 0  # consecutive speech frames
+        self._pending = np.zeros(0, dtype=np.float32)
+
+    @property
+    def position(self) -> float:
+        """Seconds of audio analyzed"""
+        return self.frames * FRAME_SECONDS
+
+    @property
+    def heard_speech(self) -> bool:
+        return self.speech_started is not None
+
+    @property
+    def ended(self) -> bool:
+        """Speech started and has been followed by `hangover` seconds without any"""
+        return (self.speech_ended is not None
+                and self.position - self.speech_ended >= self.hangover)
+
+    def feed(self, audio: np.ndarray) -> bool:
+        """Process newly arrived audio (floats in [-1, 1)); returns `ended`"""
+        if len(self._pending):
+            audio = np.concatenate((self._pending, audio))
+        count = len(audio) // self.frame_size
+        self._pending = audio[count * self.frame_size:]
+        if count == 0:
+            return self.ended
+
+        frames = audio[:count * self.frame_size].reshape(count, self.frame_size)
+        energy_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        for db, crossings in zip(energy_db, zcr):
+            threshold = max(settings.ENDPOINT_THRESHOLD_DB, self.noise_db + settings.ENDPOINT_SNR_DB)
+            speech = db > threshold and (crossings < settings.ENDPOINT_MAX_ZCR or db > threshold + 10)
+            self.frames += 1
+            if speech:
+                self._run += 1
+                if self._run >= self.min_speech_frames:
+                    if self.speech_started is None:
+                        self.speech_started = self.position - self._run * FRAME_SECONDS
+                    self.speech_ended = self.position
+            else:
+                self._run = 0
+                # Track the background level from non-speech frames only
+                self.noise_db += 0.05 * (db - self.noise_db)
+        return self.ended
+
+    def saved_seconds(self, recording_end: float,
+                      silence_timeout: float = settings.RECORD_SILENCE) -> float:
+        """
+        How much sooner the recording ended (at `recording_end` seconds of
+        audio) than Asterisk's silence timeout would have ended it
+        """
+        if self.speech_ended is None:
+            return 0.0
+        return max(self.speech_ended + silence_timeout - recording_end, 0.0)
+
+
+class RecordingTail:
+    """
+    Reads the audio Asterisk has appended to a recording still being written
+
+    read() is blocking file I/O (recordings may be on a network mount);
+    callers on the event loop run it with asyncio.to_thread, one at a time.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.offset = WAV_HEADER_BYTES
+        self._odd = b''
+
+    def read(self) -> np.ndarray:
+        """New samples since the last call (empty until the file appears)"""
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self.offset)
+                data = self._odd + f.read()
+        except FileNotFoundError:
+            return np.zeros(0, dtype=np.float32)
+        self.offset += len(data) - len(self._odd)
+        usable = len(data) - len(data) % 2
+        self._odd = data[usable:]
+        return np.frombuffer(data[:usable], dtype='<i2').astype(np.float32) / 32768.0
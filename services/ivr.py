@@ -5,14 +5,17 @@ Manages the call tree and routes callers to different experiences
 import logging
 import random
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import Optional, TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from agi_server import AGISession
+    from agi_server import AGIBatch, AGISession
 
 from config import settings
+from services.agi_protocol import AGIConnectionClosed, parse_result
+from services.cancellation import CallCancelled
+from services.prompts import PROMPTS
 from services.meow_generator import MeowMockeryHandler
-from services.cat_personalities import TalkativeCatHandler
+from services.cat_personalities import TalkativeCatHandler, monologue_pool
 
 logger = logging.getLogger(__name__)
 
@@ -24,106 +27,133 @@ class IVRHandler:
         self.session = session
         self.logger = logging.getLogger(f"{__name__}.IVRHandler")
 
-    def run(self):
+    async def run(self):
         """Main IVR flow"""
         try:
-            # Answer the call
-            self.session.answer()
-            self.session.verbose("Meow-Now IVR Started", 2)
+            # Answer the call; sent together with the menu prompts
+            batch = self.session.batch()
+            batch.answer()
+            batch.verbose("Meow-Now IVR Started", 2)
+
+            # Start on a monologue while the menu plays, in case they press 2;
+            # if they don't, it is kept for the next caller who does
+            monologue_pool().prepare()
 
             # Play welcome message and get menu choice
-            choice = self.main_menu()
+            choice = await self.main_menu(batch)
 
             if choice == "1":
                 self.logger.info("Caller selected: Meow Mockery")
-                self.handle_meow_mockery()
+                await self.handle_meow_mockery()
             elif choice == "2":
                 self.logger.info("Caller selected: Talkative Cats")
-                self.handle_talkative_cats()
+                await self.handle_talkative_cats()
             else:
                 self.logger.info("No valid selection, playing default message")
-                self.play_audio("goodbye")
-                self.session.hangup()
+                await self.say_goodbye("goodbye")
 
+        except (AGIConnectionClosed, CallCancelled):
+            self.logger.info("Caller hung up")
         except Exception as e:
             self.logger.error(f"Error in IVR flow: {e}", exc_info=True)
             try:
-                self.play_audio("error")
-                self.session.hangup()
+                await self.say_goodbye("error")
             except:
                 pass
 
-    def main_menu(self) -> str:
-        """Present main menu and get caller's choice"""
+    async def main_menu(self, batch: Optional['AGIBatch'] = None) -> str:
+        """
+        Present main menu and get caller's choice
+
+        Args:
+            batch: Commands to send ahead of the menu prompts in the same write
+        """
         self.logger.info("Playing main menu")
+        batch = batch if batch is not None else self.session.batch()
 
         # Play welcome message and prompt for choice
         # "Welcome to Meow-Now! Press 1 for the meow mockery experience,
         #  or press 2 to hear from our talkative cats."
-        prompt = self.get_audio_path("main_menu")
-
-        if not prompt.exists():
+        if PROMPTS.find("main_menu") is None:
             # Fallback: use individual prompts
-            self.play_audio("welcome")
-            choice = self.session.get_data("menu_prompt", timeout=5000, max_digits=1)
+            self.queue_audio("welcome", batch)
+            batch.get_data("menu_prompt", timeout=5000, max_digits=1)
         else:
-            choice = self.session.get_data("main_menu", timeout=5000, max_digits=1)
+            batch.get_data("main_menu", timeout=5000, max_digits=1)
+
+        responses = await batch.send()
+        choice = parse_result(responses[-1])
 
         self.logger.info(f"Caller pressed: {choice}")
         return choice
 
-    def handle_meow_mockery(self):
+    async def handle_meow_mockery(self):
         """Handle the meow mockery experience (Option 1)"""
         self.logger.info("Starting meow mockery handler")
 
-        # Play instructions
-        self.play_audio("meow_instructions")
+        # Play instructions, pipelined with the recording that follows
+        lead_in = self.session.batch()
+        self.queue_audio("meow_instructions", lead_in)
         # "Get ready to be mocked by a cat! Start talking after the beep.
         #  You have 60 seconds. Press pound when finished."
 
-        # Initialize meow mockery handler
+        # Initialize meow mockery handler; it queues the meow playback
+        # into `closing` so it goes out with the goodbye and hangup
+        closing = self.session.batch()
         handler = MeowMockeryHandler(self.session)
-        handler.run()
+        await handler.run(lead_in=lead_in, closing=closing)
 
         # Say goodbye and hang up
-        self.play_audio("meow_goodbye")
-        self.session.hangup()
+        await self.say_goodbye("meow_goodbye", closing)
 
-    def handle_talkative_cats(self):
+    async def handle_talkative_cats(self):
         """Handle the talkative cats experience (Option 2)"""
         self.logger.info("Starting talkative cats handler")
 
-        # Play intro
-        self.play_audio("cats_intro")
+        # Intro, played while the monologue is being prepared
+        lead_in = self.session.batch()
+        self.queue_audio("cats_intro", lead_in)
         # "Connecting you to one of our talkative felines..."
 
         # Get a random cat personality
+        closing = self.session.batch()
         handler = TalkativeCatHandler(self.session)
-        handler.run()
+        await handler.run(lead_in=lead_in, closing=closing)
 
         # Hang up (cats hang up themselves)
-        self.session.hangup()
+        await closing.hangup().send()
 
-    def play_audio(self, name: str) -> bool:
+    async def say_goodbye(self, name: str, batch: Optional['AGIBatch'] = None):
+        """Play a closing prompt and hang up in one round trip"""
+        batch = batch if batch is not None else self.session.batch()
+        self.queue_audio(name, batch)
+        await batch.hangup().send()
+
+    async def play_audio(self, name: str) -> bool:
         """Play an audio file by name"""
-        audio_path = self.get_audio_path(name)
+        batch = self.session.batch()
+        if not self.queue_audio(name, batch):
+            return False
+        await batch.send()
+        return True
+
+    def queue_audio(self, name: str, batch: 'AGIBatch') -> bool:
+        """Add playback of an audio file to a batch"""
+        audio_path = PROMPTS.find(name)
 
-        if audio_path.exists():
+        if audio_path is not None:
             # Remove extension for Asterisk
-            file_without_ext = str(audio_path).replace('.wav', '').replace('.gsm', '')
-            self.session.stream_file(file_without_ext)
+            batch.stream_file(str(audio_path.with_suffix('')))
             return True
         else:
-            self.logger.warning(f"Audio file not found: {audio_path}")
+            self.logger.warning(f"Audio file not found: {self.get_audio_path(name)}")
             return False
 
     def get_audio_path(self, name: str) -> Path:
-        """Get full path to audio file"""
-        # Try different formats
-        for ext in ['.wav', '.gsm', '.ulaw']:
-            path = settings.PROMPTS_DIR / f"{name}{ext}"
-            if path.exists():
-                return path
+        """Get full path to audio file (from the prompt index)"""
+        path = PROMPTS.find(name)
+        if path is not None:
+            return path
 
         # Return default wav path even if doesn't exist
         return settings.PROMPTS_DIR / f"{name}.wav"
@@ -1,16 +1,24 @@
 """
 Improved Meow Generation Service with better fallbacks
 """
+import asyncio
 import logging
 import numpy as np
 from pathlib import Path
 from typing import List, Dict, Optional
 import soundfile as sf
+import tempfile
 import time
 import uuid
 
 from config import settings
-from services.voice_analyzer import VoiceAnalyzer
+from services.agi_protocol import AGIConnectionClosed, parse_result
+from services.ami_client import AMIError
+from services.cancellation import (ABANDONED_WORK, FALLBACKS, CallCancelled, CancellationToken,
+                                   Deadline, DeadlineExceeded)
+from services import quality, worker_pool
+from services.endpointer import ENDPOINT_SAVED_SECONDS, ENDPOINTS, Endpointer, RecordingTail
+from services.voice_analyzer import StreamingVoiceAnalyzer, VoiceAnalyzer
 
 logger = logging.getLogger(__name__)
 
@@ -88,12 +96,20 @@ class MeowSynthesizer:
 
         return meow.astype(np.float32)
 
-    def generate_meow_sequence(self, voice_analysis: Dict) -> np.ndarray:
+    def generate_meow_sequence(self, voice_analysis: Dict,
+                               cancel: Optional[CancellationToken] = None,
+                               deadline: Optional[Deadline] = None) -> np.ndarray:
         """
         Generate sequence of meows matching the voice analysis
         IMPROVED: Better handling of poor pitch detection
+
+        Raises CallCancelled if `cancel` is tripped part way through, and
+        DeadlineExceeded if `deadline` runs out before every segment has
+        its meow
         """
         self.logger.info("Generating meow sequence from voice analysis")
+        cancel = cancel or CancellationToken()
+        deadline = deadline or Deadline.unlimited()
 
         segments = voice_analysis['speech_segments']
         rhythm = voice_analysis['rhythm_pattern']
@@ -104,12 +120,15 @@ class MeowSynthesizer:
         if len(segments) == 0 or (len(segments) < 3 and duration > 3):
             self.logger.warning(f"Poor speech detection ({len(segments)} segments for {duration:.1f}s recording)")
             self.logger.info("Using duration-based meow generation")
-            return self._generate_duration_based_meows(duration, mean_pitch)
+            return self._generate_duration_based_meows(duration, mean_pitch, cancel)
 
         # Generate meows for each segment
         meow_sequence = []
 
         for i, (start, end, pitch) in enumerate(segments):
+            cancel.raise_if_cancelled()
+            deadline.raise_if_expired()
+
             # Adjust pitch to cat range
             cat_pitch = self._human_to_cat_pitch(pitch)
 
@@ -137,7 +156,8 @@ class MeowSynthesizer:
 
         return full_meow
 
-    def _generate_duration_based_meows(self, recording_duration: float, base_pitch: float) -> np.ndarray:
+    def _generate_duration_based_meows(self, recording_duration: float, base_pitch: float,
+                                       cancel: Optional[CancellationToken] = None) -> np.ndarray:
         """
         Generate meows based on recording duration when speech detection fails
         Creates a sequence of varied meows that roughly match the recording length
@@ -146,12 +166,15 @@ class MeowSynthesizer:
         target_duration = min(recording_duration * 0.4, 15.0)  # Cap at 15 seconds
         
         cat_pitch = self._human_to_cat_pitch(base_pitch)
+        cancel = cancel or CancellationToken()
         
         meow_sequence = []
         current_time = 0
         
-        # Generate varied meows
-        while current_time < target_duration:
+        # Generate varied meows (at least one, however short the recording)
+        while not meow_sequence or current_time < target_duration:
+            cancel.raise_if_cancelled()
+
             # Random meow duration between 0.4 and 1.0 seconds
             meow_duration = np.random.uniform(0.4, 1.0)
             
@@ -202,64 +225,385 @@ class MeowSynthesizer:
         return cat_pitch
 
 
+_analyzer: Optional[VoiceAnalyzer] = None
+_synthesizer: Optional[MeowSynthesizer] = None
+_sampler = None  # RealMeowGenerator once loaded, False if it can't be
+
+
+def render_mockery(recording_file: str, meow_file: str, deadline: Optional[Deadline] = None,
+                   tier: str = quality.FULL, cancel: Optional[CancellationToken] = None) -> Dict:
+    """
+    Analyze a recording and write the matching meows to `meow_file`
+
+    Runs in an analysis pool worker (or an executor thread), so it takes and
+    returns paths and a small summary rather than audio arrays; `timings`
+    holds the seconds each stage took, for the call's trace. `tier` (see
+    services.quality) picks the pitch detector and meow generator. A stage
+    that runs past `deadline` gives way to meows based on the recording's
+    duration alone, and `fallback` names it.
+    """
+    global _analyzer, _synthesizer
+    if _analyzer is None:
+        _analyzer = VoiceAnalyzer()
+    if _synthesizer is None:
+        _synthesizer = MeowSynthesizer()
+    cancel = cancel or CancellationToken()
+    timings = {}
+
+    # Analyze voice
+    start = time.perf_counter()
+    fallback = None
+    try:
+        analysis = _analyzer.analyze_audio_file(Path(recording_file), cancel=cancel, deadline=deadline,
+                                                method=quality.pitch_method(tier))
+    except DeadlineExceeded as e:
+        logger.warning(f"Voice analysis {e}, falling back to duration-based meows")
+        analysis = _duration_only_analysis(sf.info(recording_file).duration)
+        fallback = "analysis"
+    timings['analysis'] = time.perf_counter() - start
+
+    return _write_meows(analysis, meow_file, cancel, timings, tier, deadline, fallback)
+
+
+def render_meows(analysis: Dict, meow_file: str, deadline: Optional[Deadline] = None,
+                 tier: str = quality.FULL, cancel: Optional[CancellationToken] = None) -> Dict:
+    """
+    Write the meows for an analysis done elsewhere (live EAGI audio) to
+    `meow_file`; returns the same summary as render_mockery
+    """
+    global _synthesizer
+    if _synthesizer is None:
+        _synthesizer = MeowSynthesizer()
+    return _write_meows(analysis, meow_file, cancel or CancellationToken(), {}, tier, deadline)
+
+
+def _meow_generator(tier: str):
+    """Pitch-shifted real samples where the tier allows and librosa is installed, else synthesis"""
+    global _sampler
+    if not quality.sampled_meows(tier):
+        return _synthesizer
+    if _sampler is None:
+        try:
+            from services.real_meow_generator import RealMeowGenerator
+            _sampler = RealMeowGenerator(sample_rate=settings.SAMPLE_RATE)
+        except ImportError as e:
+            logger.info(f"Sample-based meows unavailable ({e}), synthesizing them instead")
+            _sampler = False
+    return _sampler or _synthesizer
+
+
+def _duration_only_analysis(duration: float) -> Dict:
+    # No segments: the synthesizer sizes its meows to the duration instead
+    return {
+        'mean_pitch': settings.MEOW_BASE_PITCH,
+        'pitch_range': (settings.MEOW_BASE_PITCH - 50, settings.MEOW_BASE_PITCH + 50),
+        'pitch_variance': 20,
+        'speech_segments': [],
+        'rhythm_pattern': [],
+        'speaking_rate': 0,
+        'duration': duration
+    }
+
+
+def _write_meows(analysis: Dict, meow_file: str, cancel: CancellationToken,
+                 timings: Dict, tier: str = quality.FULL, deadline: Optional[Deadline] = None,
+                 fallback: Optional[str] = None) -> Dict:
+    # Generate meow mockery
+    start = time.perf_counter()
+    generator = _meow_generator(tier)
+    try:
+        meow_audio = generator.generate_meow_sequence(analysis, cancel=cancel, deadline=deadline)
+    except DeadlineExceeded as e:
+        logger.warning(f"Meow synthesis {e}, falling back to duration-based meows")
+        meow_audio = _synthesizer.generate_meow_sequence(
+            _duration_only_analysis(analysis['duration']), cancel=cancel)
+        fallback = "synthesis"
+    timings['synthesis'] = time.perf_counter() - start
+
+    # Nobody to play it to: don't bother writing it
+    cancel.raise_if_cancelled()
+
+    # Save meow audio
+    start = time.perf_counter()
+    sf.write(meow_file, meow_audio, settings.SAMPLE_RATE)
+    timings['wav_write'] = time.perf_counter() - start
+
+    return {
+        'timings': timings,
+        'mean_pitch': float(analysis['mean_pitch']),
+        'segments': len(analysis['speech_segments']),
+        'duration': float(analysis['duration']),
+        'meow_duration': len(meow_audio) / settings.SAMPLE_RATE,
+        'fallback': fallback,
+        'meows': "synthesized" if generator is _synthesizer else "sampled",
+    }
+
+
+def warm_up():
+    """
+    Run one mockery end to end on a synthetic voice, so a caller who
+    presses 1 doesn't pay for the pipeline's first run (analyzer and
+    synthesizer setup, lazily loaded library code, first-use allocations).
+    Called in each analysis worker as the pool starts.
+    """
+    t = np.arange(settings.SAMPLE_RATE) / settings.SAMPLE_RATE
+    voice = 0.3 * np.sin(2 * np.pi * 180 * t) * (1 + 0.3 * np.sin(2 * np.pi * 3 * t))
+    with tempfile.TemporaryDirectory() as directory:
+        recording = Path(directory) / "warm_up.wav"
+        sf.write(recording, voice, settings.SAMPLE_RATE)
+        render_mockery(str(recording), str(Path(directory) / "warm_up_meows.wav"))
+
+
 class MeowMockeryHandler:
     """Handles the meow mockery call flow"""
 
     def __init__(self, session):
         self.session = session
+        self.cancel: CancellationToken = session.cancellation
         self.logger = logging.getLogger(__name__)
-        self.analyzer = VoiceAnalyzer()
-        self.synthesizer = MeowSynthesizer()
 
-    def run(self):
-        """Execute meow mockery flow"""
-        try:
-            # Record caller's voice (max 60 seconds, stop on #)
-            recording_id = str(uuid.uuid4())
-            recording_path = settings.RECORDINGS_DIR / f"caller_{recording_id}"
-
-            self.logger.info(f"Recording caller speech: {recording_path}")
-
-            # Record with 60 second timeout, 3 seconds of silence ends recording
-            result = self.session.record_file(
-                str(recording_path),
-                format="wav",
-                escape_digits="#",
-                timeout=settings.MAX_RECORDING_DURATION * 1000,  # milliseconds
-                silence=3  # 3 seconds of silence
-            )
+    async def run(self, lead_in=None, closing=None):
+        """
+        Execute meow mockery flow
 
-            self.logger.info(f"Recording complete: {result}")
+        On EAGI calls the caller's live audio is analyzed as it arrives
+        instead of recording to a file first.
 
-            # Analyze the recording
-            recording_file = Path(f"{recording_path}.wav")
+        Args:
+            lead_in: AGIBatch to send together with the RECORD FILE command
+            closing: AGIBatch to queue the meow playback into instead of
+                     playing it immediately (the caller sends it)
+        """
+        recording_id = str(uuid.uuid4())
+        recording_path = settings.RECORDINGS_DIR / f"caller_{recording_id}"
+        recording_file = Path(f"{recording_path}.wav")
+        meow_file = settings.GENERATED_DIR / f"meow_{recording_id}.wav"
 
-            if not recording_file.exists():
-                self.logger.error(f"Recording file not found: {recording_file}")
+        try:
+            if self.session.audio is not None:
+                summary = await self._mock_live_audio(lead_in, meow_file)
+            else:
+                summary = await self._mock_recording(lead_in, recording_path, recording_file,
+                                                     meow_file)
+            if summary is None:
                 return
 
-            # Analyze voice
-            analysis = self.analyzer.analyze_audio_file(recording_file)
-
-            # Generate meow mockery
-            meow_audio = self.synthesizer.generate_meow_sequence(analysis)
-
-            # Save meow audio
-            meow_file = settings.GENERATED_DIR / f"meow_{recording_id}.wav"
-            sf.write(meow_file, meow_audio, settings.SAMPLE_RATE)
-
-            self.logger.info(f"Generated meow mockery: {meow_file}")
+            self.logger.info(f"Generated meow mockery: {meow_file} ({summary['segments']} segments, "
+                             f"{summary['meow_duration']:.1f}s)")
 
             # Play back the meows
             meow_path_no_ext = str(meow_file).replace('.wav', '')
-            self.session.stream_file(meow_path_no_ext)
+            if closing is not None:
+                closing.stream_file(meow_path_no_ext)
+            else:
+                await self.session.stream_file(meow_path_no_ext)
 
             # Cleanup
             try:
-                recording_file.unlink()
+                recording_file.unlink(missing_ok=True)
                 # Keep meow file for a bit in case needed
             except Exception as e:
                 self.logger.warning(f"Cleanup error: {e}")
 
+        except CallCancelled as e:
+            self.logger.info(f"Abandoned meow mockery, caller hung up ({e})")
+            ABANDONED_WORK.inc(stage="meow_mockery")
+            recording_file.unlink(missing_ok=True)
+            meow_file.unlink(missing_ok=True)
+            raise
+        except AGIConnectionClosed:
+            recording_file.unlink(missing_ok=True)
+            raise
+        except asyncio.TimeoutError:
+            self.logger.error(f"Meow rendering timed out after {settings.ANALYSIS_TASK_TIMEOUT:g}s")
+            recording_file.unlink(missing_ok=True)
         except Exception as e:
             self.logger.error(f"Error in meow mockery: {e}", exc_info=True)
+
+    async def _mock_recording(self, lead_in, recording_path: Path, recording_file: Path,
+                              meow_file: Path) -> Optional[Dict]:
+        """Have Asterisk record the caller to a file, then render from that"""
+        # Record caller's voice (max 60 seconds, stop on #)
+        self.logger.info(f"Recording caller speech: {recording_path}")
+
+        # RECORD_SILENCE seconds of silence end the recording unless the
+        # endpointer (watching the file as Asterisk writes it) gets there first
+        batch = lead_in if lead_in is not None else self.session.batch()
+        batch.record_file(
+            str(recording_path),
+            format="wav",
+            escape_digits="#",
+            timeout=settings.MAX_RECORDING_DURATION * 1000,  # milliseconds
+            silence=settings.RECORD_SILENCE
+        )
+        ami = self.session.ami
+        endpointer = tail = watcher = None
+        stopping, recorded = asyncio.Event(), asyncio.Event()
+        followed = False
+        if settings.ENDPOINT_ENABLED and ami is not None and ami.connected:
+            endpointer = Endpointer()
+            tail = RecordingTail(recording_file)
+            watcher = asyncio.create_task(self._watch_recording(endpointer, tail, stopping, recorded))
+        try:
+            result = (await batch.send())[-1]
+        finally:
+            if watcher is not None:
+                recorded.set()
+                if stopping.is_set():
+                    watcher.cancel()  # done reading; only the PlayDTMF is left
+                else:
+                    # Not cancelled mid-read: a read in its thread would race ours
+                    followed = await watcher
+
+        self.logger.info(f"Recording complete: {result}")
+        if endpointer is not None:
+            if not followed:
+                endpointer.feed(await asyncio.to_thread(tail.read))
+            if parse_result(result) == str(ord("#")):
+                # Our # and the reply to it can beat the AMI response
+                reason = "endpointer" if stopping.is_set() else "pound"
+            else:
+                reason = "silence timeout"
+            self._report_endpoint(endpointer, reason)
+
+        # Analyze the recording (the file system may be a slow network mount)
+        if not await asyncio.to_thread(recording_file.exists):
+            self.logger.error(f"Recording file not found: {recording_file}")
+            return None
+
+        # Analysis and synthesis are CPU-bound: they run in the analysis pool,
+        # with the hold sound playing if they take a while
+        deadline = Deadline(settings.MOCKERY_BUDGET)
+        audio_seconds = await asyncio.to_thread(self._recording_seconds, recording_file)
+        trace = self.session.trace
+        with trace.span("render", quality=quality.current()) as span:
+            summary = await self.session.play_while(worker_pool.run(
+                render_mockery, str(recording_file), str(meow_file), deadline, span['quality'],
+                cancel=self.cancel, audio_seconds=audio_seconds, trace=trace
+            ), stage="meow_mockery")
+            span['meows'] = summary['meows']
+            trace.add_timings(summary['timings'])
+        self._report_fallback(summary)
+        return summary
+
+    async def _watch_recording(self, endpointer: Endpointer, tail: RecordingTail,
+                               stopping: asyncio.Event, recorded: asyncio.Event) -> bool:
+        """
+        Follow a RECORD FILE in progress and stop it once the caller is done
+
+        AGI can't interrupt its own RECORD FILE, so the stop is a # "received"
+        on the channel through AMI (PlayDTMF with Receive), which RECORD FILE
+        takes as its escape digit. `stopping` is set once the # is on its way.
+        Reads run in a thread, as the recording may be on a slow network
+        mount. Returns True if it read the file to the end (`recorded` set).
+        """
+        try:
+            while True:
+                finished = recorded.is_set()
+                ended = endpointer.feed(await asyncio.to_thread(tail.read))
+                if finished:
+                    return True
+                if ended:
+                    break
+                try:
+                    await asyncio.wait_for(recorded.wait(), settings.ENDPOINT_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            stopping.set()
+            await self.session.ami.action("PlayDTMF", Channel=self.session.env.get('agi_channel', ''),
+                                          Digit="#", Receive="true")
+        except (AMIError, asyncio.TimeoutError, OSError) as e:
+            stopping.clear()
+            self.logger.warning(f"Could not end recording early, waiting for silence timeout: {e}")
+        return False
+
+    @staticmethod
+    def _recording_seconds(recording_file: Path) -> float:
+        """Length of the recording, which the render's expected cost is scaled by"""
+        try:
+            return sf.info(str(recording_file)).duration
+        except RuntimeError:
+            return float(settings.MAX_RECORDING_DURATION)  # unreadable: assume the longest
+
+    def _report_fallback(self, summary: Dict):
+        """Count a render that ran out of MOCKERY_BUDGET (metrics live in this process, not the worker)"""
+        if summary['fallback'] is not None:
+            FALLBACKS.inc(stage=summary['fallback'], fallback="duration_meows")
+            self.session.trace.attrs['fallback'] = f"{summary['fallback']}: duration_meows"
+
+    def _report_endpoint(self, endpointer: Endpointer, reason: str):
+        """Log and count how the caller's turn ended and the time that saved"""
+        saved = endpointer.saved_seconds(endpointer.position)
+        ENDPOINTS.inc(reason=reason)
+        if endpointer.heard_speech:
+            ENDPOINT_SAVED_SECONDS.observe(saved)
+        self.session.trace.attrs.update(turn_ended_by=reason, endpoint_saved_seconds=round(saved, 2))
+        self.logger.info(f"Caller turn ended ({reason}) after {endpointer.position:.1f}s, "
+                         f"{saved:.2f}s sooner than the silence timeout")
+
+    async def _mock_live_audio(self, lead_in, meow_file: Path) -> Optional[Dict]:
+        """
+        Analyze the caller's EAGI audio while they talk
+
+        Polls with short WAIT FOR DIGIT commands so the call stays
+        responsive; between polls the new audio is analyzed. The turn ends
+        on #, when the endpointer hears the caller stop, or at
+        MAX_RECORDING_DURATION, and only synthesis is left to do.
+        """
+        self.logger.info("Listening to caller's live audio")
+        audio = self.session.audio
+        analyzer = StreamingVoiceAnalyzer()
+        if settings.ENDPOINT_ENABLED:
+            endpointer, end_reason = Endpointer(), "endpointer"
+        else:
+            # Behave like RECORD FILE would
+            endpointer, end_reason = Endpointer(hangover=settings.RECORD_SILENCE), "silence timeout"
+        poll_ms = int(settings.EAGI_POLL_INTERVAL * 1000)
+
+        # Instructions and the beep RECORD FILE would have played
+        batch = lead_in if lead_in is not None else self.session.batch()
+        await batch.stream_file("beep").send()
+
+        trace = self.session.trace
+        with trace.span("listening") as span:
+            position = audio.written
+            # Limits go by the clock, so a stalled audio stream can't hold the call
+            started = time.monotonic()
+            while True:
+                digit = await self.session.wait_for_digit(poll_ms)
+                samples, position = audio.read(position)
+                analyzer.feed(samples)
+                ended = endpointer.feed(samples)
+                elapsed = time.monotonic() - started
+
+                if digit == "#":
+                    reason = "pound"
+                elif elapsed >= settings.MAX_RECORDING_DURATION:
+                    reason = "max duration"
+                elif ended:
+                    reason = end_reason
+                elif not endpointer.heard_speech and elapsed >= settings.EAGI_NO_SPEECH_TIMEOUT:
+                    reason = "no speech"
+                else:
+                    continue
+                break
+            span.update(ended_by=reason, audio_seconds=round(analyzer.duration, 2),
+                        analysis_seconds=round(analyzer.busy_seconds, 4))
+
+        self._report_endpoint(endpointer, reason)
+        if analyzer.samples == 0:
+            # Nothing to mock, like a RECORD FILE that left no file
+            self.logger.error("No audio received on the EAGI connection")
+            return None
+        analysis = analyzer.result()
+
+        deadline = Deadline(settings.MOCKERY_BUDGET)
+        with trace.span("render", quality=quality.current()) as span:
+            summary = await self.session.play_while(worker_pool.run(
+                render_meows, analysis, str(meow_file), deadline, span['quality'],
+                cancel=self.cancel, audio_seconds=analyzer.duration, trace=trace
+            ), stage="meow_mockery")
+            span['meows'] = summary['meows']
+            trace.add_timings(summary['timings'])
+        self._report_fallback(summary)
+        return summary
@@ -0,0 +1,275 @@
+"""
+Metrics Service
+Lightweight in-process counters, gauges and histograms, rendered in the
+Prometheus text exposition format by the Flask app's /metrics endpoint.
+
+In pre-fork mode each AGI worker periodically writes a JSON snapshot of its
+registry to METRICS_DIR and the web process merges them when rendering:
+counters and histograms are summed, gauges merged by their own rule (sum
+for per-worker values like active calls, max or min for values every worker
+sees the same, like Asterisk's channel count).
+"""
+import bisect
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+# Seconds; spans sub-millisecond AGI replies up to minute-long recordings
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10, 30, 60, 120)
+
+# How a gauge's samples from several processes combine
+GAUGE_MERGES = {"sum": lambda a, b: a + b, "max": max, "min": min}
+
+
+class Metric:
+    """Base class for a named metric with optional labels"""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _sample_values(self) -> list:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def snapshot(self) -> dict:
+        """Plain-data copy of the metric, mergeable across processes"""
+        return {
+            'type': self.metric_type,
+            'documentation': self.documentation,
+            'labelnames': list(self.labelnames),
+            'samples': self._sample_values(),
+        }
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that can go up and down"""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 merge: str = "sum"):
+        super().__init__(name, documentation, labelnames)
+        if merge not in GAUGE_MERGES:
+            raise ValueError(f"{name}: merge must be one of {tuple(GAUGE_MERGES)}, got {merge!r}")
+        self.merge = merge
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def snapshot(self) -> dict:
+        data = super().snapshot()
+        data['merge'] = self.merge
+        return data
+
+
+class Histogram(Metric):
+    """Bucketed distribution of observed values"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (+Inf last), sum]
+        self._histograms: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._histograms.get(key)
+            if state is None:
+                state = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _sample_values(self) -> list:
+        with self._lock:
+            return [[list(key), [list(counts), total]]
+                    for key, (counts, total) in self._histograms.items()]
+
+    def snapshot(self) -> dict:
+        data = super().snapshot()
+        data['buckets'] = list(self.buckets)
+        return data
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def render(self) -> str:
+        return render([self.snapshot()])
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+    """Create (or fetch) a counter in the default registry"""
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+          merge: str = "sum") -> Gauge:
+    """Create (or fetch) a gauge in the default registry"""
+    return REGISTRY.register(Gauge(name, documentation, labelnames, merge))
+
+
+def histogram(name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Create (or fetch) a histogram in the default registry"""
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# Rendering and cross-process merging
+
+def _format_labels(labelnames: Iterable[str], values: Iterable[str],
+                   extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    """Sample value, exact: counters and sums must not lose increments to rounding"""
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def _merge(snapshots: Iterable[Dict[str, dict]]) -> Dict[str, dict]:
+    """Combine samples with the same name and labels across snapshots"""
+    merged: Dict[str, dict] = {}
+    for snapshot in snapshots:
+        for name, data in snapshot.items():
+            target = merged.setdefault(name, {**data, 'values': {}})
+            values = target['values']
+            for labels, value in data['samples']:
+                key = tuple(labels)
+                if data['type'] == 'histogram':
+                    counts, total = value
+                    if key in values:
+                        previous_counts, previous_total = values[key]
+                        counts = [a + b for a, b in zip(previous_counts, counts)]
+                        total += previous_total
+                    values[key] = (counts, total)
+                elif key in values:
+                    # Counters (and untyped metrics) add up like "sum" gauges
+                    values[key] = GAUGE_MERGES[data.get('merge', 'sum')](values[key], value)
+                else:
+                    values[key] = value
+    return merged
+
+
+def render(snapshots: Iterable[Dict[str, dict]]) -> str:
+    """Render one or more registry snapshots in Prometheus text format"""
+    lines: List[str] = []
+    for name, data in _merge(snapshots).items():
+        lines.append(f"# HELP {name} {data['documentation']}")
+        lines.append(f"# TYPE {name} {data['type']}")
+        labelnames = data['labelnames']
+        for key, value in data['values'].items():
+            if data['type'] != 'histogram':
+                lines.append(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(data['buckets'], counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labelnames, key, ('le', f'{bound:g}'))} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{name}_bucket{_format_labels(labelnames, key, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labelnames, key)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def snapshot_path(directory: Path, pid: Optional[int] = None) -> Path:
+    return Path(directory) / f"agi-{pid or os.getpid()}.json"
+
+
+def write_snapshot(directory: Path):
+    """Atomically write this process's registry for the web process to merge"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = snapshot_path(directory)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(REGISTRY.snapshot()))
+    os.replace(tmp, path)
+
+
+def read_snapshots(directory: Path) -> List[Dict[str, dict]]:
+    """Load the snapshots written by worker processes"""
+    snapshots = []
+    for path in sorted(Path(directory).glob("agi-*.json")):
+        try:
+            snapshots.append(json.loads(path.read_text()))
+        except (OSError, ValueError) as e:
+            logger.debug(f"Skipping metrics snapshot {path}: {e}")
+    return snapshots
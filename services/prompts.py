@@ -0,0 +1,106 @@
+"""
+Prompt Index
+In-memory maps of the IVR prompts in PROMPTS_DIR and the pre-recorded cat
+monologues in CATS_DIR, name -> file in the best available format, so
+resolving a prompt during a call costs no filesystem access (the audio
+volume may be a slow network mount). Copies compiled into Asterisk-native
+formats by scripts/compile_prompts.py (COMPILED_AUDIO_DIR) win over the
+source files.
+
+An index is built on first use and rebuilt when its directories change:
+every PROMPT_SCAN_INTERVAL seconds the server stats each directory once and
+rescans only if an mtime moved. Adding, removing or renaming a prompt
+(including an atomic replace) updates the directory mtime; inotify would
+not see changes made on another host of a network mount.
+"""
+import asyncio
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from config import settings
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+PROMPT_INDEX_SCANS = metrics.counter("meow_prompt_index_scans_total", "Rebuilds of the prompt index")
+
+# Preferred first when a prompt exists in several formats. Asterisk is given
+# the name without extension and picks the cheapest variant for the channel
+# itself, so this only matters for which file stands for the prompt.
+PROMPT_FORMATS = ('.wav', '.sln', '.ulaw', '.alaw', '.gsm')
+
+
+class PromptIndex:
+    """Prompt name -> path, for the prompts in one or more directories (first wins)"""
+
+    def __init__(self, *directories: Path, formats=PROMPT_FORMATS):
+        self.directories = [Path(directory) for directory in directories]
+        self.formats = tuple(formats)
+        self._paths: Dict[str, Path] = {}
+        self._mtimes: Optional[Tuple[int, ...]] = None  # directory mtimes at the last scan
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def find(self, name: str) -> Optional[Path]:
+        """The prompt's file, or None if there is no such prompt"""
+        if self._mtimes is None:
+            self.refresh()
+        return self._paths.get(name)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Rescan the directories if they changed since the last scan; returns whether it did"""
+        with self._lock:
+            mtimes = tuple(self._mtime(directory) for directory in self.directories)
+            if mtimes == self._mtimes and not force:
+                return False
+
+            rank = {ext: i for i, ext in enumerate(self.formats)}
+            paths: Dict[str, Path] = {}
+            for directory in reversed(self.directories):
+                best: Dict[str, Path] = {}
+                try:
+                    with os.scandir(directory) as entries:
+                        for entry in entries:
+                            stem, ext = os.path.splitext(entry.name)
+                            if ext not in rank or not entry.is_file():
+                                continue
+                            current = best.get(stem)
+                            if current is None or rank[ext] < rank[current.suffix]:
+                                best[stem] = Path(entry.path)
+                except OSError:
+                    pass  # reported by _mtime
+                paths.update(best)
+
+            # Swapped in whole, so lookups never see a half-built index
+            self._paths = paths
+            self._mtimes = mtimes
+        PROMPT_INDEX_SCANS.inc()
+        logger.debug(f"Indexed {len(paths)} prompts in {', '.join(map(str, self.directories))}")
+        return True
+
+    def _mtime(self, directory: Path) -> int:
+        try:
+            return os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            return -1  # e.g. nothing compiled yet
+        except OSError as e:
+            if self._mtimes is None:
+                logger.warning(f"Cannot read prompt directory {directory}: {e}")
+            return -1
+
+
+PROMPTS = PromptIndex(settings.COMPILED_AUDIO_DIR / "prompts", settings.PROMPTS_DIR)
+CAT_AUDIO = PromptIndex(settings.COMPILED_AUDIO_DIR / "cats", settings.CATS_DIR)
+
+
+async def watch(interval: float = settings.PROMPT_SCAN_INTERVAL):
+    """Keep the indexes current until cancelled (run as a server task)"""
+    while True:
+        for index in (PROMPTS, CAT_AUDIO):
+            await asyncio.to_thread(index.refresh)
+        await asyncio.sleep(interval)
@@ -0,0 +1,139 @@
+"""
+Load-Adaptive Quality
+Chooses how much work a caller's meows and monologue get from how busy
+this server is, so under a crowd every caller gets a decent answer quickly
+rather than a few callers getting a perfect one slowly:
+
+    full     PITCH_DETECTION_METHOD, meows pitch-shifted from real samples,
+             LLM monologues
+    reduced  YIN pitch, synthesized meows, LLM monologues
+    minimal  autocorrelation pitch, synthesized meows, scripted monologues
+             (and no speculative monologues)
+
+Load is the larger of the share of call slots in use and the 1-minute load
+average per CPU. With a live AMI view, calls Asterisk has up that haven't
+reached the AGI yet count as using slots too, so the tier drops as a burst
+of calls rings in rather than once it has landed. The tier drops as soon as
+load reaches QUALITY_REDUCED_AT or QUALITY_MINIMAL_AT, and climbs back one
+step at a time once load has stayed QUALITY_HYSTERESIS below the threshold
+for QUALITY_RECOVERY seconds, so a server hovering at a threshold doesn't
+flap between tiers.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Optional, Sequence, TYPE_CHECKING
+
+from config import settings
+from services import metrics
+
+if TYPE_CHECKING:
+    from services.admission import AdmissionController
+
+logger = logging.getLogger(__name__)
+
+FULL, REDUCED, MINIMAL = TIERS = ("full", "reduced", "minimal")
+
+QUALITY_TIER = metrics.gauge(
+    "meow_quality_tier", "1 for the quality tier calls currently get, 0 for the others", ("tier",),
+    merge="max")  # across pre-fork workers: 1 for each tier some worker is at
+QUALITY_TIER_CHANGES = metrics.counter(
+    "meow_quality_tier_changes_total", "Switches of the quality tier, by the tier switched to", ("tier",))
+
+
+def pitch_method(tier: str) -> str:
+    """Pitch detector for voice analysis at `tier`"""
+    if tier == FULL:
+        return settings.PITCH_DETECTION_METHOD
+    # YIN is near Praat's accuracy at a fraction of its cost; plain
+    # autocorrelation is cheaper still but octave-error prone
+    return "yin" if tier == REDUCED else "autocorrelation"
+
+
+def sampled_meows(tier: str) -> bool:
+    """Whether meows are pitch-shifted real samples (else synthesized)"""
+    return tier == FULL
+
+
+def llm_monologues(tier: str) -> bool:
+    """Whether monologues are written by the LLM (else scripted)"""
+    return tier != MINIMAL
+
+
+def measure_load(active_calls: int, max_calls: int, upstream_calls: int = 0) -> float:
+    """
+    Share of call slots in use (counting `upstream_calls` still on their way
+    to the AGI) or 1-minute load average per CPU, whichever is higher
+    """
+    calls = (active_calls + upstream_calls) / max_calls if max_calls > 0 else 0.0
+    try:
+        cpu = os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        cpu = 0.0  # no load average on this platform
+    return max(calls, cpu)
+
+
+class QualityGovernor:
+    """Current quality tier, moved by load readings with hysteresis"""
+
+    def __init__(self, thresholds: Sequence[float] = (settings.QUALITY_REDUCED_AT,
+                                                      settings.QUALITY_MINIMAL_AT),
+                 hysteresis: float = settings.QUALITY_HYSTERESIS,
+                 recovery: float = settings.QUALITY_RECOVERY):
+        # thresholds[i] is the load at which TIERS[i + 1] starts
+        self.thresholds = tuple(thresholds)
+        self.hysteresis = hysteresis
+        self.recovery = recovery
+        self.tier = FULL
+        self.load = 0.0
+        self._calm_since: Optional[float] = None  # load below the recovery level since
+        for tier in TIERS:
+            QUALITY_TIER.set(int(tier == self.tier), tier=tier)
+
+    def update(self, load: float, now: Optional[float] = None) -> str:
+        """Take a load reading; returns the tier to use"""
+        now = time.monotonic() if now is None else now
+        self.load = load
+        level = TIERS.index(self.tier)
+        target = sum(load >= threshold for threshold in self.thresholds)
+
+        if target > level:
+            self._switch(TIERS[target])
+            self._calm_since = None
+        elif target < level and load < self.thresholds[level - 1] - self.hysteresis:
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self.recovery:
+                self._switch(TIERS[level - 1])
+                # The next step up has to wait out its own recovery period
+                self._calm_since = now
+        else:
+            self._calm_since = None
+        return self.tier
+
+    def _switch(self, tier: str):
+        previous, self.tier = self.tier, tier
+        QUALITY_TIER.set(0, tier=previous)
+        QUALITY_TIER.set(1, tier=tier)
+        QUALITY_TIER_CHANGES.inc(tier=tier)
+        log = logger.warning if TIERS.index(tier) > TIERS.index(previous) else logger.info
+        log(f"Quality tier {previous} -> {tier} (load {self.load:.2f})")
+
+    def stats(self) -> dict:
+        return {'tier': self.tier, 'load': round(self.load, 3)}
+
+
+GOVERNOR = QualityGovernor()
+
+
+def current() -> str:
+    """The tier for work starting now"""
+    return GOVERNOR.tier
+
+
+async def watch(admission: 'AdmissionController', interval: float = settings.QUALITY_CHECK_INTERVAL):
+    """Keep the tier in line with the load until cancelled (run as a server task)"""
+    while True:
+        GOVERNOR.update(measure_load(admission.active, admission.max_active, admission.upstream_waiting))
+        await asyncio.sleep(interval)
@@ -7,10 +7,12 @@ import logging
 import librosa
 import soundfile as sf
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 import urllib.request
 import os
 
+from services.cancellation import CancellationToken, Deadline
+
 logger = logging.getLogger(__name__)
 
 
@@ -298,8 +300,17 @@ class RealMeowGenerator:
 
         return 400.0  # Default
 
-    def generate_meow_sequence(self, voice_analysis: Dict) -> np.ndarray:
-        """Generate a sequence of meows matching the voice pattern"""
+    def generate_meow_sequence(self, voice_analysis: Dict,
+                               cancel: Optional[CancellationToken] = None,
+                               deadline: Optional[Deadline] = None) -> np.ndarray:
+        """
+        Generate a sequence of meows matching the voice pattern
+
+        Raises CallCancelled if `cancel` is tripped part way through, and
+        DeadlineExceeded if `deadline` runs out
+        """
+        cancel = cancel or CancellationToken()
+        deadline = deadline or Deadline.unlimited()
         duration = voice_analysis.get('duration', 5.0)
         mean_pitch = voice_analysis.get('mean_pitch', 400)
 
@@ -308,6 +319,9 @@ class RealMeowGenerator:
         meow_sequence = []
 
         for i in range(num_meows):
+            cancel.raise_if_cancelled()
+            deadline.raise_if_expired()
+
             # Vary pitch slightly for each meow
             pitch = mean_pitch * (1 + np.random.uniform(-0.15, 0.15))
             meow_duration = np.random.uniform(0.4, 0.9)
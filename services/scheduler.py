@@ -0,0 +1,153 @@
+"""
+Call Work Scheduler
+Decides which call's heavy job (analysis and synthesis in the worker pool,
+TTS) gets the next free slot, so a caller with a half-second recording
+isn't stuck behind the analysis of someone's minute-long speech.
+
+Jobs wait in shortest-expected-job-first order, with aging: every second a
+job has waited counts as SCHEDULER_AGING seconds off its expected cost, so
+long jobs still get their turn under a steady stream of short ones.
+Expected cost is the job's size (seconds of audio, characters of text)
+times a per-kind rate learned from the jobs that finished. The number of
+slots matches what actually runs the jobs (pool processes, TTS
+concurrency), so ordering the queue costs no throughput.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from services import metrics
+from services.cancellation import CallCancelled, CancellationToken, Deadline
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_WAIT_SECONDS = metrics.histogram(
+    "meow_scheduler_wait_seconds", "Time call jobs waited for a free slot", ("queue",),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 30))
+SCHEDULER_QUEUED = metrics.gauge(
+    "meow_scheduler_queued", "Call jobs waiting for a free slot", ("queue",))
+
+# Weight of the newest job in the learned seconds-per-unit rates
+RATE_SMOOTHING = 0.2
+
+
+class JobScheduler:
+    """Shortest-expected-job-first access to `capacity` slots, with aging"""
+
+    def __init__(self, name: str, capacity: int, rates: Dict[str, float],
+                 aging: float = settings.SCHEDULER_AGING):
+        self.name = name
+        self.capacity = capacity
+        self.rates = dict(rates)  # job kind -> expected seconds per unit of size
+        self.aging = aging
+        self.running = 0
+        # (cost + aging * arrival, sequence, future): comparing cost - aging * waited
+        # between jobs doesn't depend on when it's done, so the heap stays valid
+        self._queue: List[Tuple[float, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    def estimate(self, kind: str, units: float) -> float:
+        """Expected seconds for a `kind` job of size `units`"""
+        return self.rates.get(kind, 0.0) * units
+
+    @asynccontextmanager
+    async def job(self, kind: str, units: float, cancel: Optional[CancellationToken] = None,
+                  deadline: Optional[Deadline] = None, trace=None):
+        """
+        Hold a slot for the enclosed block, queueing for it if none is free
+
+        Yields the seconds spent queueing, which is also recorded as a
+        "queue" span (and summed into the `queue_wait` attribute) on
+        `trace`. Raises CallCancelled if `cancel` trips while queued, and
+        DeadlineExceeded if `deadline` runs out first.
+        """
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.acquire(self.estimate(kind, units), cancel),
+                                   deadline.timeout() if deadline is not None else None)
+        except asyncio.TimeoutError:
+            raise deadline.exceeded()
+        granted = time.perf_counter()
+        waited = granted - start
+        SCHEDULER_WAIT_SECONDS.observe(waited, queue=self.name)
+        if trace is not None:
+            trace.add_span("queue", start, granted, queue=self.name, kind=kind)
+            trace.attrs['queue_wait'] = round(trace.attrs.get('queue_wait', 0.0) + waited, 4)
+
+        try:
+            yield waited
+            self._learn(kind, units, time.perf_counter() - granted)
+        finally:
+            self.release()
+
+    async def acquire(self, cost: float, cancel: Optional[CancellationToken] = None):
+        """Take a slot, waiting behind cheaper (or long-waiting) jobs; pair with release()"""
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        while self._queue and self._queue[0][2].done():
+            heapq.heappop(self._queue)  # gave up waiting
+        if self.running < self.capacity and not self._queue:
+            self.running += 1
+            return
+
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+        heapq.heappush(self._queue, (cost + self.aging * time.monotonic(), next(self._sequence), granted))
+        SCHEDULER_QUEUED.inc(queue=self.name)
+
+        def refuse():
+            if not granted.done():
+                granted.set_exception(CallCancelled(cancel.reason))
+
+        def hung_up():
+            loop.call_soon_threadsafe(refuse)
+
+        if cancel is not None:
+            cancel.add_callback(hung_up)
+        try:
+            await granted
+        except asyncio.CancelledError:
+            if granted.done() and not granted.cancelled() and granted.exception() is None:
+                self.release()  # handed a slot just as the waiter went away
+            else:
+                granted.cancel()
+            raise
+        finally:
+            SCHEDULER_QUEUED.dec(queue=self.name)
+            if cancel is not None:
+                cancel.remove_callback(hung_up)
+
+    def release(self):
+        """Hand the slot to the next job in line, or free it"""
+        while self._queue:
+            granted = heapq.heappop(self._queue)[2]
+            if not granted.done():
+                granted.set_result(None)
+                return
+        self.running -= 1
+
+    def resize(self, capacity: int):
+        """Change the number of slots, starting queued jobs if it grew"""
+        self.capacity = capacity
+        while self.running < self.capacity and self._queue:
+            self.running += 1
+            self.release()
+
+    def _learn(self, kind: str, units: float, seconds: float):
+        if units > 0:
+            rate = seconds / units
+            previous = self.rates.get(kind)
+            self.rates[kind] = rate if previous is None else previous + RATE_SMOOTHING * (rate - previous)
+
+    def stats(self) -> dict:
+        return {
+            'capacity': self.capacity,
+            'running': self.running,
+            'queued': sum(not granted.done() for _, _, granted in self._queue),
+            'rates': {kind: round(rate, 4) for kind, rate in self.rates.items()},
+        }
@@ -0,0 +1,207 @@
+"""
+Per-Call Tracing
+Every call gets an ID and a timeline of spans (env read, menu, recording,
+analysis, synthesis, LLM, TTS, playback, ...). Finished calls go into an
+in-memory flight recorder: the last TRACE_BUFFER_SIZE calls plus the
+TRACE_SLOWEST_PER_HOUR slowest calls of each recent hour, so a slow call
+can be looked at after the fact instead of reproduced.
+
+Like the metrics registry, pre-fork workers publish their recorder to
+METRICS_DIR and the web process merges the snapshots.
+"""
+import contextvars
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Open spans around the running code. Per task: a task started inside a span
+# nests under it, and concurrent tasks of one call don't disturb each other
+_SPAN_DEPTH: contextvars.ContextVar[int] = contextvars.ContextVar("span_depth", default=0)
+
+
+class CallTrace:
+    """
+    Span timeline for one call
+
+    Spans are (name, start, end) relative to the start of the call, with a
+    nesting depth and free-form attributes. A call runs concurrent tasks
+    (play_while plays the hold sound while the render queues and runs), so
+    depth is tracked per task: each task's spans nest under the span that
+    was open where it was started.
+    """
+
+    def __init__(self, call_id: Optional[str] = None):
+        self.call_id = call_id or uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self.attrs: Dict[str, Any] = {}
+        self.spans: List[dict] = []
+        self.outcome: Optional[str] = None
+        self.duration: Optional[float] = None
+        self._start = time.perf_counter()
+
+    def _offset(self, t: float) -> float:
+        return round(t - self._start, 4)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Time the enclosed block; an exception is noted on the span and re-raised"""
+        start = time.perf_counter()
+        token = _SPAN_DEPTH.set(_SPAN_DEPTH.get() + 1)
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs['error'] = type(e).__name__
+            raise
+        finally:
+            _SPAN_DEPTH.reset(token)
+            self.add_span(name, start, time.perf_counter(), **attrs)
+
+    def add_span(self, name: str, start: float, end: float, **attrs):
+        """Record a span measured elsewhere (perf_counter timestamps)"""
+        self.spans.append({
+            'name': name,
+            'start': self._offset(start),
+            'duration': round(end - start, 4),
+            'depth': _SPAN_DEPTH.get(),
+            **({'attrs': attrs} if attrs else {}),
+        })
+
+    def add_timings(self, timings: Dict[str, float]):
+        """
+        Record consecutive stages timed in another process, given as
+        name -> seconds, ending now (e.g. the stages of a pool task)
+        """
+        end = time.perf_counter()
+        start = end - sum(timings.values())
+        for name, seconds in timings.items():
+            self.add_span(name, start, start + seconds)
+            start += seconds
+
+    def finish(self, outcome: str):
+        self.outcome = outcome
+        self.duration = round(time.perf_counter() - self._start, 4)
+
+    def to_dict(self) -> dict:
+        return {
+            'call_id': self.call_id,
+            'started_at': self.started_at,
+            'duration': self.duration,
+            'outcome': self.outcome,
+            'attrs': self.attrs,
+            'spans': sorted(self.spans, key=lambda span: span['start']),
+        }
+
+
+class FlightRecorder:
+    """Ring buffer of recent call traces plus the slowest calls per hour"""
+
+    def __init__(self, size: int = settings.TRACE_BUFFER_SIZE,
+                 slowest_per_hour: int = settings.TRACE_SLOWEST_PER_HOUR,
+                 hours: int = settings.TRACE_SLOWEST_HOURS):
+        self.recent: deque = deque(maxlen=size)
+        self.slowest_per_hour = slowest_per_hour
+        self.hours = hours
+        self.slowest: Dict[int, list] = {}  # hour -> min-heap of (duration, call_id, trace)
+        # Written from the event loop, read from Flask threads
+        self._lock = threading.Lock()
+
+    def record(self, trace: CallTrace):
+        data = trace.to_dict()
+        hour = int(trace.started_at // 3600)
+        entry = (data['duration'] or 0.0, data['call_id'], data)
+        with self._lock:
+            self.recent.append(data)
+            heap = self.slowest.setdefault(hour, [])
+            if len(heap) < self.slowest_per_hour:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+            for old in [h for h in self.slowest if h <= hour - self.hours]:
+                del self.slowest[old]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'recent': list(self.recent),
+                'slowest': {str(hour): [data for _, _, data in heap]
+                            for hour, heap in self.slowest.items()},
+            }
+
+
+RECORDER = FlightRecorder()
+
+
+def merge(snapshots: Iterable[dict], size: int = settings.TRACE_BUFFER_SIZE,
+          slowest_per_hour: int = settings.TRACE_SLOWEST_PER_HOUR) -> dict:
+    """
+    Combine recorder snapshots (this process and pre-fork workers) into
+    newest-first recent calls and slowest-first calls per hour
+    """
+    recent: List[dict] = []
+    slowest: Dict[str, List[dict]] = {}
+    for snapshot in snapshots:
+        recent.extend(snapshot.get('recent', []))
+        for hour, calls in snapshot.get('slowest', {}).items():
+            slowest.setdefault(hour, []).extend(calls)
+
+    recent.sort(key=lambda trace: trace['started_at'], reverse=True)
+    return {
+        'recent': recent[:size],
+        'slowest': [
+            {
+                'hour': time.strftime('%Y-%m-%d %H:00', time.localtime(int(hour) * 3600)),
+                'calls': sorted(calls, key=lambda trace: trace['duration'] or 0.0,
+                                reverse=True)[:slowest_per_hour],
+            }
+            for hour, calls in sorted(slowest.items(), key=lambda item: int(item[0]), reverse=True)
+        ],
+    }
+
+
+def find(merged: dict, call_id: str) -> Optional[dict]:
+    """Look a call up in merged recorder contents"""
+    for trace in merged['recent']:
+        if trace['call_id'] == call_id:
+            return trace
+    for hour in merged['slowest']:
+        for trace in hour['calls']:
+            if trace['call_id'] == call_id:
+                return trace
+    return None
+
+
+def snapshot_path(directory: Path, pid: Optional[int] = None) -> Path:
+    return Path(directory) / f"traces-{pid or os.getpid()}.json"
+
+
+def write_snapshot(directory: Path):
+    """Atomically write this process's recorder for the web process to merge"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = snapshot_path(directory)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(RECORDER.snapshot()))
+    os.replace(tmp, path)
+
+
+def read_snapshots(directory: Path) -> List[dict]:
+    """Load the recorder snapshots written by worker processes"""
+    snapshots = []
+    for path in sorted(Path(directory).glob("traces-*.json")):
+        try:
+            snapshots.append(json.loads(path.read_text()))
+        except (OSError, ValueError) as e:
+            logger.debug(f"Skipping trace snapshot {path}: {e}")
+    return snapshots
@@ -3,7 +3,11 @@ Voice Analysis Service
 Detects pitch, rhythm, and timing from caller's speech
 """
 import logging
+import time
 import numpy as np
+import scipy.fft
+import scipy.signal
+import scipy.special
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 import soundfile as sf
@@ -24,9 +28,31 @@ except ImportError:
     logging.warning("Aubio not available, using fallback pitch detection")
 
 from config import settings
+from services.cancellation import CallCancelled, CancellationToken, Deadline, DeadlineExceeded
 
 logger = logging.getLogger(__name__)
 
+# Seconds between pitch frames
+PITCH_TIME_STEP = 0.01
+
+# Frames per batch in the vectorized detectors (cancellation is checked between batches)
+FRAMES_PER_BLOCK = 1000
+
+# YIN: dips in the normalized difference below this pick the period (de Cheveigne
+# & Kawahara 2002); voicing as in pYIN (Mauch & Dixon 2014), the probability
+# that a threshold drawn from Beta(a, b) lies above the deepest dip
+YIN_THRESHOLD = 0.1
+YIN_THRESHOLD_PRIOR = (2, 18)
+YIN_MIN_CONFIDENCE = 0.5
+
+# Coarse-to-fine YIN (PITCH_COARSE_TO_FINE) searches the audio decimated 2x
+# through this half-band low-pass, which passes everything up to well above
+# MAX_PITCH (every other tap is zero, so it costs 16 multiplies per sample)
+HALFBAND = scipy.signal.firwin(31, 0.5)
+
+# Most to least accurate; a method that isn't installed falls back down the list
+PITCH_METHODS = ('praat', 'aubio', 'yin', 'autocorrelation')
+
 
 class VoiceAnalyzer:
     """Analyzes voice recordings for pitch and rhythm characteristics"""
@@ -35,10 +61,18 @@ class VoiceAnalyzer:
         self.logger = logging.getLogger(__name__)
         self.sample_rate = settings.SAMPLE_RATE
 
-    def analyze_audio_file(self, file_path: Path) -> Dict:
+    def analyze_audio_file(self, file_path: Path,
+                           cancel: Optional[CancellationToken] = None,
+                           deadline: Optional[Deadline] = None,
+                           method: Optional[str] = None) -> Dict:
         """
         Analyze an audio file and extract pitch/rhythm features
 
+        Pitch is detected with `method` (default PITCH_DETECTION_METHOD), or
+        the next one in PITCH_METHODS that is installed. Raises CallCancelled
+        if `cancel` is tripped part way through, and DeadlineExceeded if
+        `deadline` runs out
+
         Returns:
             Dict with keys:
                 - mean_pitch: Average pitch in Hz
@@ -49,6 +83,8 @@ class VoiceAnalyzer:
                 - speaking_rate: Syllables or segments per second
         """
         self.logger.info(f"Analyzing audio file: {file_path}")
+        cancel = cancel or CancellationToken()
+        deadline = deadline or Deadline.unlimited()
 
         try:
             # Load audio file
@@ -63,49 +99,18 @@ class VoiceAnalyzer:
                 audio = self._resample(audio, sr, self.sample_rate)
                 sr = self.sample_rate
 
-            # Detect pitch using available method
-            if PRAAT_AVAILABLE:
-                pitch_data = self._detect_pitch_praat(audio, sr)
-            elif AUBIO_AVAILABLE:
-                pitch_data = self._detect_pitch_aubio(audio, sr)
-            else:
-                pitch_data = self._detect_pitch_basic(audio, sr)
-
-            # Detect speech segments and rhythm
-            segments = self._detect_speech_segments(audio, sr, pitch_data)
-
-            # Calculate rhythm pattern
-            rhythm = self._analyze_rhythm(segments)
-
-            # Compile results
-            valid_pitches = [p for p in pitch_data['pitches'] if p > 0]
-
-            if valid_pitches:
-                result = {
-                    'mean_pitch': np.mean(valid_pitches),
-                    'pitch_range': (np.min(valid_pitches), np.max(valid_pitches)),
-                    'pitch_variance': np.std(valid_pitches),
-                    'speech_segments': segments,
-                    'rhythm_pattern': rhythm,
-                    'speaking_rate': len(segments) / (len(audio) / sr) if len(audio) > 0 else 0,
-                    'duration': len(audio) / sr
-                }
-            else:
-                # No valid pitch detected
-                result = {
-                    'mean_pitch': settings.MEOW_BASE_PITCH,
-                    'pitch_range': (settings.MEOW_BASE_PITCH - 50, settings.MEOW_BASE_PITCH + 50),
-                    'pitch_variance': 20,
-                    'speech_segments': [],
-                    'rhythm_pattern': [],
-                    'speaking_rate': 0,
-                    'duration': len(audio) / sr
-                }
-
-            self.logger.info(f"Analysis complete: mean_pitch={result['mean_pitch']:.1f}Hz, "
-                           f"segments={len(result['speech_segments'])}")
-            return result
+            cancel.raise_if_cancelled()
+
+            # Detect pitch using the requested method, if available
+            detect_pitch = self._pitch_detector(method or settings.PITCH_DETECTION_METHOD)
+            pitch_data = detect_pitch(audio, sr, cancel, deadline)
+
+            cancel.raise_if_cancelled()
 
+            return self._compile_result(pitch_data, len(audio) / sr)
+
+        except (CallCancelled, DeadlineExceeded):
+            raise
         except Exception as e:
             self.logger.error(f"Error analyzing audio: {e}", exc_info=True)
             # Return default values
@@ -119,32 +124,89 @@ class VoiceAnalyzer:
                 'duration': 0
             }
 
-    def _detect_pitch_praat(self, audio: np.ndarray, sr: int) -> Dict:
+    def _pitch_detector(self, method: str):
+        """The detect method for `method`, or the best installed one below it"""
+        if method not in PITCH_METHODS:
+            self.logger.warning(f"Unknown pitch detection method {method!r}, using {PITCH_METHODS[0]}")
+            method = PITCH_METHODS[0]
+        detectors = {
+            'praat': self._detect_pitch_praat if PRAAT_AVAILABLE else None,
+            'aubio': self._detect_pitch_aubio if AUBIO_AVAILABLE else None,
+            'yin': self._detect_pitch_yin,
+            'autocorrelation': self._detect_pitch_basic,
+        }
+        for candidate in PITCH_METHODS[PITCH_METHODS.index(method):]:
+            if detectors[candidate] is not None:
+                return detectors[candidate]
+
+    def _compile_result(self, pitch_data: Dict, duration: float) -> Dict:
+        """Build the analysis result from a pitch track"""
+        # Detect speech segments and rhythm
+        segments = self._detect_speech_segments(None, self.sample_rate, pitch_data)
+
+        # Calculate rhythm pattern
+        rhythm = self._analyze_rhythm(segments)
+
+        # Compile results
+        valid_pitches = [p for p in pitch_data['pitches'] if p > 0]
+
+        if valid_pitches:
+            result = {
+                'mean_pitch': np.mean(valid_pitches),
+                'pitch_range': (np.min(valid_pitches), np.max(valid_pitches)),
+                'pitch_variance': np.std(valid_pitches),
+                'speech_segments': segments,
+                'rhythm_pattern': rhythm,
+                'speaking_rate': len(segments) / duration if duration > 0 else 0,
+                'duration': duration
+            }
+        else:
+            # No valid pitch detected
+            result = {
+                'mean_pitch': settings.MEOW_BASE_PITCH,
+                'pitch_range': (settings.MEOW_BASE_PITCH - 50, settings.MEOW_BASE_PITCH + 50),
+                'pitch_variance': 20,
+                'speech_segments': [],
+                'rhythm_pattern': [],
+                'speaking_rate': 0,
+                'duration': duration
+            }
+
+        self.logger.info(f"Analysis complete: mean_pitch={result['mean_pitch']:.1f}Hz, "
+                         f"segments={len(result['speech_segments'])}")
+        return result
+
+    def _detect_pitch_praat(self, audio: np.ndarray, sr: int,
+                            cancel: Optional[CancellationToken] = None,
+                            deadline: Optional[Deadline] = None) -> Dict:
         """Detect pitch using Praat (most accurate)"""
         self.logger.debug("Using Praat for pitch detection")
+        cancel = cancel or CancellationToken()
+        deadline = deadline or Deadline.unlimited()
 
         # Create Praat sound object
         sound = parselmouth.Sound(audio, sampling_frequency=sr)
 
-        # Extract pitch
-        pitch = call(sound, "To Pitch", 0.0, settings.MIN_PITCH, settings.MAX_PITCH)
+        # Extract pitch with one frame every 10ms. Praat can't be interrupted,
+        # so cancellation and the deadline are checked either side of it
+        pitch = call(sound, "To Pitch", PITCH_TIME_STEP, settings.MIN_PITCH, settings.MAX_PITCH)
+        cancel.raise_if_cancelled()
+        deadline.raise_if_expired()
 
-        # Get pitch values at regular intervals
-        pitch_times = []
-        pitches = []
-
-        for t in np.arange(0, sound.duration, 0.01):  # Every 10ms
-            pitch_value = call(pitch, "Get value at time", t, "Hertz", "Linear")
-            if pitch_value is not None and not np.isnan(pitch_value):
-                pitch_times.append(t)
-                pitches.append(pitch_value)
+        # The whole track in one read, rather than a "Get value at time" per frame;
+        # unvoiced frames come back as 0
+        times = np.asarray(pitch.xs())
+        frequencies = pitch.selected_array['frequency']
+        voiced = np.isfinite(frequencies) & (frequencies > 0)
 
         return {
-            'times': np.array(pitch_times),
-            'pitches': np.array(pitches)
+            'times': times[voiced],
+            'pitches': frequencies[voiced]
         }
 
-    def _detect_pitch_aubio(self, audio: np.ndarray, sr: int) -> Dict:
+    def _detect_pitch_aubio(self, audio: np.ndarray, sr: int,
+                            cancel: Optional[CancellationToken] = None,
+                            deadline: Optional[Deadline] = None) -> Dict:
         """Detect pitch using Aubio"""
         self.logger.debug("Using Aubio for pitch detection")
 
@@ -163,7 +225,11 @@ class VoiceAnalyzer:
         audio_float = audio.astype(np.float32)
 
         # Process in chunks
+        cancel = cancel or CancellationToken()
+        deadline = deadline or Deadline.unlimited()
         for i in range(0, len(audio_float), hop_s):
+            cancel.raise_if_cancelled()
+            deadline.raise_if_expired()
             chunk = audio_float[i:i+win_s]
             if len(chunk) < win_s:
                 chunk = np.pad(chunk, (0, win_s - len(chunk)))
@@ -180,7 +246,169 @@ class VoiceAnalyzer:
             'pitches': np.array(pitches)
         }
 
-    def _detect_pitch_basic(self, audio: np.ndarray, sr: int) -> Dict:
+    def _detect_pitch_yin(self, audio: np.ndarray, sr: int,
+                          cancel: Optional[CancellationToken] = None,
+                          deadline: Optional[Deadline] = None,
+                          coarse_to_fine: Optional[bool] = None) -> Dict:
+        """
+        Detect pitch with YIN, vectorized over frames (no extra dependencies)
+
+        Also returns `confidence`, each pitch frame's voicing probability.
+        With `coarse_to_fine` (default PITCH_COARSE_TO_FINE) the search runs
+        on the audio decimated 2x, and only its period is refined at the
+        full rate
+        """
+        self.logger.debug("Using YIN for pitch detection")
+
+        window = int(0.03 * sr)  # 30ms integration window
+        hop_size = int(0.01 * sr)  # 10ms hop
+        frame_size = window + int(sr / settings.MIN_PITCH) + 2  # room for the longest period
+
+        count = len(range(0, len(audio) - frame_size, hop_size))
+        if count == 0:
+            return {'times': np.array([]), 'pitches': np.array([]), 'confidence': np.array([])}
+        frames = np.lib.stride_tricks.sliding_window_view(audio, frame_size)[::hop_size][:count]
+
+        if coarse_to_fine is None:
+            coarse_to_fine = settings.PITCH_COARSE_TO_FINE
+        if coarse_to_fine:
+            coarse_window = window // 2
+            coarse = self._coarse_frames(audio, coarse_window + int(sr / 2 / settings.MIN_PITCH) + 2)
+            starts = np.arange(count) * hop_size // 2
+
+        cancel = cancel or CancellationToken()
+        deadline = deadline or Deadline.unlimited()
+        pitches = np.empty(count)
+        confidence = np.empty(count)
+        for i in range(0, count, FRAMES_PER_BLOCK):
+            cancel.raise_if_cancelled()
+            deadline.raise_if_expired()
+            block = slice(i, i + FRAMES_PER_BLOCK)
+            if coarse_to_fine:
+                estimate, confidence[block] = self._yin_frames(coarse[starts[block]], sr / 2, coarse_window)
+                pitches[block] = self._refine_yin_pitches(frames[block], sr, window, estimate)
+            else:
+                pitches[block], confidence[block] = self._yin_frames(frames[block], sr, window)
+
+        # Frames are timed at the middle of their integration window, like Praat's
+        voiced = (pitches > 0) & (confidence >= YIN_MIN_CONFIDENCE)
+        return {
+            'times': (np.flatnonzero(voiced) * hop_size + window / 2) / sr,
+            'pitches': pitches[voiced],
+            'confidence': confidence[voiced]
+        }
+
+    @staticmethod
+    def _yin_frames(frames: np.ndarray, sr: int, window: int) -> Tuple[np.ndarray, np.ndarray]:
+        """YIN pitch (0.0 where out of range) and voicing probability of each row of `frames`"""
+        min_lag = int(sr / settings.MAX_PITCH)
+        max_lag = int(sr / settings.MIN_PITCH)
+        lags = np.arange(max_lag + 2)
+        rows = np.arange(len(frames))
+        frames = frames.astype(np.float64)
+
+        # Difference function d(tau) = sum over the window of (x[j] - x[j + tau])^2,
+        # expanded into energies (from a running sum of squares) and a
+        # cross-correlation (from one batched FFT)
+        squares = np.cumsum(np.pad(frames * frames, ((0, 0), (1, 0))), axis=1)
+        energy = squares[:, lags + window] - squares[:, lags]
+        n_fft = scipy.fft.next_fast_len(window + len(lags), real=True)
+        head = scipy.fft.rfft(frames[:, :window], n_fft, axis=1)
+        whole = scipy.fft.rfft(frames, n_fft, axis=1)
+        corr = scipy.fft.irfft(np.conj(head) * whole, n_fft, axis=1)[:, :len(lags)]
+        diff = np.maximum(energy[:, :1] + energy - 2 * corr, 0.0)
+
+        # Cumulative mean normalized difference: 1 at lag 0, dips toward 0 at the period
+        running = np.cumsum(diff[:, 1:], axis=1)
+        cmnd = np.ones_like(diff)
+        np.divide(diff[:, 1:] * lags[1:], running, out=cmnd[:, 1:], where=running > 0)
+
+        # The first dip below YIN_THRESHOLD, followed down to its minimum; if
+        # there is none, the deepest point in the pitch range
+        candidates = cmnd[:, min_lag:max_lag + 1]
+        below = candidates < YIN_THRESHOLD
+        first = np.argmax(below, axis=1)
+        rising = np.diff(candidates, axis=1, append=np.inf) >= 0
+        positions = np.arange(candidates.shape[1])
+        bottom = np.argmax(rising & (positions >= first[:, np.newaxis]), axis=1)
+        deepest = np.argmin(candidates, axis=1)
+        period = np.where(below.any(axis=1), bottom, deepest) + min_lag
+
+        # Sub-sample period from a parabola through the dip and its neighbours
+        before, at, after = cmnd[rows, period - 1], cmnd[rows, period], cmnd[rows, period + 1]
+        curvature = before - 2 * at + after
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shift = np.where(curvature > 0, 0.5 * (before - after) / curvature, 0.0)
+        pitch = sr / (period + np.clip(shift, -0.5, 0.5))
+        pitch = np.where((pitch > settings.MIN_PITCH) & (pitch < settings.MAX_PITCH), pitch, 0.0)
+
+        confidence = 1.0 - scipy.special.betainc(*YIN_THRESHOLD_PRIOR, np.clip(candidates.min(axis=1), 0, 1))
+        return pitch, confidence
+
+    @staticmethod
+    def _refine_yin_pitches(frames: np.ndarray, sr: int, window: int, estimate: np.ndarray) -> np.ndarray:
+        """
+        YIN pitch of each row of `frames` from the difference function at the
+        three lags around the period of `estimate` (0.0 where out of range)
+        """
+        min_lag = int(sr / settings.MAX_PITCH)
+        max_lag = int(sr / settings.MIN_PITCH)
+        rows = np.arange(len(frames))
+        period = np.rint(sr / np.where(estimate > 0, estimate, settings.MAX_PITCH))
+        period = np.clip(period, min_lag, max_lag).astype(int)
+        lags = period[:, np.newaxis] + np.arange(-1, 2)
+
+        # d(tau) at lags period - 1 .. period + 1, from the window and the
+        # stretch of the frame starting one sample before the period
+        head = frames[:, :window].astype(np.float64)
+        shifted = np.lib.stride_tricks.sliding_window_view(frames, window + 2, axis=1)[rows, period - 1]
+        shifted = shifted.astype(np.float64)
+        squares = shifted * shifted
+        energy = squares[:, :window].sum(axis=1)[:, np.newaxis] + np.cumsum(
+            np.pad(squares[:, window:] - squares[:, :2], ((0, 0), (1, 0))), axis=1)
+        corr = np.einsum('ikj,ij->ik', np.lib.stride_tricks.sliding_window_view(shifted, window, axis=1), head)
+        # The running mean in the normalization barely moves across three lags
+        # at a dip, so d(tau) * tau has the normalized difference's shape there
+        diff = np.maximum(np.einsum('ij,ij->i', head, head)[:, np.newaxis] + energy - 2 * corr, 0.0) * lags
+
+        before, at, after = diff[:, 0], diff[:, 1], diff[:, 2]
+        curvature = before - 2 * at + after
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shift = np.where(curvature > 0, 0.5 * (before - after) / curvature, 0.0)
+        pitch = sr / (period + np.clip(shift, -1.0, 1.0))
+        in_range = (estimate > 0) & (pitch > settings.MIN_PITCH) & (pitch < settings.MAX_PITCH)
+        return np.where(in_range, pitch, 0.0)
+
+    @staticmethod
+    def _coarse_frames(audio: np.ndarray, frame_size: int) -> np.ndarray:
+        """
+        Every `frame_size` window of the audio decimated 2x (through
+        HALFBAND), so frame k starts at full-rate sample 2k
+        """
+        x = np.asarray(audio, dtype=np.float32)
+        if len(x) % 2:
+            x = np.append(x, np.float32(0))
+        even, odd = x[0::2], x[1::2]
+
+        # Half-band filter centred on each even sample: its centre tap on the
+        # sample itself, and pairs of equal taps on the odd samples either side
+        centre = len(HALFBAND) // 2
+        taps = HALFBAND[centre + 1::2].astype(np.float32)
+        t, n = len(taps), len(even)
+        padded = np.pad(odd, t)
+        # Zeros past the end, so the last frames are whole
+        coarse = np.pad(np.float32(HALFBAND[centre]) * even, (0, frame_size))
+        pair = np.empty(n, dtype=np.float32)
+        for k, tap in enumerate(taps):
+            # x[2m + 2k + 1] is odd[m + k] and x[2m - 2k - 1] is odd[m - k - 1]
+            np.add(padded[t + k:t + k + n], padded[t - k - 1:t - k - 1 + n], out=pair)
+            pair *= tap
+            coarse[:n] += pair
+        return np.lib.stride_tricks.sliding_window_view(coarse, frame_size)
+
+    def _detect_pitch_basic(self, audio: np.ndarray, sr: int,
+                            cancel: Optional[CancellationToken] = None,
+                            deadline: Optional[Deadline] = None) -> Dict:
         """Basic pitch detection using autocorrelation"""
         self.logger.debug("Using basic autocorrelation for pitch detection")
 
@@ -188,33 +416,55 @@ class VoiceAnalyzer:
         frame_size = int(0.03 * sr)  # 30ms frames
         hop_size = int(0.01 * sr)     # 10ms hop
 
-        pitches = []
-        times = []
-
-        for i in range(0, len(audio) - frame_size, hop_size):
-            frame = audio[i:i+frame_size]
-
-            # Autocorrelation
-            corr = np.correlate(frame, frame, mode='full')
-            corr = corr[len(corr)//2:]
-
-            # Find first peak after zero lag
-            min_lag = int(sr / settings.MAX_PITCH)
-            max_lag = int(sr / settings.MIN_PITCH)
-
-            if max_lag < len(corr):
-                peak = np.argmax(corr[min_lag:max_lag]) + min_lag
-                pitch = sr / peak
-
-                if settings.MIN_PITCH < pitch < settings.MAX_PITCH:
-                    pitches.append(pitch)
-                    times.append(i / sr)
-
+        count = len(range(0, len(audio) - frame_size, hop_size))
+        if count == 0:
+            return {'times': np.array([]), 'pitches': np.array([])}
+        # Every frame at once, as views into the audio
+        frames = np.lib.stride_tricks.sliding_window_view(audio, frame_size)[::hop_size][:count]
+
+        cancel = cancel or CancellationToken()
+        deadline = deadline or Deadline.unlimited()
+        pitches = np.empty(count)
+        for i in range(0, count, FRAMES_PER_BLOCK):
+            cancel.raise_if_cancelled()
+            deadline.raise_if_expired()
+            pitches[i:i + FRAMES_PER_BLOCK] = self._frame_pitches(frames[i:i + FRAMES_PER_BLOCK], sr)
+
+        voiced = pitches > 0
         return {
-            'times': np.array(times),
-            'pitches': np.array(pitches)
+            'times': np.flatnonzero(voiced) * hop_size / sr,
+            'pitches': pitches[voiced]
         }
 
+    @staticmethod
+    def _frame_pitches(frames: np.ndarray, sr: int) -> np.ndarray:
+        """Autocorrelation pitch of each row of `frames`, 0.0 where out of range"""
+        frame_size = frames.shape[1]
+        min_lag = int(sr / settings.MAX_PITCH)
+        max_lag = int(sr / settings.MIN_PITCH)
+        if len(frames) == 0 or max_lag >= frame_size:
+            return np.zeros(len(frames))
+
+        # All the autocorrelations from one batched real FFT: the inverse
+        # transform of the power spectrum, zero-padded so that lags up to
+        # max_lag don't wrap. Single precision is plenty to find a peak
+        n_fft = scipy.fft.next_fast_len(frame_size + max_lag + 1, real=True)
+        spectrum = scipy.fft.rfft(frames.astype(np.float32), n_fft, axis=1)
+        corr = scipy.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, n_fft, axis=1)[:, :max_lag + 1]
+
+        # Strongest lag in the pitch range, refined by a parabola through
+        # it and its neighbours
+        rows = np.arange(len(frames))
+        peak = np.argmax(corr[:, min_lag:max_lag], axis=1) + min_lag
+        before, at, after = corr[rows, peak - 1], corr[rows, peak], corr[rows, peak + 1]
+        curvature = before - 2 * at + after
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shift = np.where(curvature < 0, 0.5 * (before - after) / curvature, 0.0)
+        pitch = sr / (peak + np.clip(shift, -0.5, 0.5))
+
+        in_range = (pitch > settings.MIN_PITCH) & (pitch < settings.MAX_PITCH)
+        return np.where(in_range, pitch, 0.0)
+
     def _detect_speech_segments(self, audio: np.ndarray, sr: int, pitch_data: Dict) -> List[Tuple]:
         """Detect continuous speech segments"""
         segments = []
@@ -280,3 +530,57 @@ class VoiceAnalyzer:
         resampled = np.interp(indices, np.arange(len(audio)), audio)
 
         return resampled
+
+
+class StreamingVoiceAnalyzer(VoiceAnalyzer):
+    """
+    Incremental analysis of live call audio
+
+    feed() runs the autocorrelation pitch tracker over each 30ms frame as
+    soon as it is complete, so by the time the caller stops talking only the
+    last few frames are left and result() is immediate. Frames quieter than
+    EAGI_SILENCE_THRESHOLD (RMS, full scale = 1.0) are skipped as silence;
+    deciding when the caller has finished is services.endpointer's job.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.frame_size = int(0.03 * self.sample_rate)  # 30ms frames
+        self.hop_size = int(0.01 * self.sample_rate)     # 10ms hop
+        self.samples = 0  # samples fed so far
+        self.busy_seconds = 0.0  # time spent in feed()
+        self._pending = np.zeros(0, dtype=np.float32)  # audio not yet framed
+        self._pending_start = 0  # sample index of _pending[0]
+        self._times: List[float] = []
+        self._pitches: List[float] = []
+
+    @property
+    def duration(self) -> float:
+        return self.samples / self.sample_rate
+
+    def feed(self, audio: np.ndarray):
+        """Analyze newly arrived audio (float samples at SAMPLE_RATE)"""
+        started = time.perf_counter()
+        buffer = np.concatenate((self._pending, audio)) if len(self._pending) else audio
+        sr = self.sample_rate
+        threshold = settings.EAGI_SILENCE_THRESHOLD ** 2
+
+        count = max((len(buffer) - self.frame_size) // self.hop_size + 1, 0)
+        if count:
+            frames = np.lib.stride_tricks.sliding_window_view(buffer, self.frame_size)[::self.hop_size][:count]
+            loud = np.flatnonzero(np.mean(frames * frames, axis=1) >= threshold)
+            pitches = self._frame_pitches(frames[loud], sr)
+            voiced = pitches > 0
+            self._times.extend((self._pending_start + loud[voiced] * self.hop_size) / sr)
+            self._pitches.extend(pitches[voiced])
+        i = count * self.hop_size
+
+        self._pending = buffer[i:]
+        self._pending_start += i
+        self.samples += len(audio)
+        self.busy_seconds += time.perf_counter() - started
+
+    def result(self) -> Dict:
+        """The analysis of everything fed so far, shaped like analyze_audio_file's"""
+        pitch_data = {'times': np.array(self._times), 'pitches': np.array(self._pitches)}
+        return self._compile_result(pitch_data, self.duration)
@@ -0,0 +1,286 @@
+"""
+Analysis Worker Pool
+A shared, pre-warmed process pool for the CPU-bound call stages (voice
+analysis, meow synthesis), so concurrent calls use every core instead of
+contending for one GIL.
+
+Tasks take and return file paths and small dicts, never audio arrays.
+Each task gets a per-task timeout, and cancellation reaches into the worker
+through a shared-memory flag: a hangup or timeout sets the task's flag, and
+the CancellationToken the task was handed sees it at its next check.
+
+Tasks wait for a worker in services.scheduler's shortest-expected-job-first
+order, sized by the seconds of audio they handle.
+"""
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+from config import settings
+from services import metrics
+from services.cancellation import CallCancelled, CancellationToken
+from services.scheduler import JobScheduler
+
+logger = logging.getLogger(__name__)
+
+# Imported once per worker (and once before forking AGI workers)
+HEAVY_MODULES = ("numpy", "scipy.signal", "soundfile", "parselmouth", "aubio", "librosa")
+TASK_MODULES = ("services.meow_generator",)
+
+POOL_TASK_SECONDS = metrics.histogram(
+    "meow_pool_task_seconds", "Wall-clock time of analysis pool tasks, queueing included",
+    ("task",))
+POOL_TASK_TIMEOUTS = metrics.counter(
+    "meow_pool_task_timeouts_total", "Analysis pool tasks abandoned after their timeout",
+    ("task",))
+POOL_TASKS_IN_FLIGHT = metrics.gauge(
+    "meow_pool_tasks_in_flight", "Analysis pool tasks queued or running")
+
+# One slot per worker process (or executor thread). Starting rates, in
+# seconds per second of audio, until real tasks have been timed
+SCHEDULER = JobScheduler("analysis", settings.ANALYSIS_PROCESSES or settings.WORKER_THREADS, rates={
+    'render_mockery': 0.05,
+    'render_meows': 0.01,
+})
+
+
+def import_heavy_modules(modules=HEAVY_MODULES):
+    """Import whichever of the analysis/synthesis libraries are installed"""
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+
+
+# Worker process side
+
+_cancel_flags = None
+
+
+class SharedFlagToken(CancellationToken):
+    """Worker-side view of a task's cancellation flag in shared memory"""
+
+    def __init__(self, slot: int):
+        super().__init__()
+        self.slot = slot
+
+    @property
+    def cancelled(self) -> bool:
+        return bool(_cancel_flags[self.slot]) or super().cancelled
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise CallCancelled("cancelled by the AGI process")
+
+
+def _init_worker(cancel_flags):
+    global _cancel_flags
+    _cancel_flags = cancel_flags
+    # Shutdown is driven by the AGI process, not by signals sent to the group
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import_heavy_modules(HEAVY_MODULES + TASK_MODULES)
+
+
+def warm_up_tasks(modules=TASK_MODULES):
+    """Run each task module's warm_up(), if it has one, so the first call isn't the slowest"""
+    for name in modules:
+        warm_up = getattr(importlib.import_module(name), 'warm_up', None)
+        if warm_up is None:
+            continue
+        try:
+            warm_up()
+        except Exception as e:
+            logger.warning(f"Warm-up of {name} failed: {e}")
+
+
+def _warm_up() -> int:
+    start = time.monotonic()
+    warm_up_tasks()
+    # Long enough that each warm-up task lands on its own worker
+    time.sleep(max(0.05 - (time.monotonic() - start), 0))
+    return 0
+
+
+def _run_task(slot: int, fn: Callable, args: tuple) -> Any:
+    return fn(*args, cancel=SharedFlagToken(slot))
+
+
+# AGI process side
+
+class AnalysisPool:
+    """
+    Process pool for CPU-bound call work
+
+    `fn` must be a module-level function taking the positional `args`
+    plus a `cancel` keyword (a CancellationToken it should poll).
+    """
+
+    def __init__(self, processes: int = settings.ANALYSIS_PROCESSES,
+                 timeout: float = settings.ANALYSIS_TASK_TIMEOUT):
+        self.processes = processes
+        self.timeout = timeout
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self._flags = None
+        self._free_slots: Optional[asyncio.Queue] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.logger = logging.getLogger(__name__)
+
+    async def start(self):
+        """Start the workers and wait until all have imported their modules"""
+        # forkserver: workers never inherit the event loop or its threads, and
+        # the heavy imports happen once in the fork server, shared copy-on-write
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(list(HEAVY_MODULES + TASK_MODULES))
+        self.loop = asyncio.get_running_loop()
+
+        # One flag per task that can be in flight: every call holds at most one
+        slots = max(settings.MAX_CONCURRENT_CALLS, self.processes) * 2
+        self._flags = context.RawArray('b', slots)
+        self._free_slots = asyncio.Queue()
+        for slot in range(slots):
+            self._free_slots.put_nowait(slot)
+
+        start = time.monotonic()
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self._flags,)
+        )
+        await asyncio.gather(*(asyncio.wrap_future(self.executor.submit(_warm_up))
+                               for _ in range(self.processes)))
+        self.logger.info(f"Analysis pool ready: {self.processes} process(es) "
+                         f"in {time.monotonic() - start:.1f}s")
+
+    async def run(self, fn: Callable, *args, cancel: Optional[CancellationToken] = None,
+                  timeout: Optional[float] = None) -> Any:
+        """
+        Run fn(*args, cancel=...) in a worker process
+
+        Raises:
+            CallCancelled: `cancel` was tripped while the task ran
+            asyncio.TimeoutError: the task took longer than `timeout`
+        """
+        timeout = timeout or self.timeout
+        cancel = cancel or CancellationToken()
+        cancel.raise_if_cancelled()
+
+        slot = await self._free_slots.get()
+        self._flags[slot] = 0
+
+        def stop():
+            self._flags[slot] = 1
+
+        name = getattr(fn, '__name__', 'task')
+        start = time.monotonic()
+        future = self.executor.submit(_run_task, slot, fn, args)
+        POOL_TASKS_IN_FLIGHT.inc()
+        # The slot is only reusable once the worker is done with it
+        future.add_done_callback(lambda _: self._release(slot))
+        cancel.add_callback(stop)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            stop()
+            POOL_TASK_TIMEOUTS.inc(task=name)
+            self.logger.warning(f"{name} timed out after {timeout:g}s")
+            raise
+        except asyncio.CancelledError:
+            # Nobody will read the result (drain timeout, play_while teardown):
+            # drop it if still queued, else have the worker give up on it
+            if not future.cancel():
+                stop()
+            raise
+        finally:
+            cancel.remove_callback(stop)
+            POOL_TASK_SECONDS.observe(time.monotonic() - start, task=name)
+
+    def _release(self, slot: int):
+        # Called from the executor's management thread
+        POOL_TASKS_IN_FLIGHT.dec()
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._free_slots.put_nowait, slot)
+
+    async def shutdown(self):
+        """Stop the workers, abandoning queued tasks"""
+        if self.executor is None:
+            return
+        for slot in range(len(self._flags)):
+            self._flags[slot] = 1
+        executor, self.executor = self.executor, None
+        await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+
+_pool: Optional[AnalysisPool] = None
+
+
+async def start_pool(processes: int = settings.ANALYSIS_PROCESSES) -> Optional[AnalysisPool]:
+    """Start the shared pool for this process (with 0 processes, just warm up the thread fallback)"""
+    global _pool
+    SCHEDULER.resize(processes or settings.WORKER_THREADS)
+    if processes > 0 and _pool is None:
+        pool = AnalysisPool(processes)
+        await pool.start()
+        _pool = pool
+    elif processes == 0:
+        await asyncio.to_thread(warm_up_tasks)
+    return _pool
+
+
+async def shutdown_pool():
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        await pool.shutdown()
+
+
+async def run(fn: Callable, *args, cancel: Optional[CancellationToken] = None,
+              timeout: float = settings.ANALYSIS_TASK_TIMEOUT,
+              audio_seconds: float = 0.0, trace=None) -> Any:
+    """
+    Run CPU-bound call work: in the shared process pool when it is running,
+    otherwise on an executor thread, with the same timeout and cancellation
+    semantics either way
+
+    The task first queues for a worker behind jobs expected to be shorter
+    (by `audio_seconds`); the wait is a "queue" span on `trace`.
+    """
+    name = getattr(fn, '__name__', 'task')
+    async with SCHEDULER.job(name, audio_seconds, cancel, trace=trace):
+        if _pool is not None:
+            return await _pool.run(fn, *args, cancel=cancel, timeout=timeout)
+        return await _run_in_thread(name, fn, args, cancel, timeout)
+
+
+async def _run_in_thread(name: str, fn: Callable, args: tuple,
+                         cancel: Optional[CancellationToken], timeout: float) -> Any:
+    # Thread fallback: a child token, so a timeout stops this task only
+    task_cancel = CancellationToken()
+
+    def propagate():
+        task_cancel.cancel(cancel.reason or "cancelled")
+
+    if cancel is not None:
+        cancel.add_callback(propagate)
+    start = time.monotonic()
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(fn, *args, cancel=task_cancel), timeout)
+    except asyncio.TimeoutError:
+        task_cancel.cancel("timed out")
+        POOL_TASK_TIMEOUTS.inc(task=name)
+        logger.warning(f"{name} timed out after {timeout:g}s")
+        raise
+    except asyncio.CancelledError:
+        # The caller stopped waiting; the thread can't be killed, only told
+        task_cancel.cancel("abandoned")
+        raise
+    finally:
+        if cancel is not None:
+            cancel.remove_callback(propagate)
+        POOL_TASK_SECONDS.observe(time.monotonic() - start, task=name)
@@ -0,0 +1,106 @@
+"""
+Pipelined AGI batches cut short by a hangup: the replies Asterisk still sends
+for the rest of the batch must not be taken as the replies to later commands.
+"""
+import asyncio
+
+import pytest
+
+from agi_server import AGISession
+from services.agi_protocol import AGIConnectionClosed, AGIProtocol
+
+
+class FakeTransport(asyncio.Transport):
+    """Collects what the session writes"""
+
+    def __init__(self):
+        super().__init__()
+        self.written = bytearray()
+        self.closing = False
+
+    def write(self, data):
+        self.written += data
+
+    def is_closing(self):
+        return self.closing
+
+    def close(self):
+        self.closing = True
+
+    def get_extra_info(self, name, default=None):
+        return default
+
+
+def feed(connection: AGIProtocol, data: bytes):
+    """Hand `data` to the protocol as if it had arrived from Asterisk"""
+    buffer = connection.get_buffer(len(data))
+    buffer[:len(data)] = data
+    connection.buffer_updated(len(data))
+
+
+async def open_session() -> AGISession:
+    connection = AGIProtocol(lambda connection: None)
+    connection.connection_made(FakeTransport())
+    feed(connection, b"agi_channel: PJSIP/test-00000001\nagi_callerid: 5551234567\n\n")
+    session = AGISession(connection)
+    await session.read_env()
+    return session
+
+
+BATCH = ['ANSWER', 'STREAM FILE "welcome" ""', 'STREAM FILE "menu" ""', 'VERBOSE "done" 1']
+
+
+@pytest.mark.parametrize("hangup", [
+    b"511 Command Not Permitted on a dead channel or intercept routine\n",
+    b"200 result=-1 endpos=1200\n",
+])
+def test_replies_after_hangup_arriving_later_are_dropped(hangup):
+    async def scenario():
+        session = await open_session()
+        batch = asyncio.ensure_future(session.send_batch(BATCH))
+        await asyncio.sleep(0)
+        feed(session.connection, b"200 result=0\n" + hangup)
+        with pytest.raises(AGIConnectionClosed):
+            await batch
+        assert session.cancellation.cancelled
+
+        # The rest of the batch is answered after the session gave up on it
+        reply = asyncio.ensure_future(session.send_command('GET VARIABLE CALLERID(num)'))
+        await asyncio.sleep(0)
+        feed(session.connection, b"511 Command Not Permitted\n200 result=1 (done)\n")
+        feed(session.connection, b"200 result=1 (5551234567)\n")
+        assert await reply == "200 result=1 (5551234567)"
+
+    asyncio.run(scenario())
+
+
+def test_replies_after_hangup_already_received_are_dropped():
+    async def scenario():
+        session = await open_session()
+        # Everything arrives in one segment, before the session reads any of it
+        feed(session.connection, b"200 result=0\n"
+                                 b"200 result=-1 endpos=0\n"   # missing sound file, not a hangup
+                                 b"511 Command Not Permitted\n"
+                                 b"200 result=1 (done)\n"
+                                 b"200 result=0 (noop)\n")
+        with pytest.raises(AGIConnectionClosed):
+            await session.send_batch(BATCH)
+        assert await session.send_command('NOOP') == "200 result=0 (noop)"
+
+    asyncio.run(scenario())
+
+
+def test_responses_keep_their_order_without_a_hangup():
+    async def scenario():
+        session = await open_session()
+        replies = [b"200 result=0\n", b"200 result=0 endpos=800\n", b"200 result=0 endpos=900\n",
+                   b"200 result=1\n"]
+        batch = asyncio.ensure_future(session.send_batch(BATCH))
+        await asyncio.sleep(0)
+        for reply in replies:
+            feed(session.connection, reply)
+        assert await batch == [reply.decode().strip() for reply in replies]
+        assert session.connection.transport.written.decode().splitlines() == BATCH
+        assert session.round_trips == 1
+
+    asyncio.run(scenario())
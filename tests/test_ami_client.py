@@ -0,0 +1,233 @@
+"""
+AMI client and live channel view, against scripts/fake_ami.py's FakeAMIServer
+"""
+import asyncio
+import time
+
+import pytest
+
+from config import settings
+from scripts.fake_ami import FakeAMIServer, format_message
+from services import quality
+from services.admission import AdmissionController
+from services.ami_client import AMIClient, ChannelView
+
+
+def channel_event(event: str, uniqueid: str, application: str = "", **fields) -> dict:
+    return {'Event': event, 'Uniqueid': uniqueid, 'Channel': f"PJSIP/numberbarn-{uniqueid}",
+            'ChannelStateDesc': 'Ring', 'Context': 'from-trunk', 'Exten': '15551234567',
+            'Application': application, **fields}
+
+
+async def eventually(predicate, timeout: float = 3.0):
+    """Wait for `predicate()` to hold; fails the test if it doesn't in time"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture(autouse=True)
+def fast_reconnect(monkeypatch):
+    monkeypatch.setattr(settings, "AMI_RECONNECT_DELAY", 0.05)
+    monkeypatch.setattr(settings, "AMI_RECONNECT_MAX_DELAY", 0.1)
+
+
+def test_channel_view_follows_a_call_into_the_agi():
+    view = ChannelView()
+    view.handle_event(channel_event('Newchannel', '1'))
+    view.handle_event(channel_event('Newchannel', '2'))
+    assert view.stats() == {'active_channels': 2, 'calls_in_agi': 0, 'calls_waiting': 2}
+
+    view.handle_event(channel_event('Newstate', '1', ChannelStateDesc='Up'))
+    view.handle_event(channel_event('Newexten', '1', application='AGI', Extension='s'))
+    assert view.channels['1'].state == 'Up'
+    assert view.channels['1'].exten == 's'
+    assert view.stats() == {'active_channels': 2, 'calls_in_agi': 1, 'calls_waiting': 1}
+
+    view.handle_event(channel_event('Hangup', '1'))
+    view.handle_event(channel_event('Hangup', '2'))
+    assert view.stats() == {'active_channels': 0, 'calls_in_agi': 0, 'calls_waiting': 0}
+
+
+def test_channel_view_counts_queued_calls_once():
+    view = ChannelView()
+    view.handle_event(channel_event('Newchannel', '1', application='Queue'))
+    view.handle_event({'Event': 'QueueCallerJoin', 'Uniqueid': '1', 'Queue': 'cats'})
+    view.handle_event({'Event': 'QueueCallerJoin', 'Uniqueid': 'elsewhere', 'Queue': 'cats'})
+    assert view.calls_waiting == 2
+
+    view.handle_event({'Event': 'QueueCallerAbandon', 'Uniqueid': 'elsewhere'})
+    view.handle_event(channel_event('Newexten', '1', application='AGI'))
+    view.handle_event({'Event': 'QueueCallerLeave', 'Uniqueid': '1'})
+    assert view.calls_waiting == 0
+    assert view.calls_in_agi == 1
+
+
+def test_channel_view_ignores_events_for_unknown_channels():
+    view = ChannelView()
+    view.handle_event(channel_event('Newstate', 'never-seen'))
+    view.handle_event(channel_event('Hangup', 'never-seen'))
+    assert view.active_channels == 0
+
+
+def test_wait_connected_before_start_is_false():
+    async def scenario():
+        client = AMIClient("127.0.0.1", 1, "admin", "test")
+        assert await client.wait_connected(0.1) is False
+        assert await client.wait_connected() is False
+
+    asyncio.run(scenario())
+
+
+def test_client_tracks_calls_from_the_fake_ami():
+    async def scenario():
+        server = FakeAMIServer(secret="test", calls_per_second=0, hold_time=60, pre_agi_time=0.2)
+        port = await server.start()
+        client = AMIClient("127.0.0.1", port, "admin", "test")
+        client.start()
+        try:
+            assert await client.wait_connected(3)
+            call = asyncio.ensure_future(server.simulate_call())
+            await eventually(lambda: client.view.calls_waiting == 1)
+            await eventually(lambda: client.view.calls_in_agi == 1)
+            assert client.view.calls_waiting == 0
+            assert client.view.active_channels == len(server.channels) == 1
+            call.cancel()
+        finally:
+            await client.stop()
+            await server.close()
+
+    asyncio.run(scenario())
+
+
+def test_fake_ami_only_sends_subscribed_event_classes():
+    async def scenario():
+        server = FakeAMIServer(secret="test", calls_per_second=0)
+        port = await server.start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            await reader.readline()
+            writer.write(format_message({'Action': 'Login', 'Username': 'admin',
+                                         'Secret': 'test', 'Events': 'call'}))
+            assert (await reader.readuntil(b"\r\n\r\n")).startswith(b"Response: Success")
+            server.broadcast(channel_event('Newexten', '1', application='AGI'))
+            server.broadcast(channel_event('Hangup', '1'))
+            assert (await reader.readuntil(b"\r\n\r\n")).startswith(b"Event: Hangup")
+        finally:
+            writer.close()
+            await server.close()
+
+    asyncio.run(scenario())
+
+
+def test_calls_in_the_agi_do_not_count_as_waiting():
+    async def scenario():
+        server = FakeAMIServer(secret="test", calls_per_second=0, hold_time=60, pre_agi_time=0.1)
+        port = await server.start()
+        client = AMIClient("127.0.0.1", port, "admin", "test")
+        client.start()
+        admission = AdmissionController(max_active=2, max_queue=1, max_wait=5, ami=client)
+        calls = []
+        try:
+            assert await client.wait_connected(3)
+            for _ in range(2):
+                calls.append(asyncio.ensure_future(server.simulate_call()))
+            await eventually(lambda: client.view.calls_in_agi == 2)
+            # Both are the AGI's own active calls now, not pressure on its queue
+            assert admission.upstream_waiting == 0
+            assert await admission.acquire() and await admission.acquire()
+        finally:
+            for call in calls:
+                call.cancel()
+            await client.stop()
+            await server.close()
+
+    asyncio.run(scenario())
+
+
+def test_client_reconnects_and_reseeds_the_view():
+    async def scenario():
+        server = FakeAMIServer(secret="test", calls_per_second=0)
+        port = await server.start()
+        client = AMIClient("127.0.0.1", port, "admin", "test")
+        client.start()
+        try:
+            assert await client.wait_connected(3)
+            server.broadcast(channel_event('Newchannel', 'before'))
+            await eventually(lambda: client.view.active_channels == 1)
+
+            # Asterisk goes away: the view empties rather than going stale
+            await server.close()
+            await eventually(lambda: not client.connected)
+            assert client.view.active_channels == 0
+
+            # ...and comes back with calls already up, which CoreShowChannels reports
+            server = FakeAMIServer(secret="test", calls_per_second=0)
+            server.channels['after'] = {key: value for key, value in channel_event('', 'after').items()
+                                        if key != 'Event'}
+            await server.start(port=port)
+            assert await client.wait_connected(3)
+            await eventually(lambda: 'after' in client.view.channels)
+            assert 'before' not in client.view.channels
+            assert client.view.calls_waiting == 1
+        finally:
+            await client.stop()
+            await server.close()
+
+    asyncio.run(scenario())
+
+
+def test_calls_waiting_in_asterisk_count_toward_admission_and_load():
+    async def scenario():
+        server = FakeAMIServer(secret="test", calls_per_second=0)
+        port = await server.start()
+        client = AMIClient("127.0.0.1", port, "admin", "test")
+        client.start()
+        admission = AdmissionController(max_active=1, max_queue=2, max_wait=5, ami=client)
+        try:
+            assert await client.wait_connected(3)
+            assert await admission.acquire()
+            for uniqueid in ('ringing-1', 'ringing-2'):
+                server.broadcast(channel_event('Newchannel', uniqueid))
+            await eventually(lambda: admission.upstream_waiting == 2)
+
+            # The queue has room, but two calls are already on their way to it
+            assert await admission.acquire() is False
+            assert quality.measure_load(admission.active, admission.max_active,
+                                        admission.upstream_waiting) >= 3.0
+
+            # Without a live view, only the AGI's own queue counts
+            await server.close()
+            await eventually(lambda: not client.connected)
+            assert admission.upstream_waiting == 0
+            waiter = asyncio.ensure_future(admission.acquire())
+            await eventually(lambda: admission.waiting == 1)
+            admission.release()
+            assert await waiter is True
+        finally:
+            await client.stop()
+            await server.close()
+
+    asyncio.run(scenario())
+
+
+def test_each_prefork_worker_counts_its_share_of_waiting_calls():
+    async def scenario():
+        server = FakeAMIServer(secret="test", calls_per_second=0)
+        port = await server.start()
+        client = AMIClient("127.0.0.1", port, "admin", "test")
+        client.start()
+        admission = AdmissionController(max_active=1, max_queue=2, max_wait=5, ami=client, workers=4)
+        try:
+            assert await client.wait_connected(3)
+            for n in range(5):
+                server.broadcast(channel_event('Newchannel', f"ringing-{n}"))
+            await eventually(lambda: client.view.calls_waiting == 5)
+            # Five ringing calls over four workers: at most two land here
+            assert admission.upstream_waiting == 2
+        finally:
+            await client.stop()
+            await server.close()
+
+    asyncio.run(scenario())
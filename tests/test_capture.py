@@ -0,0 +1,67 @@
+"""
+Session capture of EAGI calls: the caller's live audio frames are saved with
+the commands so a replay can stream them again.
+"""
+import asyncio
+import json
+import zipfile
+
+import numpy as np
+
+from agi_server import AGISession
+from config import settings
+from services.agi_protocol import AGIProtocol
+from services.audio_stream import encode_frame
+from services.capture import AUDIO_FILE
+from tests.test_agi_batch import FakeTransport, feed
+
+EAGI_ENV = (b"agi_channel: PJSIP/test-00000001\nagi_callerid: 5551234567\n"
+            b"agi_enhanced: 1.0\nagi_audio_stream: slin8\n\n")
+
+
+def test_eagi_audio_is_captured(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "AGI_CAPTURE_ENABLED", True)
+    monkeypatch.setattr(settings, "AGI_CAPTURE_SAMPLE", 1.0)
+    frames = [(np.arange(160, dtype="<i2") * (n + 1)).tobytes() for n in range(3)]
+
+    async def scenario():
+        connection = AGIProtocol(lambda connection: None)
+        connection.connection_made(FakeTransport())
+        feed(connection, EAGI_ENV)
+        session = AGISession(connection)
+        await session.read_env()
+        # Frames can arrive split across reads and between command replies
+        data = b"".join(encode_frame(frame) for frame in frames)
+        feed(connection, data[:100])
+        feed(connection, data[100:] + b"200 result=0\n")
+        return session
+
+    session = asyncio.run(scenario())
+    assert session.audio.written == 480
+    path = session.capture.save(tmp_path, session.env, "test", "completed", 1.0)
+
+    with zipfile.ZipFile(path) as archive:
+        data = json.loads(archive.read("call.json"))
+        assert archive.read(AUDIO_FILE) == b"".join(frames)
+    assert [length for _, length in data['audio_frames']] == [320, 320, 320]
+    times = [at for at, _ in data['audio_frames']]
+    assert times == sorted(times)
+
+
+def test_plain_agi_capture_has_no_audio(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "AGI_CAPTURE_ENABLED", True)
+    monkeypatch.setattr(settings, "AGI_CAPTURE_SAMPLE", 1.0)
+
+    async def scenario():
+        connection = AGIProtocol(lambda connection: None)
+        connection.connection_made(FakeTransport())
+        feed(connection, b"agi_channel: PJSIP/test-00000001\n\n")
+        session = AGISession(connection)
+        await session.read_env()
+        return session
+
+    session = asyncio.run(scenario())
+    path = session.capture.save(tmp_path, session.env, "test", "completed", 1.0)
+    with zipfile.ZipFile(path) as archive:
+        assert AUDIO_FILE not in archive.namelist()
+        assert json.loads(archive.read("call.json"))['audio_frames'] == []
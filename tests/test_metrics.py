@@ -0,0 +1,49 @@
+"""
+Prometheus rendering and the merge of pre-fork workers' snapshots
+"""
+import pytest
+
+from services.metrics import Counter, Gauge, Histogram, render
+
+
+def test_large_counters_and_sums_render_exactly():
+    sent = Counter("test_bytes_total", "Bytes")
+    sent.inc(1234567)
+    sent.inc(1)
+    seconds = Histogram("test_seconds", "Seconds", buckets=(1,))
+    seconds.observe(1234567.125)
+    text = render([{metric.name: metric.snapshot() for metric in (sent, seconds)}])
+
+    assert "test_bytes_total 1234568\n" in text
+    assert "test_seconds_sum 1234567.125\n" in text
+    assert "test_seconds_count 1\n" in text
+
+
+def test_worker_snapshots_sum_counters_but_merge_gauges_by_rule():
+    def worker(calls, channels, connected, tier):
+        metrics = (Counter("test_calls_total", "Calls"),
+                   Gauge("test_active", "Active calls"),
+                   Gauge("test_channels", "Host channels", merge="max"),
+                   Gauge("test_connected", "Connected", merge="min"),
+                   Gauge("test_tier", "Tier", ("tier",), merge="max"))
+        metrics[0].inc(calls)
+        metrics[1].set(calls)
+        metrics[2].set(channels)
+        metrics[3].set(connected)
+        for name in ("full", "reduced"):
+            metrics[4].set(int(name == tier), tier=name)
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    text = render([worker(3, 10, 1, "full"), worker(4, 12, 0, "reduced")])
+
+    assert "test_calls_total 7\n" in text
+    assert "test_active 7\n" in text
+    assert "test_channels 12\n" in text
+    assert "test_connected 0\n" in text
+    assert 'test_tier{tier="full"} 1\n' in text
+    assert 'test_tier{tier="reduced"} 1\n' in text
+
+
+def test_gauge_rejects_unknown_merge_rule():
+    with pytest.raises(ValueError):
+        Gauge("test_gauge", "Gauge", merge="average")
@@ -0,0 +1,33 @@
+"""
+Span nesting when one call's trace is written by concurrent tasks
+"""
+import asyncio
+
+from services.tracing import CallTrace
+
+
+def test_concurrent_tasks_nest_under_the_span_they_started_in():
+    trace = CallTrace()
+
+    async def render():
+        with trace.span("queue"):
+            await asyncio.sleep(0.02)
+        with trace.span("analysis"):
+            await asyncio.sleep(0.02)
+
+    async def hold():
+        await asyncio.sleep(0.01)
+        with trace.span("hold"):
+            await asyncio.sleep(0.02)
+
+    async def scenario():
+        with trace.span("render"):
+            work = asyncio.ensure_future(render())
+            await hold()
+            await work
+        with trace.span("goodbye"):
+            pass
+
+    asyncio.run(scenario())
+    depths = {span['name']: span['depth'] for span in trace.spans}
+    assert depths == {'queue': 1, 'hold': 1, 'analysis': 1, 'render': 0, 'goodbye': 0}
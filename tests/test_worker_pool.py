@@ -0,0 +1,63 @@
+"""
+Analysis pool tasks whose caller stops waiting (drain timeout, play_while
+teardown) must be told to stop rather than run on unread.
+"""
+import asyncio
+import threading
+import time
+
+from services import worker_pool
+from services.worker_pool import AnalysisPool
+
+stopped = threading.Event()
+
+
+def spin(seconds: float, cancel=None) -> str:
+    """Busy for `seconds` unless cancelled first"""
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if cancel.cancelled:
+            stopped.set()
+            return "cancelled"
+        time.sleep(0.01)
+    return "finished"
+
+
+async def abandon(awaitable, after: float = 0.2):
+    task = asyncio.ensure_future(awaitable)
+    await asyncio.sleep(after)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+def test_abandoned_thread_task_is_cancelled():
+    stopped.clear()
+
+    async def scenario():
+        assert worker_pool._pool is None
+        await abandon(worker_pool.run(spin, 10.0, timeout=30))
+        assert await asyncio.to_thread(stopped.wait, 2)
+
+    asyncio.run(scenario())
+
+
+def test_abandoned_pool_task_frees_its_worker():
+    async def scenario():
+        pool = AnalysisPool(processes=1, timeout=30)
+        await pool.start()
+        try:
+            slots = pool._free_slots.qsize()
+            await abandon(pool.run(spin, 10.0))
+            deadline = time.monotonic() + 3
+            while pool._free_slots.qsize() < slots:
+                assert time.monotonic() < deadline, "worker kept running the abandoned task"
+                await asyncio.sleep(0.05)
+            # ...and the worker is free for the next task
+            assert await pool.run(spin, 0.0) == "finished"
+        finally:
+            await pool.shutdown()
+
+    asyncio.run(scenario())